@@ -29,6 +29,13 @@ SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key")
 # Cloudflare Turnstile (bot verification)
 # Default is Cloudflare's "always passes" test secret key for dev
 TURNSTILE_SECRET_KEY = os.environ.get("TURNSTILE_SECRET_KEY", "1x0000000000000000000000000000000AA")
+# Verification gives up after TIMEOUT seconds. After BREAKER_FAILURES consecutive
+# errors Cloudflare is not called for BREAKER_RESET seconds; meanwhile requests
+# are let in (FAIL_OPEN=true) or rejected (default).
+TURNSTILE_TIMEOUT_SECONDS = float(os.environ.get("TURNSTILE_TIMEOUT_SECONDS", "2"))
+TURNSTILE_BREAKER_FAILURES = int(os.environ.get("TURNSTILE_BREAKER_FAILURES", "5"))
+TURNSTILE_BREAKER_RESET_SECONDS = int(os.environ.get("TURNSTILE_BREAKER_RESET_SECONDS", "30"))
+TURNSTILE_FAIL_OPEN = os.environ.get("TURNSTILE_FAIL_OPEN", "false").lower() == "true"
 
 # Cloudflare Realtime TURN (WebRTC media relay for Selkies/webrtc apps).
 # Short-lived credentials are minted server-side per deploy using a "TURN key"
@@ -36,12 +43,138 @@ TURNSTILE_SECRET_KEY = os.environ.get("TURNSTILE_SECRET_KEY", "1x000000000000000
 # dev → webrtc apps deploy without TURN (graceful degradation; stream won't relay).
 CLOUDFLARE_TURN_KEY_ID = os.environ.get("CLOUDFLARE_TURN_KEY_ID", "")
 CLOUDFLARE_TURN_API_TOKEN = os.environ.get("CLOUDFLARE_TURN_API_TOKEN", "")
+# Minted credentials are cached per process and shared by every webrtc start.
+# They are replaced in the background once less than REFRESH_AHEAD is left and
+# no longer handed out with less than MIN_VALIDITY left (keep it above the
+# longest session duration).
+TURN_CREDENTIAL_TTL_SECONDS = int(os.environ.get("TURN_CREDENTIAL_TTL_SECONDS", "86400"))
+TURN_CREDENTIAL_REFRESH_AHEAD_SECONDS = int(
+    os.environ.get("TURN_CREDENTIAL_REFRESH_AHEAD_SECONDS", "21600")
+)
+TURN_CREDENTIAL_MIN_VALIDITY_SECONDS = int(
+    os.environ.get("TURN_CREDENTIAL_MIN_VALIDITY_SECONDS", "14400")
+)
 
 # Container registry for user-app images. Always prefixed onto app images so we
 # never accidentally pull a bare name from Docker Hub. Prod overrides via the
 # django-config ConfigMap; the default matches it for local runs.
 REGISTRY_URL = os.environ.get("REGISTRY_URL", "registry.melekabderrahmane.com")
 
+# Kubernetes status cache: one list+watch per resource kind in the "apps"
+# namespace, so app status is answered from memory instead of list calls.
+K8S_STATE_CACHE_ENABLED = os.environ.get("K8S_STATE_CACHE_ENABLED", "true").lower() == "true"
+
+# Size of the shared keep-alive connection pool to the Kubernetes API server
+# (watches hold one connection each; the rest serve concurrent requests).
+K8S_CONNECTION_POOL_MAXSIZE = int(os.environ.get("K8S_CONNECTION_POOL_MAXSIZE", "32"))
+
+# Client-side rate limit of Kubernetes API requests per process (token bucket).
+# Starts/stops are served before status lookups, and those before housekeeping.
+# A QPS of 0 disables the limiter.
+K8S_API_QPS = float(os.environ.get("K8S_API_QPS", "50"))
+K8S_API_BURST = int(os.environ.get("K8S_API_BURST", "100"))
+
+# Bounded thread pool for concurrent Kubernetes calls when starting sessions.
+K8S_SESSION_WORKERS = int(os.environ.get("K8S_SESSION_WORKERS", "16"))
+
+# Server-Sent Events stream of session start progress (/apps/<app>/events/).
+# Streams close after the timeout; clients reconnect if still starting. Each
+# open stream holds a gunicorn thread, so a process serves at most
+# SSE_MAX_STREAMS of them (more get a 503 and clients poll /apps/ instead);
+# keep it below GUNICORN_THREADS (entrypoint.sh) so other requests still get
+# a thread.
+SSE_STREAM_TIMEOUT_SECONDS = int(os.environ.get("SSE_STREAM_TIMEOUT_SECONDS", "120"))
+SSE_MAX_STREAMS = int(os.environ.get("SSE_MAX_STREAMS", "16"))
+SSE_HEARTBEAT_SECONDS = int(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+
+# Longest a start with wait=true holds the request open for the session to be ready.
+# Each waiting start holds a gunicorn thread too, so a process serves at most
+# START_WAIT_MAX_CONCURRENT of them (more get a 503 and should poll or use SSE).
+START_WAIT_MAX_SECONDS = int(os.environ.get("START_WAIT_MAX_SECONDS", "120"))
+START_WAIT_MAX_CONCURRENT = int(os.environ.get("START_WAIT_MAX_CONCURRENT", "8"))
+
+# Session resource usage sampled from metrics.k8s.io by the session worker, and
+# the recommender deriving App resources from it (manage.py recommend_resources):
+# requests = PERCENTILE of usage x HEADROOM, memory limit = max usage x HEADROOM.
+USAGE_SAMPLE_INTERVAL_SECONDS = int(os.environ.get("USAGE_SAMPLE_INTERVAL_SECONDS", "60"))
+USAGE_SAMPLE_RETENTION_DAYS = int(os.environ.get("USAGE_SAMPLE_RETENTION_DAYS", "14"))
+RESOURCE_RECOMMENDER_PERCENTILE = int(os.environ.get("RESOURCE_RECOMMENDER_PERCENTILE", "95"))
+RESOURCE_RECOMMENDER_HEADROOM = float(os.environ.get("RESOURCE_RECOMMENDER_HEADROOM", "1.2"))
+RESOURCE_RECOMMENDER_MIN_SAMPLES = int(os.environ.get("RESOURCE_RECOMMENDER_MIN_SAMPLES", "100"))
+
+# Sessions no client has been connected to for SESSION_IDLE_TIMEOUT_MINUTES are
+# stopped before their expiry; the session worker probes them every
+# IDLE_CHECK_INTERVAL_SECONDS. 0 disables idle detection.
+SESSION_IDLE_TIMEOUT_MINUTES = int(os.environ.get("SESSION_IDLE_TIMEOUT_MINUTES", "15"))
+IDLE_CHECK_INTERVAL_SECONDS = int(os.environ.get("IDLE_CHECK_INTERVAL_SECONDS", "60"))
+
+# Hibernated sessions (scaled to zero, Service and Ingress kept for a fast
+# resume) are stopped for good this many minutes after hibernating.
+SESSION_HIBERNATE_TTL_MINUTES = int(os.environ.get("SESSION_HIBERNATE_TTL_MINUTES", "240"))
+
+# How sessions are reached: "ingress" creates one Ingress per session; "shared"
+# keeps a host -> Service table that Traefik polls from /routing/traefik/ (HTTP
+# provider, sending ROUTING_TOKEN as a bearer token), so starting a session
+# creates no routing object. The generated routers use these entrypoints,
+# middlewares (comma-separated, provider-qualified) and TLS options.
+SESSION_ROUTING = os.environ.get("SESSION_ROUTING", "ingress")
+ROUTING_TOKEN = os.environ.get("ROUTING_TOKEN", "")
+SESSION_ROUTE_ENTRYPOINTS = [
+    e for e in os.environ.get("SESSION_ROUTE_ENTRYPOINTS", "websecure").split(",") if e
+]
+SESSION_ROUTE_MIDDLEWARES = [
+    m for m in os.environ.get("SESSION_ROUTE_MIDDLEWARES", "").split(",") if m
+]
+SESSION_ROUTE_TLS_OPTIONS = os.environ.get(
+    "SESSION_ROUTE_TLS_OPTIONS", "apps-require-cf-client-cert@kubernetescrd"
+)
+
+# Without the cluster state cache, session status lookups are shared through the
+# cache backend: one lookup per session is in flight at a time, other callers wait
+# up to STATUS_LOOKUP_WAIT_SECONDS for it, and the result is reused for
+# STATUS_CACHE_TTL_SECONDS. 0 disables sharing.
+STATUS_CACHE_TTL_SECONDS = float(os.environ.get("STATUS_CACHE_TTL_SECONDS", "2"))
+STATUS_LOOKUP_WAIT_SECONDS = float(os.environ.get("STATUS_LOOKUP_WAIT_SECONDS", "5"))
+
+# Sessions per deletecollection label selector when tearing down a lab at once.
+TEARDOWN_BATCH_SIZE = int(os.environ.get("TEARDOWN_BATCH_SIZE", "100"))
+
+# Bearer token Prometheus must send to scrape /metrics/. Unset disables the endpoint.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+# Directory the gunicorn workers of one pod share their metrics through, so
+# /metrics/ returns the totals of every worker (entrypoint.sh sets it). Empty:
+# each scrape only sees the worker that served it.
+METRICS_MULTIPROCESS_DIR = os.environ.get("METRICS_MULTIPROCESS_DIR", "")
+METRICS_PUBLISH_SECONDS = int(os.environ.get("METRICS_PUBLISH_SECONDS", "5"))
+
+# Background workers for asynchronous start/stop operations (/operations/<id>/).
+OPERATION_WORKERS = int(os.environ.get("OPERATION_WORKERS", "8"))
+# Concurrent session starts of a group pre-start (/apps/<app_name>/prestart/).
+PRESTART_WORKERS = int(os.environ.get("PRESTART_WORKERS", "8"))
+# Extra minutes a pre-started session may go without a client before idle
+# detection stops it, so students have time to arrive.
+PRESTART_IDLE_GRACE_MINUTES = int(os.environ.get("PRESTART_IDLE_GRACE_MINUTES", "30"))
+
+# Session expiry reaper (manage.py session_worker). The worker sleeps until the
+# next expiry but re-checks at least this often; expired sessions are deleted
+# in batches of this size.
+SESSION_REAPER_INTERVAL_SECONDS = int(os.environ.get("SESSION_REAPER_INTERVAL_SECONDS", "15"))
+SESSION_REAPER_BATCH_SIZE = int(os.environ.get("SESSION_REAPER_BATCH_SIZE", "50"))
+
+# Capacity-aware admission of session starts. Starts that don't fit the
+# allocatable CPU/memory of the nodes wait in a fair queue; the session worker
+# polls it at this interval while it is not empty.
+ADMISSION_CONTROL_ENABLED = os.environ.get("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+ADMISSION_POLL_SECONDS = int(os.environ.get("ADMISSION_POLL_SECONDS", "2"))
+# An admitted start that has not released its ticket after this long died
+# (worker killed, timeout); the session worker frees its capacity.
+ADMISSION_TICKET_TTL_SECONDS = int(os.environ.get("ADMISSION_TICKET_TTL_SECONDS", "600"))
+
+# Drift reconciler (manage.py reconcile_sessions, also run by session_worker).
+# Rows and resources changed within the grace period are left alone.
+RECONCILE_INTERVAL_SECONDS = int(os.environ.get("RECONCILE_INTERVAL_SECONDS", "300"))
+RECONCILE_GRACE_SECONDS = int(os.environ.get("RECONCILE_GRACE_SECONDS", "120"))
+
 # SECURITY WARNING: don't run with debug turned on in production!
 
 
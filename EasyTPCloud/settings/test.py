@@ -55,6 +55,15 @@ LOGGING = {
     },
 }
 
+# Never start Kubernetes watch threads in tests
+K8S_STATE_CACHE_ENABLED = False
+
+# No client-side rate limiting of the mocked Kubernetes API
+K8S_API_QPS = 0
+
+# Starts skip capacity checks unless a test enables them
+ADMISSION_CONTROL_ENABLED = False
+
 # Email backend for tests
 EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
 
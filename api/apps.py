@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        # Share this worker's metrics with the others (METRICS_MULTIPROCESS_DIR)
+        from .metrics import start_publishing
+
+        start_publishing()
@@ -1,31 +1,57 @@
 from functools import wraps
+from inspect import iscoroutinefunction
 
 from rest_framework import status
 from rest_framework.response import Response
 
-from main.utils.turnstile import verify_turnstile
+from main.utils.turnstile import averify_turnstile, verify_turnstile
+
+
+def _token_and_ip(request):
+    token = request.data.get("turnstile_token")
+    client_ip = request.META.get("HTTP_CF_CONNECTING_IP", request.META.get("REMOTE_ADDR"))
+    return token, client_ip
+
+
+def _missing_token():
+    return Response(
+        {"detail": "Turnstile token is required."},
+        status=status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def _failed():
+    return Response(
+        {"detail": "Bot verification failed."},
+        status=status.HTTP_403_FORBIDDEN,
+    )
 
 
 def require_turnstile(view_func):
-    """Decorator that validates a Cloudflare Turnstile token before allowing the view to proceed."""
+    """Decorator that validates a Cloudflare Turnstile token before allowing the view to proceed.
+
+    Works on sync and async (ASGI) view methods.
+    """
+    if iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def async_wrapper(self, request, *args, **kwargs):
+            token, client_ip = _token_and_ip(request)
+            if not token:
+                return _missing_token()
+            if not await averify_turnstile(token, remote_ip=client_ip):
+                return _failed()
+            return await view_func(self, request, *args, **kwargs)
+
+        return async_wrapper
 
     @wraps(view_func)
     def wrapper(self, request, *args, **kwargs):
-        token = request.data.get("turnstile_token")
+        token, client_ip = _token_and_ip(request)
         if not token:
-            return Response(
-                {"detail": "Turnstile token is required."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        client_ip = request.META.get("HTTP_CF_CONNECTING_IP", request.META.get("REMOTE_ADDR"))
-
+            return _missing_token()
         if not verify_turnstile(token, remote_ip=client_ip):
-            return Response(
-                {"detail": "Bot verification failed."},
-                status=status.HTTP_403_FORBIDDEN,
-            )
-
+            return _failed()
         return view_func(self, request, *args, **kwargs)
 
     return wrapper
@@ -0,0 +1,60 @@
+"""Prometheus metrics served at ``/metrics/``.
+
+Each gunicorn worker records its own Kubernetes API, rate limiter and
+Turnstile metrics. With ``METRICS_MULTIPROCESS_DIR`` set, every worker
+publishes them to that directory and a scrape of any worker returns the
+totals of all of them (see :class:`shared.utils.prometheus.MultiProcessMetrics`);
+without it a scrape only sees the worker that served it.
+"""
+
+import threading
+
+from django.conf import settings
+
+from main.utils.turnstile import get_verifier
+from shared.kubernetes.metrics import metric_families
+from shared.utils.prometheus import MultiProcessMetrics
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def process_families():
+    """This process's metric families."""
+    return metric_families() + get_verifier().metric_families()
+
+
+def get_exporter():
+    """Return the process-wide exporter, or ``None`` without a metrics directory."""
+    global _exporter
+    if not settings.METRICS_MULTIPROCESS_DIR:
+        return None
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = MultiProcessMetrics(
+                    process_families,
+                    settings.METRICS_MULTIPROCESS_DIR,
+                    settings.METRICS_PUBLISH_SECONDS,
+                )
+    return _exporter
+
+
+def start_publishing():
+    """Start publishing this process's metrics for the other workers' scrapes."""
+    exporter = get_exporter()
+    if exporter is not None:
+        exporter.start()
+
+
+def scrape_families():
+    """The metric families a scrape returns: every worker's, or this one's."""
+    exporter = get_exporter()
+    return exporter.families() if exporter is not None else process_families()
+
+
+def reset_exporter():
+    """Forget the exporter so it is rebuilt from settings (used by tests)."""
+    global _exporter
+    with _exporter_lock:
+        _exporter = None
@@ -0,0 +1,73 @@
+"""Background execution of pod start/stop requests as pollable operations."""
+
+import logging
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from main.models import Operation
+from shared.utils.threading import get_executor
+
+logger = logging.getLogger(__name__)
+
+
+def _executor():
+    return get_executor("operations", settings.OPERATION_WORKERS)
+
+
+def _update(operation_id, **fields):
+    # update() keeps concurrent progress writes from clobbering each other
+    Operation.objects.filter(pk=operation_id).update(**fields)
+
+
+def run_operation(operation_id, func):
+    """Run ``func(progress)`` and record its outcome on the operation.
+
+    ``func`` receives a ``progress(percent, message)`` callback and returns
+    the JSON-serialisable result stored on success.
+    """
+
+    def progress(percent, message=""):
+        _update(operation_id, progress=percent, message=message)
+
+    _update(operation_id, status=Operation.RUNNING)
+    try:
+        result = func(progress)
+    except Exception as e:
+        logger.error("Operation %s failed: %s", operation_id, e)
+        _update(operation_id, status=Operation.FAILED, error=str(e))
+    else:
+        _update(
+            operation_id,
+            status=Operation.SUCCEEDED,
+            progress=100,
+            message="Done",
+            result=result or {},
+        )
+
+
+def _run_in_thread(operation_id, func):
+    try:
+        run_operation(operation_id, func)
+    finally:
+        # Worker threads open their own connections; don't leak them
+        connections.close_all()
+
+
+def submit_operation(kind, requested_by, pod, func, app_name=None):
+    """Create an operation for ``pod`` and run ``func`` on the background executor.
+
+    ``pod`` may be ``None`` for operations spanning several sessions, which
+    pass ``app_name`` instead. Returns the new ``Operation`` immediately, in
+    the pending state.
+    """
+    operation = Operation.objects.create(
+        kind=kind,
+        requested_by=requested_by,
+        pod=pod,
+        app_name=app_name or pod.app_name,
+        message="Queued",
+    )
+    # Only hand off once the row is visible to the worker's connection
+    transaction.on_commit(lambda: _executor().submit(_run_in_thread, operation.id, func))
+    return operation
@@ -0,0 +1,21 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets views negotiate ``text/event-stream``.
+
+    Streaming views return a ``StreamingHttpResponse`` directly; this renderer
+    only formats the error responses DRF produces for them (401, 403, 404) as
+    a single ``error`` event.
+    """
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return f"event: error\ndata: {json.dumps(data)}\n\n".encode(self.charset)
@@ -2,7 +2,7 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 
-from main.models import AccessGroup, App, DefaultUser, Instances, Pod, UserActivity
+from main.models import AccessGroup, App, DefaultUser, Instances, Operation, Pod, UserActivity
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -44,7 +44,8 @@ class AppSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = App
-        fields = ["id", "name", "image", "app_type", "groups"]
+        fields = ["id", "name", "image", "app_type", "groups", "prepull_status"]
+        read_only_fields = ["prepull_status"]
 
 
 class PodSerializer(serializers.ModelSerializer):
@@ -89,6 +90,31 @@ class InstanceSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "date_created", "date_modified"]
 
 
+class OperationSerializer(serializers.ModelSerializer):
+    """Serializer for background start/stop operations"""
+
+    pod_name = serializers.CharField(source="pod.pod_name", read_only=True, default=None)
+    finished = serializers.BooleanField(source="is_finished", read_only=True)
+
+    class Meta:
+        model = Operation
+        fields = [
+            "id",
+            "kind",
+            "app_name",
+            "pod_name",
+            "status",
+            "finished",
+            "progress",
+            "message",
+            "result",
+            "error",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
 class UserActivitySerializer(serializers.ModelSerializer):
     """Serializer for user activities"""
 
@@ -30,15 +30,24 @@ urlpatterns = [
     path("", views.LandingPageView.as_view(), name="landing"),
     path("dashboard/", views.DashboardView.as_view(), name="dashboard"),
     path("apps/", views.AppsView.as_view(), name="apps"),
+    path("apps/<str:app_name>/events/", views.AppEventsView.as_view(), name="app_events"),
+    path("apps/<str:app_name>/extend/", views.ExtendSessionView.as_view(), name="extend_session"),
+    path("apps/<str:app_name>/prestart/", views.PrestartGroupView.as_view(), name="prestart_group"),
     # Pod management
     path("start/<str:app_name>/", views.StartPodView.as_view(), name="start_pod"),
     path("stop/<str:app_name>/", views.StopPodView.as_view(), name="stop_pod"),
+    path("sessions/teardown/", views.TeardownSessionsView.as_view(), name="teardown_sessions"),
+    path("operations/<uuid:operation_id>/", views.OperationView.as_view(), name="operation"),
     # File management
     path("files/", views.FileExplorerView.as_view(), name="file_explorer_root"),
     path("files/<path:path>/", views.FileExplorerView.as_view(), name="file_explorer"),
     path("download/<path:path>/", views.DownloadFileView.as_view(), name="download_file"),
     # User activities (admin only)
     path("usage_statistics/", views.UserActivitiesView.as_view(), name="user_activities"),
+    # Prometheus scrape endpoint (bearer token)
+    path("metrics/", views.MetricsView.as_view(), name="metrics"),
+    # Shared session routing table (Traefik HTTP provider, bearer token)
+    path("routing/traefik/", views.TraefikRoutingView.as_view(), name="traefik_routing"),
     # CI webhook
     path("webhook/update-image/", views.UpdateAppImageView.as_view(), name="update_image"),
 ]
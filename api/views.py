@@ -1,20 +1,25 @@
 import base64
 import binascii
-import hashlib
+import hmac
+import json
+import logging
 import os
 import uuid
 from datetime import timedelta
 
+from django.conf import settings
 from django.core.exceptions import SuspiciousOperation
 from django.core.paginator import Paginator
 from django.db.models import Q
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import never_cache
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
@@ -22,7 +27,7 @@ from rest_framework_simplejwt.views import TokenRefreshView
 
 from api.decorators import require_turnstile
 from main.forms import ActivityFilterForm
-from main.models import AccessGroup, App, DefaultUser, Instances, Pod, UserActivity
+from main.models import AccessGroup, App, DefaultUser, Operation, Pod, UserActivity
 from main.throttling import CloudflareScopedRateThrottle
 from main.utils.activity_logger import ActivityLogger
 
@@ -35,25 +40,116 @@ from shared.files import (
     save_file_secure,
     validate_and_sanitize_path,
 )
-from shared.kubernetes import (
-    create_ingress,
-    create_service,
-    delete_ingress,
-    deploy_app,
-    display_apps,
-    load_k8s_config,
+from shared.kubernetes import display_apps
+from shared.kubernetes.admission import queue_positions, request_start
+from shared.kubernetes.pods import empty_stages, iter_session_status, status_payload
+from shared.kubernetes.prepull import start_prepull
+from shared.kubernetes.routing import shared_routing, traefik_config
+from shared.kubernetes.sessions import (
+    extend_session,
+    hibernate_session,
+    prestart_group,
+    session_filter,
+    session_limit,
+    start_session,
+    stop_session,
+    teardown_sessions,
 )
-from shared.kubernetes.cleanup import create_cleanup_job
+from shared.utils.prometheus import render
+from shared.utils.threading import take_slot
 
-from .permissions import CanAccessApp, IsAdminUser
+from .metrics import scrape_families
+from .operations import submit_operation
+from .permissions import CanAccessApp, IsAdminUser, IsTeacherOrAdmin
+from .renderers import EventStreamRenderer
 from .serializers import (
     FileUploadSerializer,
     LoginSerializer,
+    OperationSerializer,
     SignupSerializer,
     UserActivitySerializer,
     UserSerializer,
 )
 
+logger = logging.getLogger(__name__)
+
+
+def get_target_user(request, user_id):
+    """Return the user a pod action applies to.
+
+    Admins and teachers may act on another user's pod by passing ``user_id``;
+    everyone else always acts on their own. Returns ``None`` if ``user_id``
+    does not match a user.
+    """
+    user = request.user
+    if user_id and user.role not in [DefaultUser.STUDENT, DefaultUser.GUEST]:
+        try:
+            return DefaultUser.objects.get(id=user_id)
+        except DefaultUser.DoesNotExist:
+            return None
+    return user
+
+
+def request_flag(request, name):
+    """Read a boolean option from the request body or query string."""
+    value = request.data.get(name, request.query_params.get(name, False))
+    return value is True or str(value).lower() in ["true", "1"]
+
+
+def wants_async(request):
+    """Whether the client asked for a pod action to run as a background operation."""
+    return request_flag(request, "async")
+
+
+def wait_timeout(request):
+    """Seconds a ``wait=true`` start may block, capped at ``START_WAIT_MAX_SECONDS``."""
+    limit = settings.START_WAIT_MAX_SECONDS
+    value = request.data.get("timeout", request.query_params.get("timeout", limit))
+    try:
+        return max(0.0, min(float(value), limit))
+    except (TypeError, ValueError):
+        return limit
+
+
+def wait_until_ready(pod, instance, timeout):
+    """Block until ``pod``'s session is ready, has failed or ``timeout`` passes.
+
+    Driven by the cluster state cache's watches when it runs, so waiting
+    costs no API calls. Returns the final start response payload.
+    """
+    last = status_payload(empty_stages())
+    for current in iter_session_status(pod.pod_name, timeout=timeout, heartbeat=timeout):
+        if current is not None:
+            last = current
+
+    return {
+        **last,
+        "pod_name": pod.pod_name,
+        "novnc_url": instance.novnc_url,
+        "deployment_status": last["ready"],
+        "is_deployed": True,
+        "timed_out": not last["ready"] and last["status"] != "error",
+    }
+
+
+def has_bearer_token(request, token):
+    """Whether the request carries ``Authorization: Bearer <token>``."""
+    expected = f"Bearer {token}"
+    provided = request.headers.get("Authorization", "").encode()
+    return hmac.compare_digest(provided, expected.encode())
+
+
+def operation_accepted(operation):
+    """202 response pointing the client at an operation's status resource."""
+    return Response(
+        {
+            "operation_id": str(operation.id),
+            "status": operation.status,
+            "status_url": reverse("api:operation", args=[operation.id]),
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
+
 
 class CustomTokenRefreshView(TokenRefreshView):
     """Token refresh that identifies the user for activity logging"""
@@ -324,64 +420,72 @@ class StartPodView(APIView):
     permission_classes = [IsAuthenticated, CanAccessApp]
 
     def post(self, request, app_name):
-        user = request.user
-        user_id = request.data.get("user_id")
-
-        # Handle user_id for admin/teacher roles
-        if user_id and user.role not in [DefaultUser.STUDENT, DefaultUser.GUEST]:
-            try:
-                target_user = DefaultUser.objects.get(id=user_id)
-            except DefaultUser.DoesNotExist:
-                return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-        else:
-            target_user = user
+        target_user = get_target_user(request, request.data.get("user_id"))
+        if target_user is None:
+            return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
         # Get app and pod - let Http404 propagate naturally
         app = get_object_or_404(App, name=app_name)
         pod = get_object_or_404(Pod, pod_user=target_user, app_name=app_name)
 
+        release_wait = None
+        if request_flag(request, "wait") and not wants_async(request):
+            # Every waiting start holds a server thread until the session is ready
+            release_wait = take_slot("start-wait", settings.START_WAIT_MAX_CONCURRENT)
+            if release_wait is None:
+                response = Response(
+                    {
+                        "error": "Too many starts waiting, start without wait and poll "
+                        f"/apps/ or follow /apps/{app.name}/events/ instead"
+                    },
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                )
+                response["Retry-After"] = str(settings.SSE_HEARTBEAT_SECONDS)
+                return response
+
         try:
-            cleaned_username = target_user.username.replace("_", "-").replace(".", "-").lower()
-            readonly_volume = target_user.role in [DefaultUser.STUDENT, DefaultUser.GUEST]
-
-            # Deploy the app
-            deploy_app(
-                username=target_user.username,
-                pod_name=pod.pod_name,
-                app_name=app_name.lower(),
-                image=app.image,
-                vnc_password=hashlib.md5(pod.pod_vnc_password.encode("utf-8")).hexdigest(),
-                user_hostname=cleaned_username,
-                readonly=readonly_volume,
-                app_type=app.app_type,
-            )
+            return self.start(request, app, pod, target_user)
+        finally:
+            if release_wait:
+                release_wait()
+
+    def start(self, request, app, pod, target_user):
+        if not pod.is_deployed or pod.hibernated_at is not None:
+            # Wait for cluster capacity instead of piling Pending pods onto the nodes
+            ticket = request_start(pod, app)
+            if ticket is not None:
+                position = queue_positions([pod]).get(pod.pk)
+                return Response(
+                    {
+                        "status": "queued",
+                        "message": f"Waiting for cluster capacity (position {position} in queue)",
+                        "pod_name": pod.pod_name,
+                        "novnc_url": None,
+                        "deployment_status": False,
+                        "is_deployed": False,
+                        "ready": False,
+                        "stages": empty_stages(),
+                        "queue_position": position,
+                    }
+                )
 
-            pod.is_deployed = True
-            pod.save()
+        if wants_async(request):
 
-            # Create service and ingress
-            create_service(pod_name=pod.pod_name, app_name=app_name.lower())
-            novnc_url = create_ingress(
-                pod_name=pod.pod_name, app_name=app_name.lower(), user_hostname=cleaned_username
-            )
+            def start(progress):
+                instance = start_session(pod, app, target_user, request, progress=progress)
+                return {"pod_name": pod.pod_name, "novnc_url": instance.novnc_url}
 
-            # Update instance
-            instance, created = Instances.objects.get_or_create(pod=pod, instance_name=pod.pod_name)
-            if novnc_url:
-                instance.novnc_url = f"https://{novnc_url}"
-                instance.save()
+            operation = submit_operation(Operation.START, request.user, pod, start)
+            return operation_accepted(operation)
 
-            # Log activity
-            ActivityLogger.log_pod_start(target_user, app_name, pod.pod_name, request)
+        try:
+            # Admitted above; create_session_resources makes the Deployment, then
+            # its owned Service and Ingress concurrently, rolling back on failure
+            instance = start_session(pod, app, target_user, request)
 
-            # Schedule cleanup job (per-app session duration)
-            job_name = create_cleanup_job(
-                pod.pod_name,
-                app_name.lower(),
-                delay_seconds=app.session_duration_minutes * 60,
-            )
-            pod.cleanup_job_name = job_name
-            pod.save(update_fields=["cleanup_job_name"])
+            if request_flag(request, "wait"):
+                # Scripted clients get one response once the session is reachable
+                return Response(wait_until_ready(pod, instance, wait_timeout(request)))
 
             return Response(
                 {
@@ -411,78 +515,250 @@ class StopPodView(APIView):
     permission_classes = [IsAuthenticated, CanAccessApp]
 
     def post(self, request, app_name):
-        user = request.user
-        user_id = request.data.get("user_id")
-
-        # Handle user_id for admin/teacher roles
-        if user_id and user.role not in [DefaultUser.STUDENT, DefaultUser.GUEST]:
-            try:
-                target_user = DefaultUser.objects.get(id=user_id)
-            except DefaultUser.DoesNotExist:
-                return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-        else:
-            target_user = user
+        target_user = get_target_user(request, request.data.get("user_id"))
+        if target_user is None:
+            return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
         # Get pod - let Http404 propagate naturally
         pod = get_object_or_404(Pod, pod_user=target_user, app_name=app_name)
 
+        if request_flag(request, "hibernate"):
+            return self.hibernate(request, pod, target_user)
+
+        if wants_async(request):
+
+            def stop(progress):
+                progress(10, "Deleting resources...")
+                stop_session(pod, target_user, request)
+                return {"pod_name": pod.pod_name}
+
+            operation = submit_operation(Operation.STOP, request.user, pod, stop)
+            return operation_accepted(operation)
+
         try:
-            # Cancel any scheduled stop task FIRST
-            pod.cancel_scheduled_stop()
+            stop_session(pod, target_user, request)
 
-            # Import Kubernetes clients
-            from kubernetes import client
-            from kubernetes.client.rest import ApiException
+            return Response(
+                {
+                    "status": "stopped",
+                    "message": "Pod stopped successfully",
+                    "pod_name": pod.pod_name,
+                }
+            )
 
-            # Load Kubernetes config
-            load_k8s_config()
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            api_instance = client.CoreV1Api()
-            apps_instance = client.AppsV1Api()
+    def hibernate(self, request, pod, target_user):
+        """Scale the session to zero, keeping its routing for a fast resume."""
+        if not pod.is_deployed:
+            return Response({"error": "Session is not running"}, status=status.HTTP_409_CONFLICT)
 
-            pod_name = pod.pod_name
-            app_name_lower = app_name.lower()
+        try:
+            if not hibernate_session(pod, target_user, request):
+                return Response(
+                    {"error": "Session is not running"}, status=status.HTTP_409_CONFLICT
+                )
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response(
+            {
+                "status": "hibernated",
+                "message": "Pod hibernated successfully",
+                "pod_name": pod.pod_name,
+                "expires_at": pod.expires_at,
+            }
+        )
+
+
+class ExtendSessionView(APIView):
+    """Push a running session's expiry forward (keep-alive)"""
+
+    permission_classes = [IsAuthenticated, CanAccessApp]
+
+    def post(self, request, app_name):
+        target_user = get_target_user(request, request.data.get("user_id"))
+        if target_user is None:
+            return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        app = get_object_or_404(App, name=app_name)
+        pod = get_object_or_404(Pod, pod_user=target_user, app_name=app_name)
+
+        if not pod.is_deployed or pod.hibernated_at is not None:
+            return Response({"error": "Session is not running"}, status=status.HTTP_409_CONFLICT)
+        if pod.cleanup_job_name or session_limit(pod, app) is None:
+            # Sessions stopped by a legacy cleanup Job keep their schedule
+            return Response(
+                {"error": "This session cannot be extended"}, status=status.HTTP_409_CONFLICT
+            )
 
-            # Delete Kubernetes resources
+        minutes = request.data.get("minutes", request.query_params.get("minutes"))
+        if minutes is not None:
             try:
-                # Delete deployment
-                apps_instance.delete_namespaced_deployment(
-                    name=f"{app_name_lower}-deployment-{pod_name}", namespace="apps"
+                minutes = int(minutes)
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": "minutes must be an integer"}, status=status.HTTP_400_BAD_REQUEST
                 )
 
-                # Delete service
-                api_instance.delete_namespaced_service(
-                    name=f"{app_name_lower}-service-{pod_name}", namespace="apps"
-                )
+        expires_at = extend_session(pod, app, minutes)
+        limit = session_limit(pod, app)
+        return Response(
+            {
+                "pod_name": pod.pod_name,
+                "expires_at": expires_at,
+                "max_expires_at": limit,
+                "can_extend": expires_at < limit,
+            }
+        )
 
-                # Delete ingress
-                delete_ingress(pod_name, app_name_lower)
 
-            except ApiException:
-                # Log but don't fail if resources don't exist
-                pass
+class PrestartGroupView(APIView):
+    """Start an app for every student of an access group ahead of a lab"""
 
-            # Update pod status
-            pod.is_deployed = False
-            pod.save()
+    permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
 
-            # Delete instance record
-            try:
-                instance = Instances.objects.get(pod=pod, instance_name=pod_name)
-                instance.delete()
-            except Instances.DoesNotExist:
-                pass  # Instance already deleted
+    def post(self, request, app_name):
+        group_name = request.data.get("group")
+        if not group_name:
+            return Response({"error": "Specify a group"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Log activity
-            ActivityLogger.log_pod_stop(target_user, app_name, pod_name, request)
+        app = get_object_or_404(App, name=app_name)
+        group = get_object_or_404(AccessGroup, name=group_name)
+
+        def prestart(progress):
+            progress(0, f"Starting {app.name} for {group.name}...")
+            return prestart_group(app, group, progress=progress)
+
+        operation = submit_operation(
+            Operation.PRESTART, request.user, None, prestart, app_name=app.name
+        )
+        return operation_accepted(operation)
 
+
+class TeardownSessionsView(APIView):
+    """Stop every session of an access group, an app and/or all guests at once"""
+
+    permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
+
+    def post(self, request):
+        group_name = request.data.get("group")
+        app_name = request.data.get("app")
+        guests = request_flag(request, "guests")
+        if not group_name and not app_name and not guests:
             return Response(
-                {"status": "stopped", "message": "Pod stopped successfully", "pod_name": pod_name}
+                {"error": "Specify a group, an app or guests"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
+        group = get_object_or_404(AccessGroup, name=group_name) if group_name else None
+        app = get_object_or_404(App, name=app_name) if app_name else None
+
+        try:
+            stopped = teardown_sessions(session_filter(group, app, guests), request)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        return Response({"status": "stopped", "stopped": stopped})
+
+
+class _ReleasingStream:
+    """Iterates ``stream`` and calls ``release`` once the response is closed.
+
+    Django closes the streaming content even when it was never iterated, which
+    a generator's ``finally`` would miss.
+    """
+
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    def __iter__(self):
+        return self.stream
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            self.release()
+
+
+class AppEventsView(APIView):
+    """Server-Sent Events stream of a session's deployment stage transitions"""
+
+    permission_classes = [IsAuthenticated, CanAccessApp]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    @staticmethod
+    def _event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    def _stream(self, pod):
+        if not pod.is_deployed:
+            yield self._event("status", status_payload(empty_stages()))
+            yield self._event("end", {})
+            return
+
+        last = None
+        for current in iter_session_status(
+            pod.pod_name,
+            timeout=settings.SSE_STREAM_TIMEOUT_SECONDS,
+            heartbeat=settings.SSE_HEARTBEAT_SECONDS,
+        ):
+            if current is None:
+                yield ": keepalive\n\n"
+                continue
+            last = current
+            yield self._event("status", current)
+
+        if last is not None and (last["ready"] or last["status"] == "error"):
+            yield self._event("end", {})
+        else:
+            # Client may reconnect to keep waiting
+            yield self._event("timeout", {})
+
+    @method_decorator(never_cache)
+    def get(self, request, app_name):
+        target_user = get_target_user(request, request.query_params.get("user_id"))
+        if target_user is None:
+            return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        pod = get_object_or_404(Pod, pod_user=target_user, app_name=app_name)
+
+        # Every open stream holds a server thread until it ends
+        release = take_slot("sse", settings.SSE_MAX_STREAMS)
+        if release is None:
+            response = Response(
+                {"error": "Too many open event streams, poll /apps/ instead"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            response["Retry-After"] = str(settings.SSE_HEARTBEAT_SECONDS)
+            return response
+
+        response = StreamingHttpResponse(
+            _ReleasingStream(self._stream(pod), release), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Disable proxy buffering so events are delivered as they happen
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class OperationView(APIView):
+    """Progress and result of a background start/stop operation"""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, operation_id):
+        operations = Operation.objects.select_related("pod")
+        # Students and guests only see their own operations
+        if request.user.role in [DefaultUser.STUDENT, DefaultUser.GUEST]:
+            operations = operations.filter(requested_by=request.user)
+
+        operation = get_object_or_404(operations, pk=operation_id)
+        return Response(OperationSerializer(operation).data)
+
 
 class FileExplorerView(APIView):
     """File explorer endpoint"""
@@ -892,6 +1168,41 @@ class UserActivitiesView(APIView):
         )
 
 
+class MetricsView(APIView):
+    """Prometheus metrics of every worker process (Kubernetes API, Turnstile)"""
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        # Disabled unless a scrape token is configured
+        if not settings.METRICS_TOKEN:
+            raise Http404
+
+        if not has_bearer_token(request, settings.METRICS_TOKEN):
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        return HttpResponse(render(scrape_families()), content_type="text/plain; version=0.0.4")
+
+
+class TraefikRoutingView(APIView):
+    """Shared session routing table for Traefik's HTTP provider"""
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    renderer_classes = [JSONRenderer]
+
+    def get(self, request):
+        # Disabled unless shared routing is on and a token is configured
+        if not shared_routing() or not settings.ROUTING_TOKEN:
+            raise Http404
+
+        if not has_bearer_token(request, settings.ROUTING_TOKEN):
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response(traefik_config())
+
+
 class UpdateAppImageView(APIView):
     """CI webhook to update app image tag after build."""
 
@@ -916,6 +1227,15 @@ class UpdateAppImageView(APIView):
             image_name = app.image.split(":")[0].lower()
             app.image = f"{image_name}:{image_tag}"
             app.save()
-            return Response({"status": "updated", "image": app.image})
+            try:
+                # Pull the new tag onto every node before the first session needs it
+                start_prepull(app)
+                app.save(update_fields=["prepull_status"])
+            except Exception:
+                # Best effort: sessions still pull on demand
+                logger.exception("Failed to start image pre-pull of %s", app.image)
+            return Response(
+                {"status": "updated", "image": app.image, "prepull_status": app.prepull_status}
+            )
         except App.DoesNotExist:
             return Response({"error": "App not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -4,4 +4,21 @@ set -e
 
 python manage.py collectstatic --settings=EasyTPCloud.settings.production --noinput
 
-exec gunicorn --bind :8000 --workers 3 EasyTPCloud.wsgi
+# Workers share their metrics through this directory, so a /metrics/ scrape
+# returns the totals of all of them; start from an empty one.
+export METRICS_MULTIPROCESS_DIR="${METRICS_MULTIPROCESS_DIR:-/tmp/easytp-metrics}"
+rm -rf "$METRICS_MULTIPROCESS_DIR"
+mkdir -p "$METRICS_MULTIPROCESS_DIR"
+
+# Threaded workers: long-lived event streams (/apps/<app>/events/) hold a
+# thread, not a whole worker process. Each worker serves at most
+# SSE_MAX_STREAMS (16) streams of up to SSE_STREAM_TIMEOUT_SECONDS (120s) and
+# START_WAIT_MAX_CONCURRENT (8) wait=true starts, so with the defaults a pod
+# holds 3 x 16 = 48 concurrent streams (a class of 30 plus teachers) and
+# still has 3 x 8 threads free for starts, stops and status requests. Raise
+# GUNICORN_THREADS along with either limit.
+exec gunicorn --bind :8000 \
+    --workers "${GUNICORN_WORKERS:-3}" \
+    --worker-class gthread \
+    --threads "${GUNICORN_THREADS:-32}" \
+    EasyTPCloud.wsgi
@@ -104,9 +104,15 @@ class AppAdmin(admin.ModelAdmin):
         "name",
         "app_type",
         "session_duration_minutes",
+        "max_session_minutes",
         "groups",
     )
-    list_editable = ("app_type", "session_duration_minutes")
+    list_editable = (
+        "app_type",
+        "session_duration_minutes",
+        "max_session_minutes",
+    )
+    readonly_fields = ("prepull_status",)
     form = CustomAppForm
 
 
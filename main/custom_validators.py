@@ -58,6 +58,19 @@ def validate_emails_in_file(file):
         )
 
 
+def validate_quantity(value):
+    """Validate a Kubernetes resource quantity such as ``600m`` or ``512Mi``."""
+    # Import here so the models module does not depend on the kubernetes client
+    from kubernetes.utils import parse_quantity
+
+    try:
+        parse_quantity(value)
+    except ValueError as e:
+        raise ValidationError(
+            _("Invalid resource quantity: %(value)s"), params={"value": value}
+        ) from e
+
+
 def validate_file_size(file):
     filesize = file.size
 
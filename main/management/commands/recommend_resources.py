@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import App
+from shared.kubernetes.usage import apply_recommendation, recommend_resources
+
+
+class Command(BaseCommand):
+    help = "Recommend session CPU/memory requests per app from sampled usage"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--app", help="Only this app (default: every app)")
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Days of samples to use (default: USAGE_SAMPLE_RETENTION_DAYS)",
+        )
+        parser.add_argument(
+            "--percentile",
+            type=int,
+            default=None,
+            help="Usage percentile requests are sized for (default: RESOURCE_RECOMMENDER_PERCENTILE)",
+        )
+        parser.add_argument(
+            "--apply", action="store_true", help="Save the recommendations on the apps"
+        )
+
+    def handle(self, *args, **options):
+        apps = App.objects.order_by("name")
+        if options["app"]:
+            apps = apps.filter(name=options["app"])
+            if not apps.exists():
+                raise CommandError(f"App {options['app']} does not exist")
+
+        for app in apps:
+            recommendation = recommend_resources(
+                app, days=options["days"], pct=options["percentile"]
+            )
+            if recommendation is None:
+                self.stdout.write(f"{app.name}: not enough usage samples yet")
+                continue
+
+            current = recommendation["current"]
+            self.stdout.write(
+                f"{app.name} ({recommendation['samples']} samples): "
+                f"cpu request {current['cpu_request']} -> {recommendation['cpu_request']}, "
+                f"cpu limit {current['cpu_limit']} -> {recommendation['cpu_limit']}, "
+                f"memory request {current['memory_request']} -> "
+                f"{recommendation['memory_request']}, "
+                f"memory limit {current['memory_limit']} -> {recommendation['memory_limit']}"
+            )
+            if options["apply"]:
+                apply_recommendation(app, recommendation)
+                self.stdout.write(self.style.SUCCESS(f"Applied to {app.name}"))
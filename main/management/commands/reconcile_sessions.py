@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from shared.kubernetes.reconcile import reconcile_sessions
+
+
+class Command(BaseCommand):
+    help = "Reconcile Pod rows with the session resources in the cluster"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=None,
+            help="Seconds to leave recent changes alone (default: RECONCILE_GRACE_SECONDS)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            result = reconcile_sessions(grace_seconds=options["grace"])
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error occurred: {str(e)}"))
+            raise
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Marked {result['marked_stopped']} pods stopped, "
+                f"deleted {result['instances_deleted']} instances and "
+                f"{result['orphans_deleted']} orphaned sessions"
+            )
+        )
@@ -0,0 +1,142 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from main.models import AdmissionTicket, App
+from shared.kubernetes.idle import detect_idle_sessions
+from shared.kubernetes.prepull import refresh_prepull_status
+from shared.kubernetes.reconcile import reconcile_sessions
+from shared.kubernetes.sessions import next_expiry, reap_expired_sessions, start_queued_sessions
+from shared.kubernetes.usage import sample_usage
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the session worker that stops expired sessions, starts queued ones, "
+        "tracks image pre-pulls, samples resource usage, "
+        "stops idle sessions and reconciles drift"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run a single pass (reap expired sessions, admit queued starts, "
+            "refresh image pre-pulls) and exit",
+        )
+
+    def tick(self):
+        """Reap every expired session, returning how many were stopped."""
+        total = 0
+        while True:
+            reaped = reap_expired_sessions()
+            total += reaped
+            if reaped < settings.SESSION_REAPER_BATCH_SIZE:
+                return total
+
+    def admit_queued(self):
+        """Start queued sessions that fit the cluster now."""
+        try:
+            started = start_queued_sessions()
+            if started:
+                self.stdout.write(f"Started {started} queued sessions")
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error admitting queued sessions: {str(e)}"))
+
+    def refresh_prepulls(self):
+        """Update the per-node status of image pre-pulls still in progress."""
+        for app in App.objects.filter(prepull_status__complete=False):
+            try:
+                refresh_prepull_status(app)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Error checking {app.name} pre-pull: {str(e)}"))
+
+    def reconcile(self):
+        """Reconcile Pod rows with the cluster at most every RECONCILE_INTERVAL_SECONDS."""
+        now = time.monotonic()
+        if (
+            now - getattr(self, "last_reconcile", float("-inf"))
+            < settings.RECONCILE_INTERVAL_SECONDS
+        ):
+            return
+        self.last_reconcile = now
+        try:
+            result = reconcile_sessions()
+            if any(result.values()):
+                self.stdout.write(f"Reconciled sessions: {result}")
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error reconciling sessions: {str(e)}"))
+
+    def sample_usage(self):
+        """Record session resource usage at most every USAGE_SAMPLE_INTERVAL_SECONDS."""
+        now = time.monotonic()
+        if (
+            now - getattr(self, "last_sample", float("-inf"))
+            < settings.USAGE_SAMPLE_INTERVAL_SECONDS
+        ):
+            return
+        self.last_sample = now
+        try:
+            sample_usage()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error sampling resource usage: {str(e)}"))
+
+    def check_idle(self):
+        """Stop sessions nobody is connected to at most every IDLE_CHECK_INTERVAL_SECONDS."""
+        now = time.monotonic()
+        if (
+            now - getattr(self, "last_idle_check", float("-inf"))
+            < settings.IDLE_CHECK_INTERVAL_SECONDS
+        ):
+            return
+        self.last_idle_check = now
+        try:
+            result = detect_idle_sessions()
+            if result["stopped"]:
+                self.stdout.write(f"Scheduled {result['stopped']} idle sessions to stop")
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error checking idle sessions: {str(e)}"))
+
+    def sleep_seconds(self):
+        """Sleep until the next expiry, re-checking at least every interval.
+
+        Never less than a second, so an expiry the reaper could not act on
+        yet does not turn the loop into a busy wait.
+        """
+        interval = settings.SESSION_REAPER_INTERVAL_SECONDS
+        if AdmissionTicket.objects.filter(state=AdmissionTicket.WAITING).exists():
+            interval = min(interval, settings.ADMISSION_POLL_SECONDS)
+        expires_at = next_expiry()
+        if expires_at is None:
+            return interval
+        return max(1, min(interval, (expires_at - timezone.now()).total_seconds()))
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            reaped = self.tick()
+            self.admit_queued()
+            self.refresh_prepulls()
+            self.stdout.write(self.style.SUCCESS(f"Stopped {reaped} expired sessions"))
+            return
+
+        self.stdout.write("Session worker started")
+        while True:
+            close_old_connections()
+            try:
+                reaped = self.tick()
+                if reaped:
+                    self.stdout.write(f"Stopped {reaped} expired sessions")
+                self.admit_queued()
+                self.refresh_prepulls()
+                self.reconcile()
+                self.sample_usage()
+                self.check_idle()
+                delay = self.sleep_seconds()
+            except Exception as e:
+                # Rows were rolled back; they are retried on the next pass
+                self.stdout.write(self.style.ERROR(f"Error reaping sessions: {str(e)}"))
+                delay = settings.SESSION_REAPER_INTERVAL_SECONDS
+            time.sleep(delay)
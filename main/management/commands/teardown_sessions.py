@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import AccessGroup, App
+from shared.kubernetes.sessions import session_filter, teardown_sessions
+
+
+class Command(BaseCommand):
+    help = "Stop every session of an access group, an app and/or all guests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--group", help="Access group name")
+        parser.add_argument("--app", help="App name")
+        parser.add_argument("--guests", action="store_true", help="Sessions of guest users")
+
+    def handle(self, *args, **options):
+        if not options["group"] and not options["app"] and not options["guests"]:
+            raise CommandError("Specify --group, --app or --guests")
+
+        group = app = None
+        try:
+            if options["group"]:
+                group = AccessGroup.objects.get(name=options["group"])
+            if options["app"]:
+                app = App.objects.get(name=options["app"])
+        except (AccessGroup.DoesNotExist, App.DoesNotExist) as e:
+            raise CommandError(str(e)) from e
+
+        try:
+            stopped = teardown_sessions(session_filter(group, app, options["guests"]))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error occurred: {str(e)}"))
+            raise
+
+        self.stdout.write(self.style.SUCCESS(f"Stopped {stopped} sessions"))
@@ -0,0 +1,32 @@
+# Generated by Django 6.1.2 on 2026-10-17 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0007_operation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pod",
+            name="expires_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                help_text="When the session_worker reaper stops this session",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="pod",
+            name="cleanup_job_name",
+            field=models.CharField(
+                blank=True,
+                help_text="K8s Job name for scheduled cleanup (sessions started before the reaper)",
+                max_length=255,
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-17 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0008_pod_expires_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="app",
+            name="warm_pool_size",
+            field=models.PositiveSmallIntegerField(
+                default=0,
+                help_text="noVNC only: pre-started sessions kept ready for students and guests. They have no personal storage mounted, only the read-only share.",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.1.2 on 2026-10-17 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0009_app_warm_pool_size"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="app",
+            name="prepull_status",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text="Per-node pull progress of the current image, set by the image webhook",
+            ),
+        ),
+    ]
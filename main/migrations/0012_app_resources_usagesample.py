@@ -0,0 +1,85 @@
+# Generated by Django 6.1.2 on 2026-10-17 01:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+import main.custom_validators
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0011_admissionticket"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="app",
+            name="cpu_limit",
+            field=models.CharField(
+                blank=True,
+                help_text="CPU limit of a session, e.g. 700m. Blank: app type default.",
+                max_length=16,
+                validators=[main.custom_validators.validate_quantity],
+            ),
+        ),
+        migrations.AddField(
+            model_name="app",
+            name="cpu_request",
+            field=models.CharField(
+                blank=True,
+                help_text="CPU request of a session, e.g. 300m. Blank: app type default.",
+                max_length=16,
+                validators=[main.custom_validators.validate_quantity],
+            ),
+        ),
+        migrations.AddField(
+            model_name="app",
+            name="memory_limit",
+            field=models.CharField(
+                blank=True,
+                help_text="Memory limit of a session, e.g. 512Mi. Blank: app type default.",
+                max_length=16,
+                validators=[main.custom_validators.validate_quantity],
+            ),
+        ),
+        migrations.AddField(
+            model_name="app",
+            name="memory_request",
+            field=models.CharField(
+                blank=True,
+                help_text="Memory request of a session, e.g. 256Mi. Blank: app type default.",
+                max_length=16,
+                validators=[main.custom_validators.validate_quantity],
+            ),
+        ),
+        migrations.CreateModel(
+            name="UsageSample",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("pod_name", models.CharField(max_length=50)),
+                ("cpu_millicores", models.PositiveIntegerField()),
+                ("memory_mib", models.PositiveIntegerField()),
+                (
+                    "sampled_at",
+                    models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+                ),
+                (
+                    "app",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="usage_samples",
+                        to="main.app",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-sampled_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.1.2 on 2026-10-17 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0012_app_resources_usagesample"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pod",
+            name="last_active_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Last time a client was seen connected to the session",
+                null=True,
+            ),
+        ),
+    ]
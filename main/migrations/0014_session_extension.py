@@ -0,0 +1,27 @@
+# Generated by Django 6.1.2 on 2026-10-17 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0013_pod_last_active_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="app",
+            name="max_session_minutes",
+            field=models.PositiveSmallIntegerField(
+                default=60,
+                help_text="Longest a session may run when extended, counted from its start. 0 disables extending.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="pod",
+            name="started_at",
+            field=models.DateTimeField(
+                blank=True, help_text="When the current session was started", null=True
+            ),
+        ),
+    ]
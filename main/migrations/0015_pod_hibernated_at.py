@@ -0,0 +1,21 @@
+# Generated by Django 6.1.2 on 2026-10-17 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0014_session_extension"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pod",
+            name="hibernated_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the session was scaled to zero; its Service and Ingress are kept",
+                null=True,
+            ),
+        ),
+    ]
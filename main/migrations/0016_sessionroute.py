@@ -0,0 +1,36 @@
+# Generated by Django 6.1.2 on 2026-10-17 01:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0015_pod_hibernated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SessionRoute",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("host", models.CharField(max_length=255, unique=True)),
+                ("service_name", models.CharField(max_length=255)),
+                ("port", models.PositiveIntegerField(default=8080)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "pod",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="route",
+                        to="main.pod",
+                    ),
+                ),
+            ],
+        ),
+    ]
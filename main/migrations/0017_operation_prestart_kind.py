@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-17 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0016_sessionroute"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="operation",
+            name="kind",
+            field=models.CharField(
+                choices=[("start", "Start"), ("stop", "Stop"), ("prestart", "Group pre-start")],
+                max_length=20,
+            ),
+        ),
+    ]
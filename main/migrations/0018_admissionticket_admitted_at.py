@@ -0,0 +1,17 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0017_operation_prestart_kind"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="admissionticket",
+            name="admitted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0018_admissionticket_admitted_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pod",
+            name="prestarted",
+            field=models.BooleanField(
+                default=False,
+                help_text="Started by a group pre-start and no client has connected yet",
+            ),
+        ),
+    ]
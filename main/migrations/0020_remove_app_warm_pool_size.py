@@ -0,0 +1,16 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0019_pod_prestarted"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="app",
+            name="warm_pool_size",
+        ),
+    ]
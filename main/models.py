@@ -4,14 +4,16 @@ import uuid
 
 import openpyxl
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
 from django.db import models
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from .custom_functions import autotask
-from .custom_validators import validate_emails_in_file
+from .custom_validators import validate_emails_in_file, validate_quantity
 
 
 @autotask
@@ -76,10 +78,73 @@ class App(models.Model):
         default=5,
         help_text=_("Minutes before the session is auto-stopped/cleaned up."),
     )
+    max_session_minutes = models.PositiveSmallIntegerField(
+        default=60,
+        help_text=_(
+            "Longest a session may run when extended, counted from its start. 0 disables extending."
+        ),
+    )
+    prepull_status = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text=_("Per-node pull progress of the current image, set by the image webhook"),
+    )
+    # Session container resources; blank keeps the default of the app type
+    cpu_request = models.CharField(
+        max_length=16,
+        blank=True,
+        validators=[validate_quantity],
+        help_text=_("CPU request of a session, e.g. 300m. Blank: app type default."),
+    )
+    cpu_limit = models.CharField(
+        max_length=16,
+        blank=True,
+        validators=[validate_quantity],
+        help_text=_("CPU limit of a session, e.g. 700m. Blank: app type default."),
+    )
+    memory_request = models.CharField(
+        max_length=16,
+        blank=True,
+        validators=[validate_quantity],
+        help_text=_("Memory request of a session, e.g. 256Mi. Blank: app type default."),
+    )
+    memory_limit = models.CharField(
+        max_length=16,
+        blank=True,
+        validators=[validate_quantity],
+        help_text=_("Memory limit of a session, e.g. 512Mi. Blank: app type default."),
+    )
 
     def __str__(self):
         return f"{self.name}"
 
+    def clean(self):
+        # Import here to avoid circular imports
+        from kubernetes.utils import parse_quantity
+
+        from shared.kubernetes.deployments import app_resources
+
+        # The API server rejects a container whose request exceeds its limit
+        resources = app_resources(self)
+        errors = {}
+        for name, request_field, limit_field in (
+            ("cpu", "cpu_request", "cpu_limit"),
+            ("memory", "memory_request", "memory_limit"),
+        ):
+            request, limit = resources["requests"][name], resources["limits"][name]
+            try:
+                exceeds = parse_quantity(request) > parse_quantity(limit)
+            except ValueError:
+                continue  # Reported by validate_quantity
+            if exceeds:
+                field = request_field if getattr(self, request_field) else limit_field
+                errors[field] = ValidationError(
+                    _("The %(name)s request (%(request)s) exceeds the limit (%(limit)s)."),
+                    params={"name": name, "request": request, "limit": limit},
+                )
+        if errors:
+            raise ValidationError(errors)
+
     def groups(self):
         return ", ".join([g.name for g in self.group.all()])
 
@@ -233,19 +298,55 @@ class Pod(models.Model):
         max_length=255,
         null=True,
         blank=True,
-        help_text=_("K8s Job name for scheduled cleanup"),
+        help_text=_("K8s Job name for scheduled cleanup (sessions started before the reaper)"),
     )
 
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text=_("When the session_worker reaper stops this session"),
+    )
+    hibernated_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_("When the session was scaled to zero; its Service and Ingress are kept"),
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_("When the current session was started"),
+    )
+    last_active_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_("Last time a client was seen connected to the session"),
+    )
+    prestarted = models.BooleanField(
+        default=False,
+        help_text=_("Started by a group pre-start and no client has connected yet"),
+    )
+
+    def schedule_stop(self, delay):
+        """Have the reaper stop this session ``delay`` (a timedelta) from now."""
+        self.expires_at = timezone.now() + delay
+        Pod.objects.filter(pk=self.pk).update(expires_at=self.expires_at)
+
     def cancel_scheduled_stop(self):
-        """Cancel any pending cleanup job by deleting it."""
+        """Cancel any scheduled stop of this session."""
+        cancelled = self.expires_at is not None
+        self.expires_at = None
+        Pod.objects.filter(pk=self.pk).update(expires_at=None)
+
         if self.cleanup_job_name:
+            # Legacy per-session kubectl Job
             from shared.kubernetes.cleanup import delete_cleanup_job
 
             delete_cleanup_job(self.cleanup_job_name)
             self.cleanup_job_name = None
             self.save(update_fields=["cleanup_job_name"])
             return True
-        return False
+        return cancelled
 
     def __str__(self):
         return f"{self.pod_user.username}:{self.pod_name}:{self.app_name}"
@@ -291,6 +392,114 @@ class Instances(models.Model):
         return f"{self.pod}:{self.instance_name}"
 
 
+class Operation(models.Model):
+    """A pod start/stop or group pre-start running in the background (/operations/<id>/)"""
+
+    START = "start"
+    STOP = "stop"
+    PRESTART = "prestart"
+    KINDS = [
+        (START, "Start"),
+        (STOP, "Stop"),
+        (PRESTART, "Group pre-start"),
+    ]
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUSES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KINDS)
+    requested_by = models.ForeignKey(
+        DefaultUser, on_delete=models.CASCADE, related_name="operations"
+    )
+    pod = models.ForeignKey(
+        Pod, on_delete=models.CASCADE, null=True, blank=True, related_name="operations"
+    )
+    app_name = models.CharField(max_length=200, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    progress = models.PositiveSmallIntegerField(default=0, help_text=_("Percent complete"))
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def is_finished(self):
+        return self.status in [self.SUCCEEDED, self.FAILED]
+
+    def __str__(self):
+        return f"{self.kind}:{self.app_name}:{self.status}"
+
+
+class AdmissionTicket(models.Model):
+    """A session start waiting for, or just granted, cluster capacity"""
+
+    WAITING = "waiting"
+    ADMITTED = "admitted"
+    STATES = [
+        (WAITING, "Waiting"),
+        (ADMITTED, "Admitted"),
+    ]
+
+    pod = models.OneToOneField(Pod, on_delete=models.CASCADE, related_name="admission_ticket")
+    group = models.ForeignKey(
+        AccessGroup, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    app_name = models.CharField(max_length=200)
+    cpu_millicores = models.PositiveIntegerField()
+    memory_mib = models.PositiveIntegerField()
+    state = models.CharField(max_length=10, choices=STATES, default=WAITING, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Admitted tickets are expired after ADMISSION_TICKET_TTL_SECONDS
+    admitted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at", "pk"]
+
+    def __str__(self):
+        return f"{self.pod}:{self.state}"
+
+
+class UsageSample(models.Model):
+    """CPU and memory used by one running session, sampled from metrics.k8s.io"""
+
+    app = models.ForeignKey(App, on_delete=models.CASCADE, related_name="usage_samples")
+    pod_name = models.CharField(max_length=50)
+    cpu_millicores = models.PositiveIntegerField()
+    memory_mib = models.PositiveIntegerField()
+    sampled_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["-sampled_at"]
+
+    def __str__(self):
+        return f"{self.pod_name}@{self.sampled_at}"
+
+
+class SessionRoute(models.Model):
+    """Host -> Service entry of the shared routing table (SESSION_ROUTING=shared)"""
+
+    pod = models.OneToOneField(Pod, on_delete=models.CASCADE, related_name="route")
+    host = models.CharField(max_length=255, unique=True)
+    service_name = models.CharField(max_length=255)
+    port = models.PositiveIntegerField(default=8080)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.host} -> {self.service_name}:{self.port}"
+
+
 class UserActivity(models.Model):
     """Model to track user activities"""
 
@@ -148,9 +148,11 @@ class ActivityLogger:
         )
 
     @staticmethod
-    def log_pod_stop(user, app_name, pod_name, request=None):
+    def log_pod_stop(user, app_name, pod_name, request=None, hibernated=False):
         """Log pod stop"""
         details = {"app_name": app_name, "pod_name": pod_name}
+        if hibernated:
+            details["hibernated"] = True
         ActivityLogger.log_activity(
             user=user, activity_type=UserActivity.POD_STOP, request=request, details=details
         )
@@ -1,8 +1,12 @@
 import logging
+import threading
+import time
 
 import requests
 from django.conf import settings
 
+from shared.utils.threading import get_executor
+
 logger = logging.getLogger(__name__)
 
 # Cloudflare Realtime TURN credential-generation endpoint. Returns an iceServers
@@ -11,13 +15,29 @@ _CF_TURN_URL = (
     "https://rtc.live.cloudflare.com/v1/turn/keys/{key_id}/credentials/generate-ice-servers"
 )
 
+# After a failed mint, starts go without TURN for this long instead of each
+# waiting on Cloudflare again.
+RETRY_AFTER_FAILURE_SECONDS = 30
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _http():
+    """Keep-alive session shared by every credential request."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = requests.Session()
+    return _session
 
-def generate_turn_credentials(ttl=86400):
-    """Mint short-lived Cloudflare TURN credentials.
+
+def mint_turn_credentials(ttl):
+    """Mint new Cloudflare TURN credentials valid for ``ttl`` seconds.
 
     Returns a ``(username, credential)`` tuple, or ``None`` when TURN is not
-    configured or the API call fails — callers should degrade gracefully
-    (deploy without TURN env) rather than break the deploy.
+    configured or the API call fails.
     """
     key_id = settings.CLOUDFLARE_TURN_KEY_ID
     api_token = settings.CLOUDFLARE_TURN_API_TOKEN
@@ -26,7 +46,7 @@ def generate_turn_credentials(ttl=86400):
         return None
 
     try:
-        resp = requests.post(
+        resp = _http().post(
             _CF_TURN_URL.format(key_id=key_id),
             headers={"Authorization": f"Bearer {api_token}"},
             json={"ttl": ttl},
@@ -53,3 +73,95 @@ def generate_turn_credentials(ttl=86400):
 
     logger.error("Cloudflare TURN response had no credentialed iceServers entry")
     return None
+
+
+class TurnCredentialCache:
+    """Process-wide cache of minted TURN credentials.
+
+    Credentials are reused until less than ``TURN_CREDENTIAL_MIN_VALIDITY_SECONDS``
+    of their TTL is left, so every session started with them can still relay
+    for its whole duration. Once less than ``TURN_CREDENTIAL_REFRESH_AHEAD_SECONDS``
+    is left a replacement is minted in the background while the current ones
+    keep being served. Concurrent callers that find no usable credentials share
+    a single request to Cloudflare.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._credentials = None
+        self._expires_at = 0.0
+        self._failed_at = float("-inf")
+        # Set once the request in flight (if any) has finished
+        self._inflight = None
+
+    def _usable(self, now):
+        margin = settings.TURN_CREDENTIAL_MIN_VALIDITY_SECONDS
+        return self._credentials is not None and now < self._expires_at - margin
+
+    def _fetch(self, done):
+        ttl = settings.TURN_CREDENTIAL_TTL_SECONDS
+        started = time.monotonic()
+        credentials = None
+        try:
+            credentials = mint_turn_credentials(ttl)
+        finally:
+            with self._lock:
+                if credentials:
+                    self._credentials = credentials
+                    self._expires_at = started + ttl
+                else:
+                    self._failed_at = time.monotonic()
+                self._inflight = None
+            done.set()
+
+    def get(self):
+        """Return cached ``(username, credential)``, minting them if needed, or ``None``."""
+        now = time.monotonic()
+        with self._lock:
+            if self._usable(now):
+                refresh_at = self._expires_at - settings.TURN_CREDENTIAL_REFRESH_AHEAD_SECONDS
+                recently_failed = now - self._failed_at < RETRY_AFTER_FAILURE_SECONDS
+                if now >= refresh_at and self._inflight is None and not recently_failed:
+                    self._inflight = threading.Event()
+                    get_executor("turn-credentials", 1).submit(self._fetch, self._inflight)
+                return self._credentials
+
+            if now - self._failed_at < RETRY_AFTER_FAILURE_SECONDS:
+                return None
+            done = self._inflight
+            leader = done is None
+            if leader:
+                done = self._inflight = threading.Event()
+
+        if leader:
+            self._fetch(done)
+        else:
+            done.wait()
+
+        with self._lock:
+            return self._credentials if self._usable(time.monotonic()) else None
+
+    def clear(self):
+        with self._lock:
+            self._credentials = None
+            self._expires_at = 0.0
+            self._failed_at = float("-inf")
+
+
+_cache = TurnCredentialCache()
+
+
+def generate_turn_credentials():
+    """Return short-lived Cloudflare TURN credentials for a webrtc deploy.
+
+    Returns a ``(username, credential)`` tuple, or ``None`` when TURN is not
+    configured or the API call fails — callers should degrade gracefully
+    (deploy without TURN env) rather than break the deploy. Credentials come
+    from a process-wide cache, so most starts make no request to Cloudflare.
+    """
+    return _cache.get()
+
+
+def clear_turn_credentials():
+    """Forget the cached credentials (used by tests and after rotating the TURN key)."""
+    _cache.clear()
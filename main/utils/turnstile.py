@@ -1,19 +1,174 @@
+import logging
+import threading
+import time
+
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from shared.utils.prometheus import Histogram, MetricFamily
+
+logger = logging.getLogger(__name__)
+
+VERIFY_URL = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
+
+# Upper bounds (seconds) of the verification latency histogram
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Outcomes counted by TurnstileVerifier.stats()
+PASSED = "passed"
+REJECTED = "rejected"
+ERROR = "error"
+SHORT_CIRCUITED = "short_circuited"
+
+
+class TurnstileVerifier:
+    """Cloudflare Turnstile verification with a latency budget and a circuit breaker.
+
+    Requests share one keep-alive ``requests.Session`` and give up after
+    ``timeout`` seconds. After ``failure_threshold`` consecutive errors
+    (timeouts, connection errors, 5xx) the breaker opens and tokens are not
+    sent to Cloudflare for ``reset_seconds``; one trial request is let
+    through afterwards. While Cloudflare is unreachable, ``fail_open``
+    decides whether requests are let in or rejected.
+    """
+
+    def __init__(self, secret_key, timeout, failure_threshold, reset_seconds, fail_open):
+        self.secret_key = secret_key
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.fail_open = fail_open
+
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._counts = {outcome: 0 for outcome in (PASSED, REJECTED, ERROR, SHORT_CIRCUITED)}
+        self._latency = Histogram(LATENCY_BUCKETS)
+
+    def _allow_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            # Half-open: let this request through as a trial; the rest stay
+            # short-circuited until it succeeds
+            self._opened_at = time.monotonic()
+            return True
+
+    def _record(self, outcome, elapsed=None):
+        with self._lock:
+            self._counts[outcome] += 1
+            if outcome == ERROR:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    if self._opened_at is None:
+                        logger.warning("Turnstile circuit opened after %d errors", self._failures)
+                    self._opened_at = time.monotonic()
+            elif outcome != SHORT_CIRCUITED:
+                self._failures = 0
+                self._opened_at = None
+            if elapsed is not None:
+                self._latency.observe(elapsed)
+
+    def verify(self, token, remote_ip=None):
+        """Verify a Turnstile token. Returns True if the request may proceed."""
+        if not self._allow_request():
+            self._record(SHORT_CIRCUITED)
+            return self.fail_open
+
+        payload = {"secret": self.secret_key, "response": token}
+        if remote_ip:
+            payload["remoteip"] = remote_ip
+
+        start = time.monotonic()
+        try:
+            resp = self._session.post(VERIFY_URL, data=payload, timeout=self.timeout)
+            resp.raise_for_status()
+            success = bool(resp.json().get("success", False))
+        except (requests.RequestException, ValueError) as exc:
+            self._record(ERROR, time.monotonic() - start)
+            logger.error("Turnstile verification failed: %s", exc)
+            return self.fail_open
+
+        self._record(PASSED if success else REJECTED, time.monotonic() - start)
+        return success
+
+    async def averify(self, token, remote_ip=None):
+        """Async :meth:`verify` for ASGI views; the request runs in a worker thread."""
+        return await sync_to_async(self.verify, thread_sensitive=False)(token, remote_ip)
+
+    @property
+    def circuit_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+    def stats(self):
+        """Outcome counters, breaker state and the latency histogram (cumulative buckets)."""
+        with self._lock:
+            return {
+                "outcomes": dict(self._counts),
+                "circuit_open": self._opened_at is not None,
+                "latency_buckets": dict(self._latency.cumulative()),
+                "latency_count": self._latency.count,
+                "latency_sum": round(self._latency.sum, 6),
+            }
+
+    def metric_families(self):
+        """Verification outcomes, latency and breaker state as Prometheus metric families."""
+        outcomes = MetricFamily(
+            "easytp_turnstile_verifications_total", "counter", "Turnstile verifications by outcome."
+        )
+        latency = MetricFamily(
+            "easytp_turnstile_request_duration_seconds",
+            "histogram",
+            "Latency of Turnstile siteverify requests.",
+        )
+        circuit = MetricFamily(
+            "easytp_turnstile_circuit_open", "gauge", "1 while the Turnstile circuit is open."
+        )
+        with self._lock:
+            for outcome, count in self._counts.items():
+                outcomes.add((("outcome", outcome),), count)
+            latency.add((), self._latency.copy())
+            circuit.add((), int(self._opened_at is not None))
+        return [outcomes, latency, circuit]
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier():
+    """Return the process-wide :class:`TurnstileVerifier`, built from settings on first use."""
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier = TurnstileVerifier(
+                    secret_key=settings.TURNSTILE_SECRET_KEY,
+                    timeout=settings.TURNSTILE_TIMEOUT_SECONDS,
+                    failure_threshold=settings.TURNSTILE_BREAKER_FAILURES,
+                    reset_seconds=settings.TURNSTILE_BREAKER_RESET_SECONDS,
+                    fail_open=settings.TURNSTILE_FAIL_OPEN,
+                )
+    return _verifier
+
+
+def reset_verifier():
+    """Drop the verifier so the next call rebuilds it from settings (used by tests)."""
+    global _verifier
+    with _verifier_lock:
+        _verifier = None
+
 
 def verify_turnstile(token, remote_ip=None):
     """Verify a Cloudflare Turnstile token. Returns True if valid."""
-    payload = {
-        "secret": settings.TURNSTILE_SECRET_KEY,
-        "response": token,
-    }
-    if remote_ip:
-        payload["remoteip"] = remote_ip
-
-    resp = requests.post(
-        "https://challenges.cloudflare.com/turnstile/v0/siteverify",
-        data=payload,
-        timeout=5,
-    )
-    return resp.json().get("success", False)
+    return get_verifier().verify(token, remote_ip=remote_ip)
+
+
+async def averify_turnstile(token, remote_ip=None):
+    """Async :func:`verify_turnstile` for ASGI views."""
+    return await get_verifier().averify(token, remote_ip=remote_ip)
@@ -1,10 +1,12 @@
 # Kubernetes operation utilities
-from .config import load_k8s_config
+from .config import apps_v1, core_v1, load_k8s_config
 from .deployments import create_ingress, create_service, delete_ingress, deploy_app
 from .pods import display_apps, generate_pod_if_not_exist
 
 __all__ = [
     "load_k8s_config",
+    "core_v1",
+    "apps_v1",
     "create_service",
     "create_ingress",
     "delete_ingress",
@@ -0,0 +1,283 @@
+"""Capacity-aware admission of session starts.
+
+Before a session's Deployment is created, its CPU and memory requests are
+checked against what the cluster can still hold: the allocatable resources
+of the schedulable nodes minus the requests of every Deployment in the
+``apps`` namespace and of the starts already admitted. Starts that fit go
+ahead; the rest wait in ``AdmissionTicket`` rows and are admitted by the
+session worker as capacity frees up, first in, first out within an access
+group and round-robin across groups, so one class cannot starve another.
+"""
+
+import logging
+import time
+from datetime import timedelta
+from threading import Lock
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .config import apps_v1, core_v1
+from .deployments import app_resources, cpu_millicores, memory_mib
+from .informer import NAMESPACE, get_synced_cluster_state
+
+logger = logging.getLogger(__name__)
+
+NODE_CACHE_SECONDS = 10
+
+# Key of the Postgres advisory lock serialising admission decisions
+ADMISSION_LOCK_KEY = 0x45545041  # "ETPA"
+
+_nodes_lock = Lock()
+_nodes_cache = {"at": float("-inf"), "allocatable": (0, 0)}
+
+
+def session_requests(app):
+    """Return the (CPU millicores, memory MiB) a session of ``app`` requests."""
+    requests = app_resources(app)["requests"]
+    return cpu_millicores(requests.get("cpu")), memory_mib(requests.get("memory"))
+
+
+def _allocatable():
+    """Sum the allocatable CPU and memory of the Ready, schedulable nodes.
+
+    Nodes change rarely, so the result is cached for a few seconds.
+    """
+    with _nodes_lock:
+        if time.monotonic() - _nodes_cache["at"] < NODE_CACHE_SECONDS:
+            return _nodes_cache["allocatable"]
+
+        cpu = memory = 0
+        for node in core_v1().list_node().items:
+            ready = any(
+                c.type == "Ready" and c.status == "True" for c in node.status.conditions or []
+            )
+            if node.spec.unschedulable or not ready:
+                continue
+            cpu += cpu_millicores(node.status.allocatable.get("cpu"))
+            memory += memory_mib(node.status.allocatable.get("memory"))
+
+        _nodes_cache.update(at=time.monotonic(), allocatable=(cpu, memory))
+        return cpu, memory
+
+
+def _committed():
+    """Sum the requests of every Deployment in the namespace (replicas x containers)."""
+    cache = get_synced_cluster_state()
+    if cache is not None:
+        deployments = cache.deployments.items()
+    else:
+        deployments = apps_v1().list_namespaced_deployment(namespace=NAMESPACE).items
+
+    cpu = memory = 0
+    for deployment in deployments:
+        replicas = deployment.spec.replicas if deployment.spec.replicas is not None else 1
+        for container in deployment.spec.template.spec.containers:
+            requests = (container.resources and container.resources.requests) or {}
+            cpu += replicas * cpu_millicores(requests.get("cpu"))
+            memory += replicas * memory_mib(requests.get("memory"))
+    return cpu, memory
+
+
+def cluster_capacity():
+    """Return the (CPU millicores, memory MiB) the nodes hold beyond every Deployment.
+
+    This makes Kubernetes API calls, so it is read before the admission lock
+    is taken; ``free_capacity`` then subtracts the admitted starts under it.
+    """
+    allocatable_cpu, allocatable_memory = _allocatable()
+    committed_cpu, committed_memory = _committed()
+    return allocatable_cpu - committed_cpu, allocatable_memory - committed_memory
+
+
+def _stale(now=None):
+    """Admitted tickets whose start should have finished long ago."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.ADMISSION_TICKET_TTL_SECONDS)
+    return Q(admitted_at__lt=cutoff) | Q(admitted_at__isnull=True)
+
+
+def free_capacity(cluster):
+    """Return the (CPU millicores, memory MiB) still free for new sessions.
+
+    ``cluster`` is the result of ``cluster_capacity``. Admitted starts are
+    counted on top of the Deployments; the overlap while a Deployment
+    already exists for one errs on the side of waiting. Admitted tickets
+    past ``ADMISSION_TICKET_TTL_SECONDS`` no longer count.
+    """
+    # Import here to avoid circular imports
+    from main.models import AdmissionTicket
+
+    cpu, memory = cluster
+    admitted = AdmissionTicket.objects.filter(state=AdmissionTicket.ADMITTED).exclude(_stale())
+    for ticket in admitted:
+        cpu -= ticket.cpu_millicores
+        memory -= ticket.memory_mib
+    return cpu, memory
+
+
+def fair_order(tickets):
+    """Order waiting tickets FIFO within each group, round-robin across groups.
+
+    Groups take turns in the order of their oldest ticket.
+    """
+    queues = {}
+    for ticket in sorted(tickets, key=lambda t: (t.created_at, t.pk)):
+        queues.setdefault(ticket.group_id, []).append(ticket)
+
+    ordered = []
+    queues = list(queues.values())
+    while queues:
+        for queue in queues:
+            ordered.append(queue.pop(0))
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+def _lock_admission():
+    """Serialise admission decisions across web workers and the session worker.
+
+    A transaction-scoped Postgres advisory lock, released on commit: it
+    blocks other admission decisions only, not writes to any table. SQLite
+    (development and tests) has a single writer anyway.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ADMISSION_LOCK_KEY])
+
+
+def request_start(pod, app):
+    """Admit ``pod``'s start now if it fits and nobody is waiting, else queue it.
+
+    Returns ``None`` when the start may go ahead (the caller must start the
+    session; ``release`` is called when it is done), or the waiting
+    ``AdmissionTicket``.
+    """
+    # Import here to avoid circular imports
+    from main.models import AdmissionTicket
+
+    if not settings.ADMISSION_CONTROL_ENABLED:
+        return None
+
+    cpu, memory = session_requests(app)
+    try:
+        cluster = cluster_capacity()
+    except Exception as e:
+        # Don't block starts on a capacity lookup; the scheduler still queues
+        logger.error("Capacity check failed, admitting %s: %s", pod.pod_name, e)
+        cluster = None
+
+    with transaction.atomic():
+        _lock_admission()
+
+        existing = AdmissionTicket.objects.filter(pod=pod).first()
+        if existing is not None:
+            return existing if existing.state == AdmissionTicket.WAITING else None
+
+        queued = AdmissionTicket.objects.filter(state=AdmissionTicket.WAITING).exists()
+        fits = True
+        if cluster is not None:
+            free_cpu, free_memory = free_capacity(cluster)
+            fits = cpu <= free_cpu and memory <= free_memory
+
+        admitted = fits and not queued
+        ticket = AdmissionTicket.objects.create(
+            pod=pod,
+            group_id=pod.pod_user.group_id,
+            app_name=app.name,
+            cpu_millicores=cpu,
+            memory_mib=memory,
+            state=AdmissionTicket.ADMITTED if admitted else AdmissionTicket.WAITING,
+            admitted_at=timezone.now() if admitted else None,
+        )
+
+    if ticket.state == AdmissionTicket.ADMITTED:
+        return None
+    logger.info("Queued start of %s (needs %sm CPU, %sMi)", pod.pod_name, cpu, memory)
+    return ticket
+
+
+def release(pod):
+    """Drop ``pod``'s ticket once its start finished, failed or was cancelled."""
+    # Import here to avoid circular imports
+    from main.models import AdmissionTicket
+
+    AdmissionTicket.objects.filter(pod=pod).delete()
+
+
+def dispatch():
+    """Admit waiting starts in fair order while they fit.
+
+    A group whose head does not fit keeps its place; smaller starts of other
+    groups may still go ahead. Returns the newly admitted tickets.
+    """
+    # Import here to avoid circular imports
+    from main.models import AdmissionTicket
+
+    if not AdmissionTicket.objects.filter(state=AdmissionTicket.WAITING).exists():
+        return []
+    cluster = cluster_capacity()
+
+    with transaction.atomic():
+        _lock_admission()
+
+        waiting = list(
+            AdmissionTicket.objects.filter(state=AdmissionTicket.WAITING).select_related(
+                "pod__pod_user"
+            )
+        )
+        if not waiting:
+            return []
+
+        cpu, memory = free_capacity(cluster)
+        admitted, blocked_groups = [], set()
+        for ticket in fair_order(waiting):
+            if ticket.group_id in blocked_groups:
+                continue
+            if ticket.cpu_millicores <= cpu and ticket.memory_mib <= memory:
+                cpu -= ticket.cpu_millicores
+                memory -= ticket.memory_mib
+                admitted.append(ticket)
+            else:
+                blocked_groups.add(ticket.group_id)
+
+        AdmissionTicket.objects.filter(pk__in=[t.pk for t in admitted]).update(
+            state=AdmissionTicket.ADMITTED, admitted_at=timezone.now()
+        )
+    return admitted
+
+
+def expire_admissions(now=None):
+    """Delete admitted tickets older than ``ADMISSION_TICKET_TTL_SECONDS``.
+
+    A start that dies between admission and ``release`` (worker killed,
+    request timeout) would otherwise hold its capacity forever. Returns the
+    number of tickets deleted.
+    """
+    # Import here to avoid circular imports
+    from main.models import AdmissionTicket
+
+    expired, _ = (
+        AdmissionTicket.objects.filter(state=AdmissionTicket.ADMITTED).filter(_stale(now)).delete()
+    )
+    if expired:
+        logger.warning("Expired %d admitted starts that never finished", expired)
+    return expired
+
+
+def queue_positions(pods):
+    """Map pod pk -> 1-based position in the admission queue for waiting ``pods``."""
+    # Import here to avoid circular imports
+    from main.models import AdmissionTicket
+
+    pod_ids = {pod.pk for pod in pods}
+    waiting = AdmissionTicket.objects.filter(state=AdmissionTicket.WAITING)
+    if not pod_ids or not waiting.filter(pod_id__in=pod_ids).exists():
+        return {}
+    waiting = list(waiting)
+    return {
+        ticket.pod_id: position
+        for position, ticket in enumerate(fair_order(waiting), start=1)
+        if ticket.pod_id in pod_ids
+    }
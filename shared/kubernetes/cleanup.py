@@ -1,96 +1,64 @@
-"""Kubernetes cleanup job operations."""
+"""Kubernetes cleanup of expired sessions."""
 
 import logging
-from datetime import datetime
 
-from kubernetes import client
 from kubernetes.client.rest import ApiException
 
-from .config import load_k8s_config
+from .config import apps_v1, batch_v1, core_v1, networking_v1
 
 logger = logging.getLogger(__name__)
 
-CLEANUP_IMAGE = "bitnami/kubectl:latest"
 NAMESPACE = "apps"
 
 
-def create_cleanup_job(pod_name: str, app_name: str, delay_seconds: int = 300) -> str:
+def _selector(label, pod_names):
+    return f"{label} in ({','.join(pod_names)})"
+
+
+def delete_session_resources(pod_names, batch_size=50, unowned=()):
     """
-    Create a K8s Job that deletes resources after a delay.
+    Delete the Deployments of many sessions at once.
+
+    Deployments are matched by their per-session label with set-based
+    selectors, so each batch costs one deletecollection call. The garbage
+    collector removes the Services and Ingresses they own; those of
+    ``unowned`` sessions (started before ownerReferences) are deleted
+    explicitly the same way. Missing resources are simply not matched.
 
     Args:
-        pod_name: The pod identifier (hash)
-        app_name: Application name (lowercase)
-        delay_seconds: Delay before cleanup (default: 300 = 5 minutes)
+        pod_names: Pod identifiers (hashes) whose sessions to delete
+        batch_size: Pod names per label selector
+        unowned: Pod identifiers whose Services and Ingresses have no owner
 
-    Returns:
-        str: The job name for tracking/cancellation
+    Raises:
+        ApiException: If a deletecollection call fails
     """
-    load_k8s_config()
-    batch_api = client.BatchV1Api()
-
-    job_name = f"cleanup-{app_name}-{pod_name[:12]}-{int(datetime.now().timestamp())}"
-
-    # Resources to delete
-    deployment_name = f"{app_name}-deployment-{pod_name}"
-    service_name = f"{app_name}-service-{pod_name}"
-    ingress_name = f"{app_name}-ingress-{pod_name}"
-
-    # Command: sleep then delete (kubectl handles missing resources gracefully)
-    cleanup_command = (
-        f"sleep {delay_seconds} && "
-        f"kubectl delete deployment {deployment_name} -n {NAMESPACE} --ignore-not-found && "
-        f"kubectl delete service {service_name} -n {NAMESPACE} --ignore-not-found && "
-        f"kubectl delete ingress {ingress_name} -n {NAMESPACE} --ignore-not-found"
-    )
-
-    job_manifest = {
-        "apiVersion": "batch/v1",
-        "kind": "Job",
-        "metadata": {
-            "name": job_name,
-            "namespace": NAMESPACE,
-            "labels": {
-                "app": "cleanup-job",
-                "target-pod": pod_name,
-                "target-app": app_name,
-            },
-        },
-        "spec": {
-            "ttlSecondsAfterFinished": 60,  # Auto-delete job 1 min after completion
-            "backoffLimit": 1,
-            "template": {
-                "spec": {
-                    "serviceAccountName": "cleanup-job-account",
-                    "restartPolicy": "Never",
-                    "containers": [
-                        {
-                            "name": "cleanup",
-                            "image": CLEANUP_IMAGE,
-                            "command": ["/bin/sh", "-c", cleanup_command],
-                            "resources": {
-                                "requests": {"cpu": "10m", "memory": "32Mi"},
-                                "limits": {"cpu": "100m", "memory": "64Mi"},
-                            },
-                        }
-                    ],
-                },
-            },
-        },
-    }
+    pod_names = sorted(set(pod_names))
+    unowned = sorted(set(unowned))
+
+    for i in range(0, len(pod_names), batch_size):
+        batch = pod_names[i : i + batch_size]
+        apps_v1().delete_collection_namespaced_deployment(
+            namespace=NAMESPACE,
+            label_selector=_selector("deploymentApp", batch),
+            propagation_policy="Background",
+        )
+        logger.info(f"Deleted deployments of {len(batch)} sessions")
 
-    try:
-        batch_api.create_namespaced_job(namespace=NAMESPACE, body=job_manifest)
-        logger.info(f"Created cleanup job: {job_name}")
-        return job_name
-    except ApiException as e:
-        logger.error(f"Failed to create cleanup job: {e}")
-        raise
+    for i in range(0, len(unowned), batch_size):
+        batch = unowned[i : i + batch_size]
+        core_v1().delete_collection_namespaced_service(
+            namespace=NAMESPACE, label_selector=_selector("serviceApp", batch)
+        )
+        networking_v1().delete_collection_namespaced_ingress(
+            namespace=NAMESPACE, label_selector=_selector("ingressApp", batch)
+        )
+        logger.info(f"Deleted unowned services and ingresses of {len(batch)} sessions")
 
 
 def delete_cleanup_job(job_name: str) -> bool:
     """
-    Delete a cleanup job (cancellation).
+    Delete a legacy per-session cleanup job (cancellation).
 
     Args:
         job_name: The name of the job to delete
@@ -98,8 +66,7 @@ def delete_cleanup_job(job_name: str) -> bool:
     Returns:
         bool: True if deleted or already gone, False on error
     """
-    load_k8s_config()
-    batch_api = client.BatchV1Api()
+    batch_api = batch_v1()
 
     try:
         batch_api.delete_namespaced_job(
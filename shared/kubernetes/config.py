@@ -1,16 +1,190 @@
-"""Kubernetes configuration utilities."""
+"""Kubernetes configuration and the process-wide API client registry.
 
-from kubernetes import config
+Configuration is loaded once per process. Every helper in ``shared.kubernetes``
+gets its API objects from :func:`core_v1`, :func:`apps_v1` and friends, which
+all share one :class:`kubernetes.client.ApiClient` and therefore one
+keep-alive urllib3 connection pool. Service-account tokens are re-read when
+they rotate (the in-cluster loader installs a refresh hook), and a changed
+kubeconfig file triggers a reload on the next call. Requests through the
+shared client are rate limited by priority class (see :mod:`.ratelimit`) and
+recorded in the API metrics (see :mod:`.metrics`).
+"""
+
+import os
+import socket
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+from django.conf import settings
+from kubernetes import client, config
+from kubernetes.client import rest
 from kubernetes.config import ConfigException
+from kubernetes.config.kube_config import KUBE_CONFIG_DEFAULT_LOCATION
+from urllib3.connection import HTTPConnection
+
+from .metrics import track_request
+from .ratelimit import current_priority, get_rate_limiter, reset_rate_limiter
+
+# How often (seconds) to check whether the kubeconfig file changed on disk.
+KUBECONFIG_CHECK_INTERVAL = 30
+
+_lock = threading.Lock()
+_api_client = None
+_apis = {}
+_kubeconfig_mtime = None
+_last_check = 0.0
+
+
+def _kubeconfig_path():
+    return os.path.expanduser(KUBE_CONFIG_DEFAULT_LOCATION.split(os.pathsep)[0])
+
+
+def _kubeconfig_mtime_now():
+    try:
+        return os.stat(_kubeconfig_path()).st_mtime
+    except OSError:
+        return None
+
+
+def _keepalive_socket_options():
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+def _is_watch(url, query_params=None):
+    # Newer clients put the query in the URL, older ones pass it as query_params
+    params = parse_qsl(urlsplit(url).query)
+    if isinstance(query_params, dict):
+        query_params = query_params.items()
+    params.extend(query_params or ())
+    return any(name == "watch" and str(value).lower() == "true" for name, value in params)
+
+
+class RateLimitedRESTClient(rest.RESTClientObject):
+    """REST client that takes a rate-limiter token per request and records its metrics.
+
+    Hooked below ``ApiClient.call_api``, whose signature differs between
+    client versions, so the HTTP method, URL and query are the final ones.
+    Watches are exempt from the rate limit.
+    """
+
+    def request(self, method, url, *args, **kwargs):
+        watch = _is_watch(url, kwargs.get("query_params"))
+        if not watch:
+            get_rate_limiter().acquire(current_priority())
+        with track_request(method, url, watch) as result:
+            result["response"] = super().request(method, url, *args, **kwargs)
+        return result["response"]
+
+
+class RateLimitedApiClient(client.ApiClient):
+    """ApiClient whose requests go through :class:`RateLimitedRESTClient`."""
+
+    def __init__(self, configuration=None, *args, **kwargs):
+        super().__init__(configuration, *args, **kwargs)
+        self.rest_client = RateLimitedRESTClient(self.configuration)
+
+
+def _build_configuration():
+    """Load kubeconfig (local development) or in-cluster config (production)."""
+    global _kubeconfig_mtime
+
+    configuration = client.Configuration()
+    try:
+        config.load_kube_config(client_configuration=configuration)
+        _kubeconfig_mtime = _kubeconfig_mtime_now()
+    except ConfigException:
+        # Installs a refresh hook that re-reads the projected service-account
+        # token when it rotates.
+        config.load_incluster_config(client_configuration=configuration)
+        _kubeconfig_mtime = None
+
+    configuration.connection_pool_maxsize = settings.K8S_CONNECTION_POOL_MAXSIZE
+    configuration.socket_options = _keepalive_socket_options()
+    return configuration
+
+
+def _is_stale():
+    """Return True when the kubeconfig the client was built from changed on disk."""
+    global _last_check
+    if _kubeconfig_mtime is None:
+        return False
+    now = time.monotonic()
+    if now - _last_check < KUBECONFIG_CHECK_INTERVAL:
+        return False
+    _last_check = now
+    return _kubeconfig_mtime_now() != _kubeconfig_mtime
+
+
+def get_api_client():
+    """Return the shared :class:`kubernetes.client.ApiClient`, building it on first use."""
+    global _api_client
+    if _api_client is not None and not _is_stale():
+        return _api_client
+    with _lock:
+        if _api_client is None or _is_stale():
+            configuration = _build_configuration()
+            client.Configuration.set_default(configuration)
+            _api_client = RateLimitedApiClient(configuration)
+            _apis.clear()
+    return _api_client
+
+
+def _get_api(api_class_name):
+    api_client = get_api_client()
+    api = _apis.get(api_class_name)
+    if api is None:
+        api = getattr(client, api_class_name)(api_client)
+        _apis[api_class_name] = api
+    return api
+
+
+def core_v1():
+    return _get_api("CoreV1Api")
+
+
+def apps_v1():
+    return _get_api("AppsV1Api")
+
+
+def networking_v1():
+    return _get_api("NetworkingV1Api")
+
+
+def discovery_v1():
+    return _get_api("DiscoveryV1Api")
+
+
+def batch_v1():
+    return _get_api("BatchV1Api")
+
+
+def custom_objects():
+    return _get_api("CustomObjectsApi")
+
+
+def reset_k8s_clients():
+    """Drop the shared client so the next call reloads configuration (used by tests)."""
+    global _api_client, _kubeconfig_mtime, _last_check
+    with _lock:
+        _api_client = None
+        _apis.clear()
+        _kubeconfig_mtime = None
+        _last_check = 0.0
+    reset_rate_limiter()
 
 
 def load_k8s_config():
     """Load Kubernetes configuration.
 
     Attempts to load kubeconfig first (for local development),
-    then falls back to in-cluster config (for production).
+    then falls back to in-cluster config (for production). The configuration
+    is only read once per process and becomes the client default, so API
+    objects created without an explicit ``ApiClient`` share it too.
     """
-    try:
-        config.load_kube_config()
-    except ConfigException:
-        config.load_incluster_config()
+    get_api_client()
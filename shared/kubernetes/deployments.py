@@ -1,26 +1,125 @@
 """Kubernetes deployment, service, and ingress operations."""
 
+import logging
 import os
 
 from django.conf import settings
-from kubernetes import client
 from kubernetes.client.rest import ApiException
+from kubernetes.utils import parse_quantity
 
 from main.utils.cloudflare_turn import generate_turn_credentials
 
-from .config import load_k8s_config
+from .config import apps_v1, core_v1, networking_v1
+from .informer import get_synced_cluster_state
 
+logger = logging.getLogger(__name__)
 
-def create_service(pod_name, app_name):
-    """Create a ClusterIP service for the pod."""
-    load_k8s_config()
+# Parent domain of the per-session hosts
+SESSION_DOMAIN = "melekabderrahmane.com"
 
-    api_instance = client.CoreV1Api()
+
+def session_resources(app_type):
+    """Return the container resources of a session of the given ``app_type``."""
+    if app_type == "webrtc":
+        # Software x264 at 30fps is CPU-heavy; the noVNC 700m limit is far too low.
+        return {
+            "limits": {"ephemeral-storage": "200Mi", "cpu": "3", "memory": "2Gi"},
+            "requests": {"ephemeral-storage": "100Mi", "cpu": "1500m", "memory": "1Gi"},
+        }
+    return {
+        "limits": {"ephemeral-storage": "100Mi", "cpu": "700m", "memory": "512Mi"},
+        "requests": {"ephemeral-storage": "50Mi", "cpu": "600m", "memory": "400Mi"},
+    }
+
+
+def cpu_millicores(value):
+    """Convert a CPU quantity (``600m``, ``1.5``) to millicores."""
+    return int(parse_quantity(value) * 1000) if value else 0
+
+
+def memory_mib(value):
+    """Convert a memory quantity (``512Mi``, ``1G``) to MiB."""
+    return int(parse_quantity(value) / (1024 * 1024)) if value else 0
+
+
+# App field overriding each resource of the app type defaults
+RESOURCE_FIELDS = [
+    ("requests", "cpu", "cpu_request"),
+    ("limits", "cpu", "cpu_limit"),
+    ("requests", "memory", "memory_request"),
+    ("limits", "memory", "memory_limit"),
+]
+
+
+def app_resources(app):
+    """Return the container resources of a session of ``app``.
+
+    Starts from the defaults of the app type; every resource field set on the
+    ``App`` replaces the matching default.
+    """
+    resources = session_resources(app.app_type)
+    for section, name, field in RESOURCE_FIELDS:
+        value = getattr(app, field)
+        if value:
+            resources[section][name] = value
+    return resources
+
+
+def owner_reference(deployment):
+    """Return an ownerReference that makes a resource a dependent of ``deployment``.
+
+    The garbage collector deletes dependents with their owner, so deleting a
+    session's Deployment also removes its Service and Ingress.
+    """
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "name": deployment.metadata.name,
+        "uid": deployment.metadata.uid,
+    }
+
+
+def _adopt(patch, create, manifest, fields=()):
+    """Make an existing session object match ``manifest``'s owner and ``fields``.
+
+    An object left over from a previous session of the pod (a quick stop and
+    start) is still owned by the old Deployment, and the garbage collector
+    would delete it under the new session. Its ``ownerReferences`` and each
+    ``(path, value)`` of ``fields`` are replaced with one JSON patch; if it
+    was collected in the meantime it is created again.
+    """
+    operations = [{"op": "add", "path": path, "value": value} for path, value in fields]
+    operations.append(
+        {
+            "op": "add",
+            "path": "/metadata/ownerReferences",
+            "value": manifest["metadata"].get("ownerReferences", []),
+        }
+    )
+    try:
+        patch(name=manifest["metadata"]["name"], namespace="apps", body=operations)
+    except ApiException as e:
+        if e.status != 404:
+            raise
+        create(namespace="apps", body=manifest)
+
+
+def create_service(pod_name, app_name, owner=None):
+    """Create a ClusterIP service for the pod.
+
+    ``owner`` is an optional ownerReference (see ``owner_reference``).
+    An existing service is taken over (see ``_adopt``); any other API error
+    is raised.
+    """
+    api_instance = core_v1()
 
     manifest = {
         "kind": "Service",
         "apiVersion": "v1",
-        "metadata": {"name": app_name + "-service-" + pod_name, "labels": {"serviceApp": pod_name}},
+        "metadata": {
+            "name": session_service_name(pod_name, app_name),
+            "labels": {"serviceApp": pod_name},
+        },
         "spec": {
             "selector": {"appDep": pod_name},
             "ports": [
@@ -33,24 +132,48 @@ def create_service(pod_name, app_name):
             "type": "ClusterIP",
         },
     }
+    if owner:
+        manifest["metadata"]["ownerReferences"] = [owner]
 
     try:
         _api_response = api_instance.create_namespaced_service(
             namespace="apps", body=manifest, pretty="true"
         )
     except ApiException as e:
-        print("Exception when calling CoreV1Api->create_namespaced_service: %s\n" % e)
+        if e.status != 409:
+            logger.error("Failed to create service for %s: %s", pod_name, e)
+            raise
+        # Already exists (e.g. a repeated start or a quick stop and start)
+        _adopt(
+            api_instance.patch_namespaced_service,
+            api_instance.create_namespaced_service,
+            manifest,
+            [("/spec/selector", manifest["spec"]["selector"])],
+        )
+
+
+def session_host(user_hostname, app_name, domain=SESSION_DOMAIN):
+    """Return the unique host a user's app session is served on."""
+    return f"{user_hostname}-{app_name}.{domain}"
 
 
-def create_ingress(pod_name, app_name, user_hostname, domain="melekabderrahmane.com"):
-    """Create Ingress for noVNC access."""
-    load_k8s_config()
+def session_service_name(pod_name, app_name):
+    """Return the name of the session's ClusterIP service."""
+    return f"{app_name}-service-{pod_name}"
 
-    networking_api = client.NetworkingV1Api()
+
+def create_ingress(pod_name, app_name, user_hostname, domain=SESSION_DOMAIN, owner=None):
+    """Create Ingress for noVNC access and return its host.
+
+    ``owner`` is an optional ownerReference (see ``owner_reference``).
+    An existing ingress is taken over (see ``_adopt``); any other API error
+    is raised.
+    """
+    networking_api = networking_v1()
 
     # Create unique subdomain for each user's app
-    host = f"{user_hostname}-{app_name}.{domain}"
-    service_name = f"{app_name}-service-{pod_name}"
+    host = session_host(user_hostname, app_name, domain)
+    service_name = session_service_name(pod_name, app_name)
 
     manifest = {
         "apiVersion": "networking.k8s.io/v1",
@@ -110,30 +233,135 @@ def create_ingress(pod_name, app_name, user_hostname, domain="melekabderrahmane.
             ]
         },
     }
+    if owner:
+        manifest["metadata"]["ownerReferences"] = [owner]
 
     try:
         _api_response = networking_api.create_namespaced_ingress(namespace="apps", body=manifest)
-        return host  # Return the host URL
     except ApiException as e:
-        print("Exception when calling NetworkingV1Api->create_namespaced_ingress: %s\n" % e)
-        return None
+        if e.status != 409:
+            logger.error("Failed to create ingress for %s: %s", pod_name, e)
+            raise
+        _adopt(
+            networking_api.patch_namespaced_ingress,
+            networking_api.create_namespaced_ingress,
+            manifest,
+        )
+    return host  # Return the host URL
 
 
 def delete_ingress(pod_name, app_name):
     """Delete ingress when stopping pod."""
-    load_k8s_config()
-
-    networking_api = client.NetworkingV1Api()
+    networking_api = networking_v1()
 
     try:
         networking_api.delete_namespaced_ingress(
             name=f"{app_name}-ingress-{pod_name}", namespace="apps"
         )
     except ApiException as e:
-        print("Exception when deleting ingress: %s\n" % e)
+        if e.status != 404:
+            logger.error("Failed to delete ingress of %s: %s", pod_name, e)
 
 
-def deploy_app(
+def delete_service(pod_name, app_name):
+    """Delete the pod's service; a missing service is not an error."""
+    try:
+        core_v1().delete_namespaced_service(name=f"{app_name}-service-{pod_name}", namespace="apps")
+    except ApiException as e:
+        if e.status != 404:
+            logger.error("Failed to delete service of %s: %s", pod_name, e)
+            raise
+
+
+def delete_deployment(pod_name, app_name):
+    """Delete the pod's deployment; a missing deployment is not an error.
+
+    The deployment is matched by its ``deploymentApp`` label. Deletion
+    propagates in the background to everything the deployment owns: its pods
+    and, through their ownerReferences, the session's service and ingress.
+    """
+    try:
+        apps_v1().delete_collection_namespaced_deployment(
+            namespace="apps",
+            label_selector=f"deploymentApp={pod_name}",
+            propagation_policy="Background",
+        )
+    except ApiException as e:
+        if e.status != 404:
+            logger.error("Failed to delete deployment of %s: %s", pod_name, e)
+            raise
+
+
+def scale_deployment(pod_name, replicas, env=None):
+    """Scale the pod's deployment to ``replicas``.
+
+    Like ``delete_deployment`` the deployment is matched by its
+    ``deploymentApp`` label; its name comes from the cluster state cache when
+    that runs, so the scale is a single patch. ``env`` entries (see
+    ``turn_env``) replace those of the same name in the session container in
+    that same patch, so a resumed session starts with fresh values. Returns
+    ``False`` if the deployment does not exist.
+    """
+    cache = get_synced_cluster_state()
+    if cache is not None:
+        deployments = cache.deployments.get(pod_name)
+    else:
+        result = apps_v1().list_namespaced_deployment(
+            namespace="apps", label_selector=f"deploymentApp={pod_name}"
+        )
+        deployments = result.items
+    if not deployments:
+        return False
+
+    for deployment in deployments:
+        try:
+            if env:
+                container = deployment.spec.template.spec.containers[0].name
+                template = {"spec": {"containers": [{"name": container, "env": env}]}}
+                apps_v1().patch_namespaced_deployment(
+                    name=deployment.metadata.name,
+                    namespace="apps",
+                    body={"spec": {"replicas": replicas, "template": template}},
+                )
+            else:
+                apps_v1().patch_namespaced_deployment_scale(
+                    name=deployment.metadata.name,
+                    namespace="apps",
+                    body={"spec": {"replicas": replicas}},
+                )
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            return False
+    return True
+
+
+def turn_env():
+    """Return the ``SELKIES_TURN_*`` env of a webrtc session, or ``[]`` without TURN."""
+    # WebRTC media is peer-to-peer UDP and does NOT cross the ingress; behind the
+    # k3s pod NAT, ICE needs a TURN relay or the stream never starts. We use
+    # Cloudflare Realtime TURN (managed) so media rides Cloudflare's network and the
+    # node's public IP is never exposed: mint short-lived credentials per deploy and
+    # point Selkies at turn.cloudflare.com. selkies-gstreamer reads these SELKIES_TURN_*
+    # vars natively. Only injected when credentials are minted, so missing/failed CF
+    # config degrades gracefully instead of breaking the deploy.
+    turn_creds = generate_turn_credentials()
+    if not turn_creds:
+        return []
+    turn_username, turn_password = turn_creds
+    return [
+        {"name": "SELKIES_TURN_HOST", "value": "turn.cloudflare.com"},
+        {"name": "SELKIES_TURN_PORT", "value": os.environ.get("SELKIES_TURN_PORT", "3478")},
+        {
+            "name": "SELKIES_TURN_PROTOCOL",
+            "value": os.environ.get("SELKIES_TURN_PROTOCOL", "udp"),
+        },
+        {"name": "SELKIES_TURN_USERNAME", "value": turn_username},
+        {"name": "SELKIES_TURN_PASSWORD", "value": turn_password},
+    ]
+
+
+def build_deployment(
     username,
     pod_name,
     app_name,
@@ -142,10 +370,9 @@ def deploy_app(
     user_hostname,
     readonly=False,
     app_type="novnc",
-    *args,
-    **kwargs,
+    resources=None,
 ):
-    """Deploy a pod with the specified application.
+    """Return the Deployment manifest for a user's app session.
 
     ``app_type`` selects the container shape:
     - ``"novnc"`` (default): the original noVNC layout, injecting ``VNC_PW``.
@@ -153,10 +380,10 @@ def deploy_app(
       Selkies stream-tuning env, HTTP basic auth (reusing the per-pod password), more CPU
       for software x264 encoding, a tmpfs ``/dev/shm`` for Chromium, and a writable saves dir.
     Service + Ingress are shared and unchanged (Selkies also listens on 8080).
-    """
-    load_k8s_config()
 
-    apps_api = client.AppsV1Api()
+    ``resources`` (see ``app_resources``) replaces the app type's default
+    container resources.
+    """
     user_space = username
 
     user_hostname = user_hostname.replace("_", "-")  # "_" not allowed in kubernetes hostname
@@ -195,31 +422,8 @@ def deploy_app(
             {"name": "SELKIES_BASIC_AUTH_USER", "value": username},
             {"name": "SELKIES_BASIC_AUTH_PASSWORD", "value": vnc_password},
         ]
-        # WebRTC media is peer-to-peer UDP and does NOT cross the ingress; behind the
-        # k3s pod NAT, ICE needs a TURN relay or the stream never starts. We use
-        # Cloudflare Realtime TURN (managed) so media rides Cloudflare's network and the
-        # node's public IP is never exposed: mint short-lived credentials per deploy and
-        # point Selkies at turn.cloudflare.com. selkies-gstreamer reads these SELKIES_TURN_*
-        # vars natively. Only injected when credentials are minted, so missing/failed CF
-        # config degrades gracefully instead of breaking the deploy.
-        turn_creds = generate_turn_credentials()
-        if turn_creds:
-            turn_username, turn_password = turn_creds
-            env += [
-                {"name": "SELKIES_TURN_HOST", "value": "turn.cloudflare.com"},
-                {"name": "SELKIES_TURN_PORT", "value": os.environ.get("SELKIES_TURN_PORT", "3478")},
-                {
-                    "name": "SELKIES_TURN_PROTOCOL",
-                    "value": os.environ.get("SELKIES_TURN_PROTOCOL", "udp"),
-                },
-                {"name": "SELKIES_TURN_USERNAME", "value": turn_username},
-                {"name": "SELKIES_TURN_PASSWORD", "value": turn_password},
-            ]
-        # Software x264 at 30fps is CPU-heavy; the noVNC 700m limit is far too low.
-        resources = {
-            "limits": {"ephemeral-storage": "200Mi", "cpu": "3", "memory": "2Gi"},
-            "requests": {"ephemeral-storage": "100Mi", "cpu": "1500m", "memory": "1Gi"},
-        }
+        env += turn_env()
+        resources = resources or session_resources(app_type)
         # Chromium needs a large /dev/shm (mirrors compose shm_size: 512m).
         volumes.append({"name": "dshm", "emptyDir": {"medium": "Memory", "sizeLimit": "512Mi"}})
         volume_mounts = [
@@ -246,10 +450,7 @@ def deploy_app(
             {"name": "VNC_PW", "value": vnc_password},
             {"name": "USER_HOSTNAME", "value": user_hostname},
         ]
-        resources = {
-            "limits": {"ephemeral-storage": "100Mi", "cpu": "700m", "memory": "512Mi"},
-            "requests": {"ephemeral-storage": "50Mi", "cpu": "600m", "memory": "400Mi"},
-        }
+        resources = resources or session_resources(app_type)
         volume_mounts = [
             {"name": "nfs-kube", "mountPath": "/data/myData", "subPath": user_space},
             {"name": "nfs-kube-readonly", "mountPath": "/data/readonly", "readOnly": readonly},
@@ -292,7 +493,46 @@ def deploy_app(
         },
     }
 
+    return deployment
+
+
+def deploy_app(
+    username,
+    pod_name,
+    app_name,
+    image,
+    vnc_password,
+    user_hostname,
+    readonly=False,
+    app_type="novnc",
+    resources=None,
+    *args,
+    **kwargs,
+):
+    """Deploy a pod with the specified application (see ``build_deployment``).
+
+    Returns the created deployment, or the existing one if it already exists
+    (e.g. a repeated start); any other API error is raised.
+    """
+    apps_api = apps_v1()
+    deployment = build_deployment(
+        username,
+        pod_name,
+        app_name,
+        image,
+        vnc_password,
+        user_hostname,
+        readonly,
+        app_type,
+        resources,
+    )
+
     try:
-        apps_api.create_namespaced_deployment(namespace="apps", body=deployment)
+        return apps_api.create_namespaced_deployment(namespace="apps", body=deployment)
     except ApiException as e:
-        print("error while deploying: ", e)
+        if e.status == 409:
+            return apps_api.read_namespaced_deployment(
+                name=deployment["metadata"]["name"], namespace="apps"
+            )
+        logger.error("Failed to deploy %s: %s", pod_name, e)
+        raise
@@ -0,0 +1,130 @@
+"""Activity-based detection of abandoned sessions.
+
+Both noVNC (websockify) and Selkies keep a websocket open to the session
+container on port 8080 while a browser tab shows the session. The session
+worker periodically reads the established TCP connections on that port
+from ``/proc/net/tcp`` inside each session container; sessions with a
+client connected get ``Pod.last_active_at`` bumped, and sessions nobody has
+been connected to for ``SESSION_IDLE_TIMEOUT_MINUTES`` are handed to the
+expiry reaper by moving their ``expires_at`` to now. Pre-started sessions
+get ``PRESTART_IDLE_GRACE_MINUTES`` more until their first client connects.
+"""
+
+import logging
+from concurrent.futures import wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from kubernetes.client.api import CoreV1Api
+from kubernetes.stream import stream
+
+from shared.utils.threading import get_executor
+
+from .config import RateLimitedApiClient, core_v1, get_api_client
+from .informer import NAMESPACE
+from .ratelimit import HOUSEKEEPING, api_priority
+
+logger = logging.getLogger(__name__)
+
+SESSION_PORT = 8080
+TCP_ESTABLISHED = "01"
+
+
+def count_established(proc_net_tcp, port=SESSION_PORT):
+    """Count the ESTABLISHED connections to local ``port`` in /proc/net/tcp{,6} output."""
+    count = 0
+    for line in proc_net_tcp.splitlines():
+        fields = line.split()
+        # "sl local_address rem_address st ..." with addresses as HEXIP:HEXPORT
+        if len(fields) < 4 or ":" not in fields[1] or fields[0] == "sl":
+            continue
+        local_port = int(fields[1].rsplit(":", 1)[1], 16)
+        if local_port == port and fields[3] == TCP_ESTABLISHED:
+            count += 1
+    return count
+
+
+def client_connections(k8s_pod):
+    """Return the number of clients connected to a session pod's port 8080."""
+    # stream() swaps call_api on the ApiClient it is given while the exec
+    # runs, so concurrent probes must not share the process-wide client
+    with RateLimitedApiClient(get_api_client().configuration) as api_client:
+        output = stream(
+            CoreV1Api(api_client).connect_get_namespaced_pod_exec,
+            k8s_pod.metadata.name,
+            NAMESPACE,
+            container=k8s_pod.spec.containers[0].name,
+            command=["cat", "/proc/net/tcp", "/proc/net/tcp6"],
+            stderr=False,
+            stdin=False,
+            stdout=True,
+            tty=False,
+            _request_timeout=10,
+        )
+    return count_established(output)
+
+
+def _probe(k8s_pod):
+    try:
+        return client_connections(k8s_pod)
+    except Exception as e:
+        # Unknown is treated as active, so a failing probe never stops a session
+        logger.warning("Idle probe of %s failed: %s", k8s_pod.metadata.name, e)
+        return None
+
+
+@api_priority(HOUSEKEEPING)
+def detect_idle_sessions(now=None):
+    """Probe every deployed session and schedule the idle ones to stop now.
+
+    Returns a dict with the number of sessions ``active`` (a client is
+    connected) and ``stopped`` (idle past the timeout).
+    """
+    # Import here to avoid circular imports
+    from main.models import Pod
+
+    if not settings.SESSION_IDLE_TIMEOUT_MINUTES:
+        return {"active": 0, "stopped": 0}
+    now = now or timezone.now()
+    timeout = timedelta(minutes=settings.SESSION_IDLE_TIMEOUT_MINUTES)
+    grace = timedelta(minutes=settings.PRESTART_IDLE_GRACE_MINUTES)
+
+    sessions = {
+        pod.pod_name: pod
+        for pod in Pod.objects.filter(is_deployed=True, hibernated_at__isnull=True)
+    }
+    if not sessions:
+        return {"active": 0, "stopped": 0}
+
+    running = [
+        k8s_pod
+        for k8s_pod in core_v1().list_namespaced_pod(NAMESPACE, label_selector="appDep").items
+        if k8s_pod.status.phase == "Running"
+        and (k8s_pod.metadata.labels or {}).get("appDep") in sessions
+    ]
+    executor = get_executor("idle-probe", settings.K8S_SESSION_WORKERS)
+    futures = {executor.submit(_probe, k8s_pod): k8s_pod for k8s_pod in running}
+    wait(futures)
+
+    active = set()
+    for future, k8s_pod in futures.items():
+        connections = future.result()
+        if connections is None or connections > 0:
+            active.add(k8s_pod.metadata.labels["appDep"])
+    Pod.objects.filter(pod_name__in=active).update(last_active_at=now, prestarted=False)
+
+    idle = [
+        pod
+        for name, pod in sessions.items()
+        if name not in active
+        # Sessions without a probe yet count from their start
+        and (pod.last_active_at or pod.date_modified)
+        < now - timeout - (grace if pod.prestarted else timedelta(0))
+        and (pod.expires_at is None or pod.expires_at > now)
+    ]
+    for pod in idle:
+        logger.info("Stopping idle session %s", pod.pod_name)
+    Pod.objects.filter(pk__in=[pod.pk for pod in idle]).update(expires_at=now)
+
+    return {"active": len(active), "stopped": len(idle)}
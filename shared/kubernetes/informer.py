@@ -0,0 +1,327 @@
+"""Watch-backed in-memory mirror of the session resources in the ``apps`` namespace.
+
+Each resource kind the status path needs (deployments, pods, services,
+EndpointSlices, ingresses) gets one :class:`ResourceInformer`: a daemon thread
+that lists the kind once, then keeps a single watch open and applies the
+events to a local store indexed by the kind's session label. Status lookups
+read from that store instead of issuing list calls on every request.
+
+The cache is started lazily by :func:`get_cluster_state` and is disabled with
+``K8S_STATE_CACHE_ENABLED = False`` (the test settings do this). Until every
+informer has completed its initial list, :meth:`ClusterStateCache.is_synced`
+is ``False`` and callers fall back to direct API calls.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+from .config import apps_v1, core_v1, discovery_v1, networking_v1
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "apps"
+
+# Server-side watch timeout; the informer re-opens the watch from the last
+# seen resourceVersion when it expires, so this only bounds idle connections.
+WATCH_TIMEOUT_SECONDS = 300
+
+# Backoff between failed list/watch attempts.
+RETRY_MIN_SECONDS = 1
+RETRY_MAX_SECONDS = 30
+
+
+class ResourceInformer:
+    """List+watch mirror of one resource kind, indexed by a label."""
+
+    def __init__(self, kind, list_func, index_label, namespace=NAMESPACE, on_change=None):
+        self.kind = kind
+        self.index_label = index_label
+        self.namespace = namespace
+        self._list_func = list_func
+        self._on_change = on_change
+
+        self._lock = threading.Lock()
+        self._objects = {}  # object name -> object
+        self._index = defaultdict(dict)  # label value -> {object name: object}
+        self._keys = {}  # object name -> label value it is indexed under
+        self._resource_version = None
+        self._synced = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    # --- Store ----------------------------------------------------------------------------
+
+    def _index_key(self, obj):
+        labels = obj.metadata.labels or {}
+        return labels.get(self.index_label)
+
+    def _unindex(self, name):
+        key = self._keys.pop(name, None)
+        if key is not None:
+            bucket = self._index.get(key)
+            if bucket is not None:
+                bucket.pop(name, None)
+                if not bucket:
+                    del self._index[key]
+        return key
+
+    def _apply(self, event_type, obj):
+        """Apply a single watch event to the store.
+
+        Returns the label values affected by the event so listeners can tell
+        which sessions changed.
+        """
+        name = obj.metadata.name
+        with self._lock:
+            old_key = self._unindex(name)
+            if event_type == "DELETED":
+                self._objects.pop(name, None)
+                new_key = None
+            else:
+                self._objects[name] = obj
+                new_key = self._index_key(obj)
+                if new_key is not None:
+                    self._index[new_key][name] = obj
+                    self._keys[name] = new_key
+        return {key for key in (old_key, new_key) if key is not None}
+
+    def _replace(self, items, resource_version):
+        """Replace the whole store with the result of a list call."""
+        with self._lock:
+            previous_keys = set(self._index)
+            self._objects = {}
+            self._index = defaultdict(dict)
+            self._keys = {}
+            for obj in items:
+                name = obj.metadata.name
+                self._objects[name] = obj
+                key = self._index_key(obj)
+                if key is not None:
+                    self._index[key][name] = obj
+                    self._keys[name] = key
+            self._resource_version = resource_version
+        return previous_keys | set(self._index)
+
+    def get(self, key):
+        """Return the objects whose index label equals ``key``."""
+        with self._lock:
+            return list(self._index.get(key, {}).values())
+
+    def get_many(self, keys):
+        """Return ``{key: [objects]}`` for every key that has objects."""
+        with self._lock:
+            return {key: list(self._index[key].values()) for key in keys if key in self._index}
+
+    def items(self):
+        with self._lock:
+            return list(self._objects.values())
+
+    # --- Lifecycle ------------------------------------------------------------------------
+
+    def is_synced(self):
+        return self._synced.is_set()
+
+    def wait_synced(self, timeout=None):
+        return self._synced.wait(timeout)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"informer-{self.kind}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _notify(self, keys):
+        if self._on_change and keys:
+            self._on_change(self.kind, keys)
+
+    def _list(self):
+        result = self._list_func(namespace=self.namespace)
+        keys = self._replace(result.items, result.metadata.resource_version)
+        self._synced.set()
+        self._notify(keys)
+
+    def _watch(self):
+        w = watch.Watch()
+        for event in w.stream(
+            self._list_func,
+            namespace=self.namespace,
+            resource_version=self._resource_version,
+            timeout_seconds=WATCH_TIMEOUT_SECONDS,
+            allow_watch_bookmarks=True,
+        ):
+            if self._stopped.is_set():
+                w.stop()
+                return
+            # ERROR events (410 Gone included) are raised by the watch as ApiException
+            event_type = event["type"]
+            if event_type == "BOOKMARK":
+                # Bookmarks are not deserialized; only the raw object has the version
+                self._resource_version = event["raw_object"]["metadata"]["resourceVersion"]
+                continue
+            obj = event["object"]
+            self._notify(self._apply(event_type, obj))
+            self._resource_version = obj.metadata.resource_version
+
+    def _run(self):
+        backoff = RETRY_MIN_SECONDS
+        needs_list = True
+        while not self._stopped.is_set():
+            try:
+                if needs_list:
+                    self._list()
+                    needs_list = False
+                self._watch()
+                backoff = RETRY_MIN_SECONDS
+            except ApiException as e:
+                needs_list = True
+                if e.status == 410:
+                    logger.info("%s watch expired, relisting", self.kind)
+                    continue
+                logger.warning("%s informer API error: %s", self.kind, e)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, RETRY_MAX_SECONDS)
+            except Exception as e:
+                needs_list = True
+                logger.warning("%s informer failed: %s", self.kind, e)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, RETRY_MAX_SECONDS)
+
+
+class ClusterStateCache:
+    """In-memory view of every session's Deployment, Pod, Service, EndpointSlices and Ingress."""
+
+    def __init__(self, namespace=NAMESPACE):
+        apps_api = apps_v1()
+        core_api = core_v1()
+        discovery_api = discovery_v1()
+        networking_api = networking_v1()
+
+        # Bumped on every applied event; waiters re-read their session after a bump.
+        self._changed = threading.Condition()
+        self._generation = 0
+
+        self.deployments = ResourceInformer(
+            "deployments",
+            apps_api.list_namespaced_deployment,
+            "deploymentApp",
+            namespace,
+            self._on_change,
+        )
+        self.pods = ResourceInformer(
+            "pods", core_api.list_namespaced_pod, "appDep", namespace, self._on_change
+        )
+        self.services = ResourceInformer(
+            "services", core_api.list_namespaced_service, "serviceApp", namespace, self._on_change
+        )
+        self.endpoint_slices = ResourceInformer(
+            "endpointslices",
+            discovery_api.list_namespaced_endpoint_slice,
+            "kubernetes.io/service-name",
+            namespace,
+            self._on_change,
+        )
+        self.ingresses = ResourceInformer(
+            "ingresses",
+            networking_api.list_namespaced_ingress,
+            "ingressApp",
+            namespace,
+            self._on_change,
+        )
+        self.informers = [
+            self.deployments,
+            self.pods,
+            self.services,
+            self.endpoint_slices,
+            self.ingresses,
+        ]
+
+    def _on_change(self, kind, keys):
+        with self._changed:
+            self._generation += 1
+            self._changed.notify_all()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def wait_for_change(self, generation, timeout):
+        """Block until the cache has changed since ``generation`` or ``timeout`` elapses.
+
+        Returns the current generation; callers compare it with the value they
+        passed in to tell a change from a timeout.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._generation != generation, timeout)
+            return self._generation
+
+    def start(self):
+        for informer in self.informers:
+            informer.start()
+
+    def stop(self):
+        for informer in self.informers:
+            informer.stop()
+
+    def is_synced(self):
+        return all(informer.is_synced() for informer in self.informers)
+
+    def session_objects(self, pod_name):
+        """Return the cached objects belonging to one session.
+
+        The dict has the shape expected by ``pods.stages_from_objects``:
+        ``deployments``, ``pods``, ``services``, ``slices`` (service name ->
+        EndpointSlices) and ``ingresses``.
+        """
+        services = self.services.get(pod_name)
+        return {
+            "deployments": self.deployments.get(pod_name),
+            "pods": self.pods.get(pod_name),
+            "services": services,
+            "slices": {
+                svc.metadata.name: self.endpoint_slices.get(svc.metadata.name) for svc in services
+            },
+            "ingresses": self.ingresses.get(pod_name),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cluster_state():
+    """Return the process-wide :class:`ClusterStateCache`, starting it on first use.
+
+    Returns ``None`` when the cache is disabled or cannot be created (for
+    example when no cluster configuration is available).
+    """
+    global _cache
+    if not getattr(settings, "K8S_STATE_CACHE_ENABLED", False):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    cache = ClusterStateCache()
+                    cache.start()
+                except Exception as e:
+                    logger.warning("Cluster state cache unavailable: %s", e)
+                    return None
+                _cache = cache
+    return _cache
+
+
+def get_synced_cluster_state():
+    """Return the cluster state cache only if it is running and fully synced."""
+    cache = get_cluster_state()
+    if cache is not None and cache.is_synced():
+        return cache
+    return None
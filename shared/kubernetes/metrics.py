@@ -0,0 +1,127 @@
+"""Latency, error and in-flight metrics of Kubernetes API requests.
+
+Every request made through the shared ``ApiClient`` is recorded here by verb
+(``get``, ``list``, ``create``, ``patch``, ``deletecollection``, ``watch``...)
+and resource (``deployments``, ``pods``, ``endpointslices``...), which are
+derived from the HTTP method and URL seen by its REST client. Latency is measured up to the response
+headers; for watches that is the time to open the stream. The metrics are
+exposed by :func:`metric_families` for the ``/metrics/`` endpoint.
+"""
+
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from shared.utils.prometheus import MetricFamily, Registry
+
+from .ratelimit import PRIORITY_NAMES, get_rate_limiter
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS = "easytp_k8s_api_requests_total"
+LATENCY = "easytp_k8s_api_request_duration_seconds"
+ERRORS = "easytp_k8s_api_errors_total"
+IN_FLIGHT = "easytp_k8s_api_requests_in_flight"
+
+_registry = Registry()
+
+_VERBS = {"POST": "create", "PUT": "update", "PATCH": "patch"}
+
+
+def describe_request(method, url, watch=False):
+    """Return the ``(verb, resource)`` of a Kubernetes API request.
+
+    Subresources are reported with their parent, e.g. ``pods/log``.
+    """
+    parts = [part for part in urlsplit(url).path.split("/") if part]
+    if parts[:1] == ["api"]:
+        rest = parts[2:]
+    elif parts[:1] == ["apis"]:
+        rest = parts[3:]
+    else:
+        rest = parts
+    if len(rest) > 2 and rest[0] == "namespaces":
+        rest = rest[2:]
+
+    resource = rest[0] if rest else "unknown"
+    if len(rest) > 2:
+        resource = f"{resource}/{rest[2]}"
+    named = len(rest) > 1
+
+    if watch:
+        verb = "watch"
+    elif method == "GET":
+        verb = "get" if named else "list"
+    elif method == "DELETE":
+        verb = "delete" if named else "deletecollection"
+    else:
+        verb = _VERBS.get(method, method.lower())
+    return verb, resource
+
+
+@contextmanager
+def track_request(method, url, watch=False):
+    """Record the enclosed request; yields a dict the caller puts the response in."""
+    verb, resource = describe_request(method, url, watch)
+    labels = (("verb", verb), ("resource", resource))
+    result = {}
+
+    _registry.add_gauge(IN_FLIGHT, labels, 1)
+    start = time.monotonic()
+    code = None
+    try:
+        yield result
+        response = result.get("response")
+        status = getattr(response, "status", None)
+        if status is not None and status >= 400:
+            code = str(status)
+    except Exception as e:
+        status = getattr(e, "status", None)
+        code = str(status) if status else type(e).__name__
+        raise
+    finally:
+        _registry.add_gauge(IN_FLIGHT, labels, -1)
+        _registry.observe(LATENCY, labels, time.monotonic() - start, LATENCY_BUCKETS)
+        _registry.inc(REQUESTS, labels)
+        if code is not None:
+            _registry.inc(ERRORS, (*labels, ("code", code)))
+
+
+def metric_families():
+    """Kubernetes API and rate limiter metrics as Prometheus metric families."""
+    families = [
+        _registry.family(REQUESTS, "counter", "Kubernetes API requests by verb and resource."),
+        _registry.family(
+            LATENCY, "histogram", "Kubernetes API request latency (to response headers)."
+        ),
+        _registry.family(ERRORS, "counter", "Failed Kubernetes API requests by status code."),
+        _registry.family(IN_FLIGHT, "gauge", "Kubernetes API requests currently in flight."),
+    ]
+
+    stats = get_rate_limiter().stats()
+    acquired = MetricFamily(
+        "easytp_k8s_api_rate_limit_acquired_total",
+        "counter",
+        "Rate limiter tokens taken by priority class.",
+    )
+    waited = MetricFamily(
+        "easytp_k8s_api_rate_limit_wait_seconds_total",
+        "counter",
+        "Seconds spent waiting for a rate limiter token by priority class.",
+    )
+    waiting = MetricFamily(
+        "easytp_k8s_api_rate_limit_waiting",
+        "gauge",
+        "Requests waiting for a rate limiter token by priority class.",
+    )
+    for name in PRIORITY_NAMES.values():
+        labels = (("priority", name),)
+        acquired.add(labels, stats[name]["acquired"])
+        waited.add(labels, float(stats[name]["wait_seconds"]))
+        waiting.add(labels, stats[name]["waiting"])
+    return families + [acquired, waited, waiting]
+
+
+def reset_metrics():
+    """Forget all recorded requests (used by tests)."""
+    _registry.clear()
@@ -1,146 +1,275 @@
 """Kubernetes pod management operations."""
 
 import hashlib
+import time
 import uuid
 
-from kubernetes import client
+from django.conf import settings
 from kubernetes.client.rest import ApiException
 
+from shared.utils.singleflight import coalesce_many, forget
 from shared.utils.threading import autotask
 
-from .config import load_k8s_config
+from .admission import queue_positions
+from .config import apps_v1, core_v1, discovery_v1, networking_v1
+from .informer import NAMESPACE, get_synced_cluster_state
+from .routing import shared_routing
 
+STATUS_CACHE_PREFIX = "session-status"
 
-def get_deployment_stages(pod_name, namespace="apps"):
-    """Get detailed deployment status for all K8s resources.
 
-    Returns a dict with status for each deployment stage:
-    - deployment: pending | creating | ready | error
-    - pod: pending | creating | running | error
-    - service: pending | ready | error
-    - ingress: pending | creating | ready | error
-    """
-    stages = {
+def empty_stages():
+    """Stages of a session that has no Kubernetes resources."""
+    return {
         "deployment": "pending",
         "pod": "pending",
         "service": "pending",
         "ingress": "pending",
     }
 
+
+def _deployment_stage(deployments):
+    if not deployments:
+        return "pending"
+    dep = deployments[0]
+    ready_replicas = dep.status.ready_replicas or 0
+    replicas = dep.status.replicas or 0
+
+    if ready_replicas > 0:
+        return "ready"
+    if replicas > 0:
+        return "creating"
+    # Check conditions for more details
+    for condition in dep.status.conditions or []:
+        if condition.type == "Progressing" and condition.status == "True":
+            return "creating"
+        elif condition.type == "ReplicaFailure" and condition.status == "True":
+            return "error"
+    return "pending"
+
+
+def _pod_stage(pods):
+    if not pods:
+        return "pending"
+    pod = pods[0]
+    phase = pod.status.phase
+
+    if phase == "Running":
+        # Check if all containers are ready
+        if pod.status.container_statuses and all(c.ready for c in pod.status.container_statuses):
+            return "running"
+        return "creating"
+    elif phase == "Pending":
+        return "creating"
+    elif phase in ["Failed", "Unknown"]:
+        return "error"
+    elif phase == "Succeeded":
+        # For jobs/completed pods
+        return "running"
+    return "pending"
+
+
+def _service_stage(services, slices_by_service):
+    if not services:
+        return "pending"
+    service = services[0]
+    for s in slices_by_service.get(service.metadata.name, []):
+        for ep in s.endpoints or []:
+            # In k3s this field is always present
+            if ep.conditions and ep.conditions.ready:
+                return "ready"
+    return "pending"
+
+
+def _ingress_stage(ingresses):
+    if not ingresses:
+        return "pending"
+    ingress = ingresses[0]
+    # Check if ingress has been configured by the controller
+    if ingress.status.load_balancer and ingress.status.load_balancer.ingress:
+        return "ready"
+    return "creating"
+
+
+def _ingress_url(ingresses):
+    if ingresses:
+        return f"https://{ingresses[0].spec.rules[0].host}"
+    return None
+
+
+def stages_from_objects(objects):
+    """Compute deployment stages from a session's Kubernetes objects.
+
+    ``objects`` is a dict with ``deployments``, ``pods``, ``services``,
+    ``slices`` (service name -> EndpointSlices) and ``ingresses`` lists, as
+    returned by ``ClusterStateCache.session_objects``.
+
+    With shared routing a session has no Ingress; it is routed as soon as
+    its Service has a ready endpoint.
+    """
+    service = _service_stage(objects["services"], objects["slices"])
+    if objects["ingresses"] or not shared_routing():
+        ingress = _ingress_stage(objects["ingresses"])
+    else:
+        ingress = service
+    return {
+        "deployment": _deployment_stage(objects["deployments"]),
+        "pod": _pod_stage(objects["pods"]),
+        "service": service,
+        "ingress": ingress,
+    }
+
+
+def _group_by_label(items, label):
+    grouped = {}
+    for obj in items:
+        key = (obj.metadata.labels or {}).get(label)
+        if key is not None:
+            grouped.setdefault(key, []).append(obj)
+    return grouped
+
+
+def list_session_objects(pod_names, namespace="apps"):
+    """Fetch the Kubernetes objects of several sessions in one pass.
+
+    Issues one set-based label-selector list per resource kind
+    (``appDep in (h1,h2,...)``) instead of one round per session, or reads
+    from the cluster state cache when it is synced.
+
+    Returns:
+        tuple: (objects, service_error) where ``objects`` maps each pod name
+        to the dict expected by :func:`stages_from_objects`, and
+        ``service_error`` is True when the service lookup failed.
+    """
+    pod_names = list(pod_names)
+    if not pod_names:
+        return {}, False
+
+    cache = get_synced_cluster_state() if namespace == NAMESPACE else None
+    if cache is not None:
+        return {name: cache.session_objects(name) for name in pod_names}, False
+
+    names = ",".join(pod_names)
+    deployments, pods, services, slices, ingresses = {}, {}, {}, {}, {}
+    service_error = False
+
+    apps_api = apps_v1()
+    core_api = core_v1()
+    networking_api = networking_v1()
+
     try:
-        load_k8s_config()
-        apps_api = client.AppsV1Api()
-        core_api = client.CoreV1Api()
-        networking_api = client.NetworkingV1Api()
+        result = apps_api.list_namespaced_deployment(
+            namespace=namespace, label_selector=f"deploymentApp in ({names})"
+        )
+        deployments = _group_by_label(result.items, "deploymentApp")
+    except ApiException:
+        pass
 
-        # Check Deployment status
-        try:
-            deployments = apps_api.list_namespaced_deployment(
-                namespace=namespace, label_selector=f"deploymentApp={pod_name}"
-            )
-            if deployments.items:
-                dep = deployments.items[0]
-                ready_replicas = dep.status.ready_replicas or 0
-                replicas = dep.status.replicas or 0
-
-                if ready_replicas > 0:
-                    stages["deployment"] = "ready"
-                elif replicas > 0:
-                    stages["deployment"] = "creating"
-                else:
-                    # Check conditions for more details
-                    if dep.status.conditions:
-                        for condition in dep.status.conditions:
-                            if condition.type == "Progressing" and condition.status == "True":
-                                stages["deployment"] = "creating"
-                                break
-                            elif condition.type == "ReplicaFailure" and condition.status == "True":
-                                stages["deployment"] = "error"
-                                break
-        except ApiException:
-            pass
-
-        # Check Pod status
-        try:
-            pods = core_api.list_namespaced_pod(
-                namespace=namespace, label_selector=f"appDep={pod_name}"
-            )
-            if pods.items:
-                pod = pods.items[0]
-                phase = pod.status.phase
-
-                if phase == "Running":
-                    # Check if all containers are ready
-                    if pod.status.container_statuses:
-                        all_ready = all(c.ready for c in pod.status.container_statuses)
-                        if all_ready:
-                            stages["pod"] = "running"
-                        else:
-                            stages["pod"] = "creating"
-                    else:
-                        stages["pod"] = "creating"
-                elif phase == "Pending":
-                    stages["pod"] = "creating"
-                elif phase in ["Failed", "Unknown"]:
-                    stages["pod"] = "error"
-                elif phase == "Succeeded":
-                    # For jobs/completed pods
-                    stages["pod"] = "running"
-        except ApiException:
-            pass
-
-        # Check Service has endpoints (EndpointSlice-based)
-        try:
-            # 1. Find the Service first
-            services = core_api.list_namespaced_service(
+    try:
+        result = core_api.list_namespaced_pod(
+            namespace=namespace, label_selector=f"appDep in ({names})"
+        )
+        pods = _group_by_label(result.items, "appDep")
+    except ApiException:
+        pass
+
+    try:
+        result = core_api.list_namespaced_service(
+            namespace=namespace, label_selector=f"serviceApp in ({names})"
+        )
+        services = _group_by_label(result.items, "serviceApp")
+        service_names = [svc.metadata.name for items in services.values() for svc in items]
+        if service_names:
+            result = discovery_v1().list_namespaced_endpoint_slice(
                 namespace=namespace,
-                label_selector=f"serviceApp={pod_name}",
+                label_selector=f"kubernetes.io/service-name in ({','.join(service_names)})",
             )
+            slices = _group_by_label(result.items, "kubernetes.io/service-name")
+    except ApiException:
+        service_error = True
 
-            if services.items:
-                service = services.items[0]
+    try:
+        result = networking_api.list_namespaced_ingress(
+            namespace=namespace, label_selector=f"ingressApp in ({names})"
+        )
+        ingresses = _group_by_label(result.items, "ingressApp")
+    except ApiException:
+        pass
 
-                discovery_api = client.DiscoveryV1Api()
-                slices = discovery_api.list_namespaced_endpoint_slice(
-                    namespace=namespace,
-                    label_selector=f"kubernetes.io/service-name={service.metadata.name}",
-                )
+    objects = {}
+    for name in pod_names:
+        session_services = services.get(name, [])
+        objects[name] = {
+            "deployments": deployments.get(name, []),
+            "pods": pods.get(name, []),
+            "services": session_services,
+            "slices": {
+                svc.metadata.name: slices.get(svc.metadata.name, []) for svc in session_services
+            },
+            "ingresses": ingresses.get(name, []),
+        }
+    return objects, service_error
 
-                ready = False
-                for s in slices.items:
-                    for ep in s.endpoints or []:
-                        # In k3s this field is always present
-                        if ep.conditions and ep.conditions.ready:
-                            ready = True
-                            break
-                    if ready:
-                        break
-
-                stages["service"] = "ready" if ready else "pending"
-
-        except ApiException:
+
+def _read_sessions(pod_names, namespace):
+    objects, service_error = list_session_objects(pod_names, namespace)
+    result = {}
+    for name, session_objects in objects.items():
+        stages = stages_from_objects(session_objects)
+        if service_error:
             stages["service"] = "error"
+        result[name] = {"stages": stages, "url": _ingress_url(session_objects["ingresses"])}
+    return result
 
-        # Check Ingress status
-        try:
-            ingresses = networking_api.list_namespaced_ingress(
-                namespace=namespace, label_selector=f"ingressApp={pod_name}"
-            )
-            if ingresses.items:
-                ingress = ingresses.items[0]
-                # Check if ingress has been configured by the controller
-                if ingress.status.load_balancer and ingress.status.load_balancer.ingress:
-                    stages["ingress"] = "ready"
-                else:
-                    stages["ingress"] = "creating"
-        except ApiException:
-            pass
 
+def lookup_sessions(pod_names, namespace="apps"):
+    """Return ``{pod_name: {"stages": ..., "url": ...}}`` for several sessions.
+
+    Read from the cluster state cache when it is synced. Otherwise the list
+    calls of :func:`list_session_objects` are coalesced per session across
+    threads and worker processes through the cache backend: concurrent
+    callers (several tabs, teachers watching a class) wait for one in-flight
+    lookup, and its result is reused for ``STATUS_CACHE_TTL_SECONDS``.
+    Kubernetes errors are raised.
+    """
+    pod_names = list(pod_names)
+    cached = namespace == NAMESPACE and get_synced_cluster_state() is not None
+    if cached or not settings.STATUS_CACHE_TTL_SECONDS:
+        return _read_sessions(pod_names, namespace)
+    return coalesce_many(
+        f"{STATUS_CACHE_PREFIX}:{namespace}",
+        pod_names,
+        lambda names: _read_sessions(names, namespace),
+        ttl=settings.STATUS_CACHE_TTL_SECONDS,
+        wait=settings.STATUS_LOOKUP_WAIT_SECONDS,
+    )
+
+
+def forget_session_status(pod_name, namespace="apps"):
+    """Drop a session's cached status after starting or stopping it."""
+    forget(f"{STATUS_CACHE_PREFIX}:{namespace}", [pod_name])
+
+
+def get_deployment_stages_bulk(pod_names, namespace="apps"):
+    """Batched :func:`get_deployment_stages`: returns ``{pod_name: stages}``."""
+    try:
+        sessions = lookup_sessions(pod_names, namespace)
     except Exception:
         # If we can't connect to K8s, return pending for all
-        pass
+        return {name: empty_stages() for name in pod_names}
+    return {name: session["stages"] for name, session in sessions.items()}
+
 
-    return stages
+def get_deployment_stages(pod_name, namespace="apps"):
+    """Get detailed deployment status for all K8s resources.
+
+    Returns a dict with status for each deployment stage:
+    - deployment: pending | creating | ready | error
+    - pod: pending | creating | running | error
+    - service: pending | ready | error
+    - ingress: pending | creating | ready | error
+    """
+    return get_deployment_stages_bulk([pod_name], namespace)[pod_name]
 
 
 def compute_overall_status(stages):
@@ -184,6 +313,57 @@ def compute_overall_status(stages):
         return ("starting", "Deployment in progress...", False)
 
 
+def status_payload(stages):
+    """Build the status payload (status, message, ready, stages) for a set of stages."""
+    overall_status, message, ready = compute_overall_status(stages)
+    return {"status": overall_status, "message": message, "ready": ready, "stages": stages}
+
+
+def session_status(pod_name):
+    """Return the status payload of one session."""
+    return status_payload(get_deployment_stages(pod_name, namespace="apps"))
+
+
+def iter_session_status(pod_name, timeout, heartbeat, poll_interval=2):
+    """Yield a session's status each time it changes until it is ready or has failed.
+
+    With the cluster state cache running this blocks on its change
+    notifications, so no API calls are made while waiting; without it the
+    status is re-read every ``poll_interval`` seconds. ``None`` is yielded
+    when nothing has been sent for ``heartbeat`` seconds, so streaming callers
+    can keep the connection alive. The generator ends after the first ready or
+    error status, or once ``timeout`` seconds have passed.
+    """
+    deadline = time.monotonic() + timeout
+    last_yield = time.monotonic()
+    last = None
+    cache = get_synced_cluster_state()
+    generation = cache.generation if cache is not None else 0
+
+    while True:
+        current = session_status(pod_name)
+        if current != last:
+            yield current
+            last = current
+            last_yield = time.monotonic()
+            if current["ready"] or current["status"] == "error":
+                return
+
+        now = time.monotonic()
+        if now >= deadline:
+            return
+        wait = max(0, min(deadline, last_yield + heartbeat) - now)
+
+        if cache is not None:
+            generation = cache.wait_for_change(generation, wait)
+        else:
+            time.sleep(min(poll_interval, wait))
+
+        if time.monotonic() - last_yield >= heartbeat:
+            yield None
+            last_yield = time.monotonic()
+
+
 @autotask
 def generate_pod_if_not_exist(pod_user, app_name, pod_name, pod_vnc_user, pod_vnc_password):
     """Generate a pod record in the database if it doesn't exist."""
@@ -201,9 +381,30 @@ def generate_pod_if_not_exist(pod_user, app_name, pod_name, pod_vnc_user, pod_vn
     pod.save()
 
 
+def new_pod(user, app_name):
+    """Return an unsaved ``Pod`` row for ``user``'s session of ``app_name``."""
+    # Import here to avoid circular imports
+    from main.models import Pod
+
+    return Pod(
+        pod_user=user,
+        pod_name=hashlib.md5(f"{app_name}:{user.username}:{user.id}".encode("utf-8")).hexdigest(),
+        app_name=app_name,
+        pod_vnc_user=uuid.uuid4().hex[:6],
+        pod_vnc_password=uuid.uuid4().hex,
+        pod_namespace="apps",
+    )
+
+
 def display_apps(apps, user):
     """Get deployment status for apps with granular stage information.
 
+    All of the user's ``Pod`` rows are read in one query and the status of
+    every deployed app is resolved with one list call per resource kind
+    (see :func:`list_session_objects`), so the cost does not grow with the
+    number of apps; concurrent lookups of the same session are shared (see
+    :func:`lookup_sessions`).
+
     Args:
         apps: QuerySet of App objects
         user: The user to check pods for
@@ -211,90 +412,84 @@ def display_apps(apps, user):
     Returns:
         dict: App name -> {
             vnc_pass, deployment_status, novnc_url, is_deployed,
-            status, stages, message, ready
+            status, stages, message, ready, queue_position
         }
     """
     # Import here to avoid circular imports
-    from main.models import Pod
+    from main.models import Pod, SessionRoute
+
+    apps = list(apps)
+    pods = {
+        pod.app_name: pod
+        for pod in Pod.objects.filter(pod_user=user, app_name__in=[app.name for app in apps])
+    }
 
-    print("Displaying apps for user:", user)
-    print("Apps to display:", apps)
+    # Create pod rows that don't exist yet
+    missing = [new_pod(user, app.name) for app in apps if app.name not in pods]
+    if missing:
+        Pod.objects.bulk_create(missing)
+        pods.update({pod.app_name: pod for pod in missing})
+
+    # Starts still waiting for cluster capacity
+    positions = queue_positions([pod for pod in pods.values() if not pod.is_deployed])
+
+    # Resolve the status of every deployed app in one pass
+    deployed = [
+        pod.pod_name for pod in pods.values() if pod.is_deployed and pod.hibernated_at is None
+    ]
+    sessions, cluster_error = {}, None
+    routes = {}
+    if deployed and shared_routing():
+        routes = dict(
+            SessionRoute.objects.filter(pod__pod_name__in=deployed).values_list(
+                "pod__pod_name", "host"
+            )
+        )
+    if deployed:
+        try:
+            sessions = lookup_sessions(deployed, namespace="apps")
+        except Exception as e:
+            cluster_error = e
 
     data = dict()
     for app in apps:
+        pod = pods[app.name]
         novnc_url = None
-
-        try:
-            pod = Pod.objects.get(pod_user=user, app_name=app.name)
-        except Pod.DoesNotExist:
-            pod = None
-
-        if pod:
-            vnc_pass = pod.pod_vnc_password
-            pod_name = pod.pod_name
-        else:
-            # Create pod if not exist
-            pod_name = hashlib.md5(
-                f"{app.name}:{user.username}:{user.id}".encode("utf-8")
-            ).hexdigest()
-            pod_vnc_user = uuid.uuid4().hex[:6]
-            pod_vnc_password = uuid.uuid4().hex
-            generate_pod_if_not_exist(
-                pod_user=user,
-                pod_name=pod_name,
-                app_name=app.name,
-                pod_vnc_user=pod_vnc_user,
-                pod_vnc_password=pod_vnc_password,
-            )
-            vnc_pass = pod_vnc_password
-            # Retrieve the created pod
-            pod = Pod.objects.get(pod_user=user, app_name=app.name)
-
-        vnc_pass_hash = hashlib.md5(vnc_pass.encode("utf-8")).hexdigest()
+        vnc_pass_hash = hashlib.md5(pod.pod_vnc_password.encode("utf-8")).hexdigest()
 
         # Default stages for non-deployed apps
-        stages = {
-            "deployment": "pending",
-            "pod": "pending",
-            "service": "pending",
-            "ingress": "pending",
-        }
+        stages = empty_stages()
         overall_status = "stopped"
         message = "Application is stopped"
         ready = False
 
+        if pod.is_deployed and pod.hibernated_at is not None:
+            # Scaled to zero; a start resumes it
+            overall_status = "hibernated"
+            message = "Application is hibernated"
         # Only check K8s status if the app is marked as deployed
-        if pod.is_deployed:
-            try:
-                load_k8s_config()
-                networking_api = client.NetworkingV1Api()
-
-                # Check if ingress exists and get URL
-                try:
-                    ingress = networking_api.list_namespaced_ingress(
-                        namespace="apps", label_selector=f"ingressApp={pod_name}"
-                    )
-                    if len(ingress.items) > 0:
-                        host = ingress.items[0].spec.rules[0].host
-                        novnc_url = f"https://{host}"
-                except ApiException:
-                    pass
-
-                # Get detailed deployment stages
-                stages = get_deployment_stages(pod_name, namespace="apps")
+        elif pod.is_deployed:
+            if cluster_error is None:
+                session = sessions[pod.pod_name]
+                novnc_url = session["url"]
+                if novnc_url is None and pod.pod_name in routes:
+                    novnc_url = f"https://{routes[pod.pod_name]}"
+                stages = session["stages"]
                 overall_status, message, ready = compute_overall_status(stages)
-
-            except ApiException as e:
+            elif isinstance(cluster_error, ApiException):
                 # If it's a temporary API error, show as starting
-                if e.status in [500, 502, 503, 504]:
+                if cluster_error.status in [500, 502, 503, 504]:
                     overall_status = "starting"
                     message = "Checking deployment status..."
                     ready = False
-            except Exception:
+            else:
                 # For connection errors, show as starting if is_deployed
                 overall_status = "starting"
                 message = "Connecting to cluster..."
                 ready = False
+        elif pod.pk in positions:
+            overall_status = "queued"
+            message = f"Waiting for cluster capacity (position {positions[pod.pk]} in queue)"
 
         # For backward compatibility, deployment_status is True only when fully ready
         deployment_status = ready
@@ -313,6 +508,7 @@ def display_apps(apps, user):
             "stages": stages,
             "message": message,
             "ready": ready,
+            "queue_position": positions.get(pod.pk),
         }
 
     return data
@@ -0,0 +1,165 @@
+"""Pre-pulling app images onto every node after an image update.
+
+When the CI webhook changes an app's image, a DaemonSet is rolled out whose
+init container runs the new image once, so each node pulls it before the
+first student does. Its pods are then polled per node and the result is
+stored in ``App.prepull_status``; once every node has the image the
+DaemonSet is deleted again.
+"""
+
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+from kubernetes.client.rest import ApiException
+
+from .config import apps_v1, core_v1
+from .ratelimit import HOUSEKEEPING, api_priority
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "apps"
+PAUSE_IMAGE = "registry.k8s.io/pause:3.9"
+
+PULLING = "pulling"
+PULLED = "pulled"
+FAILED = "failed"
+
+PULL_ERRORS = ["ErrImagePull", "ImagePullBackOff", "InvalidImageName"]
+
+
+def _daemonset_name(app_name):
+    return f"prepull-{app_name}"
+
+
+def build_prepull_daemonset(app_name, image):
+    """Return the DaemonSet manifest that pulls ``image`` onto every node."""
+    labels = {"prepullApp": app_name}
+    small = {
+        "requests": {"cpu": "10m", "memory": "16Mi"},
+        "limits": {"cpu": "50m", "memory": "32Mi"},
+    }
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "DaemonSet",
+        "metadata": {"name": _daemonset_name(app_name), "labels": labels},
+        "spec": {
+            "selector": {"matchLabels": labels},
+            "template": {
+                "metadata": {"labels": labels},
+                "spec": {
+                    # Pulling is the side effect; the command only has to exit
+                    "initContainers": [
+                        {
+                            "name": "prepull",
+                            "image": image,
+                            "imagePullPolicy": "IfNotPresent",
+                            "command": ["/bin/sh", "-c", "exit 0"],
+                            "resources": small,
+                        }
+                    ],
+                    "containers": [{"name": "pause", "image": PAUSE_IMAGE, "resources": small}],
+                    "imagePullSecrets": [{"name": "registry-pull-secret"}],
+                    "terminationGracePeriodSeconds": 0,
+                },
+            },
+        },
+    }
+
+
+@api_priority(HOUSEKEEPING)
+def start_prepull(app):
+    """Roll out the pre-pull DaemonSet for ``app``'s current image.
+
+    Resets ``app.prepull_status`` (saved by the caller) and raises
+    ``ApiException`` if the DaemonSet cannot be created or replaced.
+    """
+    app_name = app.name.lower()
+    image = f"{settings.REGISTRY_URL}/{app.image}"
+    manifest = build_prepull_daemonset(app_name, image)
+
+    api = apps_v1()
+    try:
+        api.create_namespaced_daemon_set(namespace=NAMESPACE, body=manifest)
+    except ApiException as e:
+        if e.status != 409:
+            raise
+        # A pre-pull of an older tag is still running: retarget it
+        api.replace_namespaced_daemon_set(
+            name=_daemonset_name(app_name), namespace=NAMESPACE, body=manifest
+        )
+
+    app.prepull_status = {
+        "image": image,
+        "complete": False,
+        "nodes": {},
+        "updated_at": timezone.now().isoformat(),
+    }
+    logger.info("Started pre-pull of %s", image)
+
+
+def _pod_pull_state(pod):
+    statuses = pod.status.init_container_statuses or []
+    if not statuses:
+        return PULLING
+    status = statuses[0]
+    if status.state and status.state.waiting and status.state.waiting.reason in PULL_ERRORS:
+        return FAILED
+    # The kubelet reports an image ID once the image is on the node
+    if status.image_id:
+        return PULLED
+    return PULLING
+
+
+@api_priority(HOUSEKEEPING)
+def refresh_prepull_status(app):
+    """Update ``app.prepull_status`` from the pre-pull pods and save it.
+
+    Deletes the DaemonSet once every scheduled node has pulled the image (or
+    failed to). Returns the new status.
+    """
+    prepull = dict(app.prepull_status or {})
+    if not prepull.get("image") or prepull.get("complete"):
+        return prepull
+
+    app_name = app.name.lower()
+    image = prepull["image"]
+    try:
+        daemonset = apps_v1().read_namespaced_daemon_set(
+            name=_daemonset_name(app_name), namespace=NAMESPACE
+        )
+    except ApiException as e:
+        if e.status != 404:
+            raise
+        daemonset = None
+
+    pods = (
+        core_v1()
+        .list_namespaced_pod(namespace=NAMESPACE, label_selector=f"prepullApp={app_name}")
+        .items
+    )
+    nodes = dict(prepull.get("nodes") or {})
+    for pod in pods:
+        # Skip pods of a previous rollout still terminating
+        if pod.spec.node_name and pod.spec.init_containers[0].image == image:
+            nodes[pod.spec.node_name] = _pod_pull_state(pod)
+
+    desired = daemonset.status.desired_number_scheduled if daemonset else len(nodes)
+    pulled = sum(1 for state in nodes.values() if state == PULLED)
+    finished = sum(1 for state in nodes.values() if state in [PULLED, FAILED])
+    complete = daemonset is None or (desired > 0 and finished >= desired)
+
+    prepull.update(
+        nodes=nodes,
+        complete=complete,
+        updated_at=timezone.now().isoformat(),
+    )
+    app.prepull_status = prepull
+    app.save(update_fields=["prepull_status"])
+
+    if complete and daemonset is not None:
+        apps_v1().delete_namespaced_daemon_set(
+            name=_daemonset_name(app_name), namespace=NAMESPACE, propagation_policy="Background"
+        )
+        logger.info("Pre-pull of %s finished on %d nodes", image, pulled)
+    return prepull
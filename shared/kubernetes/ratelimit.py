@@ -0,0 +1,140 @@
+"""Prioritised client-side rate limiting of Kubernetes API requests.
+
+Every request made through the shared ``ApiClient`` takes a token from one
+process-wide token bucket (``K8S_API_QPS`` tokens per second, holding up to
+``K8S_API_BURST``). Requests carry a priority class, set for a block of code
+with :func:`api_priority`:
+
+- ``INTERACTIVE``: session starts and stops a user is waiting on;
+- ``STATUS``: status lookups (the default);
+- ``HOUSEKEEPING``: reaping, reconciling, pool refills and pre-pulls.
+
+Waiting requests are served in priority order, and lower classes may not
+drain the bucket below a reserve, so a start always finds a token quickly
+even while hundreds of tabs are polling. Watches are long-lived streams and
+are not limited.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+INTERACTIVE = 0
+STATUS = 1
+HOUSEKEEPING = 2
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", STATUS: "status", HOUSEKEEPING: "housekeeping"}
+
+# Share of the burst each class must leave in the bucket for higher classes
+RESERVED_SHARE = {INTERACTIVE: 0.0, STATUS: 0.2, HOUSEKEEPING: 0.5}
+
+_priority = contextvars.ContextVar("k8s_api_priority", default=STATUS)
+
+
+@contextmanager
+def api_priority(priority):
+    """Run the enclosed Kubernetes calls with the given priority class."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class PriorityTokenBucket:
+    """Token bucket whose waiters are served highest priority first."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(max(burst, 1))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiting = {priority: 0 for priority in PRIORITY_NAMES}
+        self._acquired = {priority: 0 for priority in PRIORITY_NAMES}
+        self._wait_seconds = {priority: 0.0 for priority in PRIORITY_NAMES}
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, priority):
+        # Whole tokens, and never the full bucket, so every class can progress
+        return min(int(self.burst * RESERVED_SHARE[priority]), self.burst - 1)
+
+    def _can_take(self, priority):
+        if any(self._waiting[p] for p in PRIORITY_NAMES if p < priority):
+            return False
+        return self._tokens - 1 >= self._reserve(priority)
+
+    def acquire(self, priority=STATUS):
+        """Block until a token is available to ``priority``; returns seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+
+        start = time.monotonic()
+        with self._condition:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._can_take(priority):
+                        self._tokens -= 1
+                        break
+                    # Time until this class could take a token, at least 1ms
+                    floor = self._reserve(priority) + 1
+                    self._condition.wait(max(0.001, (floor - self._tokens) / self.rate))
+            finally:
+                self._waiting[priority] -= 1
+                # Let lower classes re-check now that this waiter is gone
+                self._condition.notify_all()
+
+            waited = time.monotonic() - start
+            self._acquired[priority] += 1
+            self._wait_seconds[priority] += waited
+        return waited
+
+    def stats(self):
+        """Per-class counters: requests admitted, total seconds waited, waiting now."""
+        with self._condition:
+            return {
+                name: {
+                    "acquired": self._acquired[priority],
+                    "wait_seconds": round(self._wait_seconds[priority], 3),
+                    "waiting": self._waiting[priority],
+                }
+                for priority, name in PRIORITY_NAMES.items()
+            }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide limiter, built from settings on first use."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = PriorityTokenBucket(settings.K8S_API_QPS, settings.K8S_API_BURST)
+    return _limiter
+
+
+def reset_rate_limiter():
+    """Drop the limiter so the next request rebuilds it from settings (used by tests)."""
+    global _limiter
+    with _limiter_lock:
+        _limiter = None
+
+
+def rate_limiter_stats():
+    return get_rate_limiter().stats()
@@ -0,0 +1,114 @@
+"""Reconcile Pod rows with the session resources that exist in the cluster."""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cleanup import delete_session_resources
+from .config import apps_v1, core_v1, networking_v1
+from .informer import NAMESPACE
+from .ratelimit import HOUSEKEEPING, api_priority
+
+logger = logging.getLogger(__name__)
+
+
+def _changed_at(obj):
+    """Last time ``obj`` was written, including label changes."""
+    times = [obj.metadata.creation_timestamp]
+    times += [entry.time for entry in obj.metadata.managed_fields or []]
+    times = [t for t in times if t is not None]
+    return max(times) if times else None
+
+
+def _labels(items, label):
+    """Map label value -> last change time of the objects carrying it."""
+    found = {}
+    for obj in items:
+        key = (obj.metadata.labels or {}).get(label)
+        if key is not None:
+            changed = _changed_at(obj)
+            previous = found.get(key)
+            found[key] = max(previous, changed) if previous and changed else changed or previous
+    return found
+
+
+@api_priority(HOUSEKEEPING)
+def reconcile_sessions(grace_seconds=None):
+    """Bring ``Pod.is_deployed`` in line with the cluster in one pass.
+
+    Lists every session Deployment, Service and Ingress in the namespace once
+    and diffs them against all Pod rows:
+
+    - deployed rows without a Deployment are marked stopped (``bulk_update``)
+      and their ``Instances`` are deleted;
+    - Deployments, Services and Ingresses whose pod is not deployed (or has
+      no row at all) are deleted with batched deletecollection calls.
+
+    Anything changed within ``grace_seconds`` is left alone, so starts and
+    stops in flight are not mistaken for drift.
+
+    Returns:
+        dict: Counts of rows marked stopped, Instances and orphans deleted
+    """
+    # Import here to avoid circular imports
+    from main.models import Instances, Pod, SessionRoute
+
+    grace = timedelta(
+        seconds=settings.RECONCILE_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    )
+    cutoff = timezone.now() - grace
+
+    deployments = _labels(
+        apps_v1().list_namespaced_deployment(NAMESPACE, label_selector="deploymentApp").items,
+        "deploymentApp",
+    )
+    dependents = _labels(
+        core_v1().list_namespaced_service(NAMESPACE, label_selector="serviceApp").items,
+        "serviceApp",
+    )
+    for pod_name, changed in _labels(
+        networking_v1().list_namespaced_ingress(NAMESPACE, label_selector="ingressApp").items,
+        "ingressApp",
+    ).items():
+        dependents.setdefault(pod_name, changed)
+
+    pods = list(
+        Pod.objects.only(
+            "id", "pod_name", "is_deployed", "date_modified", "expires_at", "hibernated_at"
+        )
+    )
+    deployed = {pod.pod_name for pod in pods if pod.is_deployed}
+
+    stopped = []
+    for pod in pods:
+        if pod.is_deployed and pod.pod_name not in deployments and pod.date_modified < cutoff:
+            pod.is_deployed = False
+            pod.expires_at = None
+            pod.hibernated_at = None
+            pod.prestarted = False
+            stopped.append(pod)
+    # bulk_update skips auto_now, so date_modified keeps the last real change
+    Pod.objects.bulk_update(stopped, ["is_deployed", "expires_at", "hibernated_at", "prestarted"])
+
+    instances_deleted, _ = Instances.objects.filter(pod__is_deployed=False).delete()
+    SessionRoute.objects.filter(pod__is_deployed=False).delete()
+
+    orphans = [
+        pod_name
+        for pod_name, changed in {**dependents, **deployments}.items()
+        if pod_name not in deployed and changed is not None and changed < cutoff
+    ]
+    if orphans:
+        # Orphaned services and ingresses have no Deployment to collect them
+        delete_session_resources(orphans, unowned=orphans)
+
+    result = {
+        "marked_stopped": len(stopped),
+        "instances_deleted": instances_deleted,
+        "orphans_deleted": len(orphans),
+    }
+    if any(result.values()):
+        logger.info("Reconciled sessions: %s", result)
+    return result
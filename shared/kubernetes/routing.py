@@ -0,0 +1,102 @@
+"""Shared session routing table served to Traefik.
+
+With ``SESSION_ROUTING = "shared"`` no Ingress is created per session.
+Starting a session adds one ``SessionRoute`` row (host -> Service) and
+stopping it removes the row. Traefik's HTTP provider polls
+``/routing/traefik/`` for :func:`traefik_config`, which turns the table into
+one router and one service per session. New sessions are routable on the
+next poll, with no Kubernetes object for the ingress controller to watch or
+reload.
+"""
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+SHARED = "shared"
+
+# Headers the per-session Ingress sets through its nginx configuration-snippet.
+# Traefik already proxies websockets and forwards Host and X-Forwarded-*.
+NO_CACHE_MIDDLEWARE = "session-no-cache"
+NO_CACHE_HEADERS = {
+    "Cache-Control": "no-cache, no-store, must-revalidate",
+    "Pragma": "no-cache",
+    "Expires": "0",
+}
+
+
+def shared_routing():
+    """Whether sessions are routed through the shared table."""
+    return settings.SESSION_ROUTING == SHARED
+
+
+def add_route(pod, host, service_name, port=8080):
+    """Route ``host`` to ``pod``'s session Service and return the routed host.
+
+    Usernames that differ only in ``_`` and ``.`` clean to the same host, so
+    when another session already holds ``host`` the first label gets the
+    start of the pod name appended.
+    """
+    # Import here to avoid circular imports
+    from main.models import SessionRoute
+
+    def route(host):
+        with transaction.atomic():
+            SessionRoute.objects.update_or_create(
+                pod=pod, defaults={"host": host, "service_name": service_name, "port": port}
+            )
+        return host
+
+    try:
+        return route(host)
+    except IntegrityError:
+        label, _, domain = host.partition(".")
+        return route(f"{label}-{pod.pod_name[:8]}.{domain}")
+
+
+def remove_routes(pods):
+    """Drop the routes of ``pods`` (a queryset or list of Pod rows)."""
+    # Import here to avoid circular imports
+    from main.models import SessionRoute
+
+    SessionRoute.objects.filter(pod__in=pods).delete()
+
+
+def traefik_config(namespace="apps"):
+    """Return the Traefik dynamic configuration of every routed session.
+
+    Routes of sessions that are no longer deployed are skipped, so a route
+    left behind by a failed stop never serves traffic.
+    """
+    # Import here to avoid circular imports
+    from main.models import SessionRoute
+
+    routers, services = {}, {}
+    middlewares = [f"{NO_CACHE_MIDDLEWARE}@http", *settings.SESSION_ROUTE_MIDDLEWARES]
+    routes = SessionRoute.objects.filter(pod__is_deployed=True).select_related("pod")
+    for route in routes.order_by("host"):
+        name = f"session-{route.pod.pod_name}"
+        router = {
+            "rule": f"Host(`{route.host}`)",
+            "service": name,
+            "entryPoints": settings.SESSION_ROUTE_ENTRYPOINTS,
+            "middlewares": middlewares,
+            "tls": {},
+        }
+        if settings.SESSION_ROUTE_TLS_OPTIONS:
+            router["tls"]["options"] = settings.SESSION_ROUTE_TLS_OPTIONS
+        routers[name] = router
+        services[name] = {
+            "loadBalancer": {
+                "servers": [{"url": f"http://{route.service_name}.{namespace}.svc:{route.port}"}]
+            }
+        }
+
+    return {
+        "http": {
+            "routers": routers,
+            "services": services,
+            "middlewares": {
+                NO_CACHE_MIDDLEWARE: {"headers": {"customResponseHeaders": NO_CACHE_HEADERS}}
+            },
+        }
+    }
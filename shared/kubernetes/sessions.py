@@ -0,0 +1,516 @@
+"""Session lifecycle orchestration for users' app sessions."""
+
+import contextvars
+import hashlib
+import logging
+from concurrent.futures import as_completed, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from kubernetes.client.rest import ApiException
+
+from shared.utils.threading import get_executor
+
+from .admission import dispatch, expire_admissions, release, request_start
+from .cleanup import delete_session_resources
+from .deployments import (
+    app_resources,
+    create_ingress,
+    create_service,
+    delete_deployment,
+    delete_ingress,
+    delete_service,
+    deploy_app,
+    owner_reference,
+    scale_deployment,
+    session_host,
+    session_service_name,
+    turn_env,
+)
+from .pods import forget_session_status, new_pod
+from .ratelimit import HOUSEKEEPING, INTERACTIVE, api_priority
+from .routing import add_route, remove_routes, shared_routing
+
+logger = logging.getLogger(__name__)
+
+
+def _executor():
+    return get_executor("k8s-session", settings.K8S_SESSION_WORKERS)
+
+
+def _rollback(created):
+    """Undo the resources of a failed start, ignoring errors."""
+    for name, undo in created:
+        try:
+            undo()
+        except Exception as e:
+            logger.error("Rollback of %s failed: %s", name, e)
+
+
+def create_session_resources(pod, app, target_user):
+    """Create a session's Deployment, then its Service and Ingress concurrently.
+
+    The Service and Ingress are owned by the Deployment (ownerReferences), so
+    they are created once the Deployment exists, in parallel on a bounded
+    executor. If either fails, deleting the Deployment removes everything
+    that was created before the error is re-raised, so a failed start never
+    leaves half a session. With shared routing only the Service is created
+    and the session's host is added to the routing table.
+
+    Returns:
+        str: The ingress host
+    """
+    # Import here to avoid circular imports
+    from main.models import DefaultUser
+
+    app_name = app.name.lower()
+    pod_name = pod.pod_name
+    cleaned_username = target_user.username.replace("_", "-").replace(".", "-").lower()
+    readonly_volume = target_user.role in [DefaultUser.STUDENT, DefaultUser.GUEST]
+
+    deployment = deploy_app(
+        username=target_user.username,
+        pod_name=pod_name,
+        app_name=app_name,
+        image=app.image,
+        vnc_password=hashlib.md5(pod.pod_vnc_password.encode("utf-8")).hexdigest(),
+        user_hostname=cleaned_username,
+        readonly=readonly_volume,
+        app_type=app.app_type,
+        resources=app_resources(app),
+    )
+    owner = owner_reference(deployment)
+
+    if shared_routing():
+        # One row in the routing table Traefik polls instead of an Ingress
+        try:
+            create_service(pod_name=pod_name, app_name=app_name, owner=owner)
+            return add_route(
+                pod,
+                session_host(cleaned_username, app_name),
+                session_service_name(pod_name, app_name),
+            )
+        except Exception as e:
+            logger.error("Failed to route %s: %s", pod_name, e)
+            _rollback([("deployment", lambda: delete_deployment(pod_name, app_name))])
+            raise
+
+    # Each task runs in a copy of this context so it keeps the API priority
+    executor = _executor()
+    service = executor.submit(
+        contextvars.copy_context().run,
+        create_service,
+        pod_name=pod_name,
+        app_name=app_name,
+        owner=owner,
+    )
+    ingress = executor.submit(
+        contextvars.copy_context().run,
+        create_ingress,
+        pod_name=pod_name,
+        app_name=app_name,
+        user_hostname=cleaned_username,
+        owner=owner,
+    )
+    wait([service, ingress])
+
+    for name, future in (("service", service), ("ingress", ingress)):
+        error = future.exception()
+        if error is not None:
+            logger.error("Failed to create %s for %s: %s", name, pod_name, error)
+            _rollback([("deployment", lambda: delete_deployment(pod_name, app_name))])
+            raise error
+
+    return ingress.result()
+
+
+@api_priority(INTERACTIVE)
+def start_session(pod, app, target_user, request=None, progress=None):
+    """Start ``pod``'s session and record it in the database.
+
+    ``progress`` is an optional ``callable(percent, message)`` used by
+    background operations to report how far the start has got.
+
+    A hibernated session is resumed by scaling its Deployment back to one
+    replica; its Service, Ingress and URL were kept. A webrtc session gets
+    fresh TURN credentials in the same patch, since the ones it was created
+    with may have expired while it slept. If the Deployment is gone the
+    session is created from scratch.
+
+    Returns the ``Instances`` row of the started session. Kubernetes errors
+    are raised after the partially created resources have been rolled back.
+    """
+    # Import here to avoid circular imports
+    from main.models import App, Instances
+    from main.utils.activity_logger import ActivityLogger
+
+    hibernated = pod.hibernated_at is not None
+    if progress:
+        progress(10, "Resuming session..." if hibernated else "Creating deployment...")
+    try:
+        resumed = False
+        if hibernated:
+            env = turn_env() if app.app_type == App.WEBRTC else None
+            resumed = scale_deployment(pod.pod_name, 1, env=env)
+        host = None if resumed else create_session_resources(pod, app, target_user)
+    finally:
+        # The Deployment now counts against capacity by itself
+        release(pod)
+    if progress:
+        progress(80, "Recording session...")
+
+    pod.is_deployed = True
+    pod.hibernated_at = None
+    # Stopped by the session_worker reaper once this passes
+    pod.expires_at = timezone.now() + timedelta(minutes=app.session_duration_minutes)
+    pod.started_at = timezone.now()
+    # Idle detection counts from here until a client connects
+    pod.last_active_at = pod.started_at
+    pod.save()
+
+    instance, _created = Instances.objects.get_or_create(pod=pod, instance_name=pod.pod_name)
+    if host:
+        instance.novnc_url = f"https://{host}"
+        instance.save()
+
+    forget_session_status(pod.pod_name)
+    ActivityLogger.log_pod_start(target_user, app.name, pod.pod_name, request)
+    return instance
+
+
+def session_limit(pod, app):
+    """Latest ``pod``'s session may be extended to, or ``None`` if it can't be."""
+    if not app.max_session_minutes or pod.started_at is None:
+        return None
+    return pod.started_at + timedelta(minutes=app.max_session_minutes)
+
+
+def extend_session(pod, app, minutes=None, now=None):
+    """Push the expiry of ``pod``'s running session forward.
+
+    The session then expires ``minutes`` (at most, and by default,
+    ``app.session_duration_minutes``) from now, but never later than
+    ``app.max_session_minutes`` after it started and never earlier than it
+    already would. Only the database row changes: the reaper picks up the
+    new ``expires_at`` and no Kubernetes object is touched, so clients may
+    call this periodically as a keep-alive.
+
+    Returns the new ``expires_at``.
+    """
+    # Import here to avoid circular imports
+    from main.models import Pod
+
+    now = now or timezone.now()
+    duration = app.session_duration_minutes
+    if minutes is not None:
+        duration = max(0, min(minutes, duration))
+
+    expires_at = now + timedelta(minutes=duration)
+    limit = session_limit(pod, app)
+    if limit is not None:
+        expires_at = min(expires_at, limit)
+    if pod.expires_at is not None:
+        expires_at = max(expires_at, pod.expires_at)
+
+    # Whoever extends is using the session, so idle detection leaves it alone
+    pod.expires_at, pod.last_active_at = expires_at, now
+    Pod.objects.filter(pk=pod.pk).update(expires_at=expires_at, last_active_at=now)
+    return expires_at
+
+
+@api_priority(INTERACTIVE)
+def hibernate_session(pod, target_user, request=None):
+    """Scale ``pod``'s session to zero replicas, keeping its Service and Ingress.
+
+    The container stops and frees its node resources, but resuming (a start
+    of the same pod) is a single scale patch that skips creating the routing
+    again. The reaper stops the session for good
+    ``SESSION_HIBERNATE_TTL_MINUTES`` from now unless it is resumed first.
+
+    Returns ``False`` if the session's Deployment no longer exists.
+    """
+    # Import here to avoid circular imports
+    from main.utils.activity_logger import ActivityLogger
+
+    if pod.hibernated_at is not None:
+        return True
+    if not scale_deployment(pod.pod_name, 0):
+        return False
+
+    pod.hibernated_at = timezone.now()
+    pod.expires_at = pod.hibernated_at + timedelta(minutes=settings.SESSION_HIBERNATE_TTL_MINUTES)
+    pod.save(update_fields=["hibernated_at", "expires_at", "date_modified"])
+    forget_session_status(pod.pod_name)
+
+    ActivityLogger.log_pod_stop(target_user, pod.app_name, pod.pod_name, request, hibernated=True)
+    return True
+
+
+@api_priority(INTERACTIVE)
+def stop_session(pod, target_user, request=None):
+    """Delete ``pod``'s session resources and mark it stopped in the database."""
+    # Import here to avoid circular imports
+    from main.models import Instances
+    from main.utils.activity_logger import ActivityLogger
+
+    # Sessions with a legacy cleanup Job predate ownerReferences
+    unowned = bool(pod.cleanup_job_name)
+
+    # Cancel any scheduled stop task FIRST, and any start still queued
+    pod.cancel_scheduled_stop()
+    release(pod)
+
+    pod_name = pod.pod_name
+    app_name = pod.app_name.lower()
+
+    # The service and ingress are garbage-collected with the deployment that
+    # owns them; only unowned ones are deleted explicitly. Missing resources
+    # are not errors.
+    deletes = [("deployment", delete_deployment)]
+    if unowned:
+        deletes += [("service", delete_service), ("ingress", delete_ingress)]
+    for name, delete in deletes:
+        try:
+            delete(pod_name, app_name)
+        except ApiException as e:
+            logger.error("Failed to delete %s for %s: %s", name, pod_name, e)
+
+    pod.is_deployed = False
+    pod.hibernated_at = None
+    pod.prestarted = False
+    pod.save()
+
+    Instances.objects.filter(pod=pod, instance_name=pod_name).delete()
+    remove_routes([pod])
+    forget_session_status(pod_name)
+
+    ActivityLogger.log_pod_stop(target_user, pod.app_name, pod_name, request)
+
+
+def _tear_down(pods, batch_size):
+    """Delete the resources of locked, deployed ``pods`` and mark them stopped."""
+    # Import here to avoid circular imports
+    from main.models import Instances, Pod
+
+    delete_session_resources(
+        [pod.pod_name for pod in pods],
+        batch_size=batch_size,
+        unowned=[pod.pod_name for pod in pods if pod.cleanup_job_name],
+    )
+
+    Pod.objects.filter(pk__in=[pod.pk for pod in pods]).update(
+        is_deployed=False, expires_at=None, hibernated_at=None, prestarted=False
+    )
+    Instances.objects.filter(pod__in=pods).delete()
+    remove_routes(pods)
+
+
+@api_priority(HOUSEKEEPING)
+def reap_expired_sessions(now=None, batch_size=None):
+    """Stop the sessions whose ``expires_at`` has passed, oldest first.
+
+    Expired pods are found with one indexed query and their Kubernetes
+    resources are removed with batched deletecollection calls. The rows stay
+    locked while deleting, so if the API call fails the transaction rolls
+    back and the same sessions are retried on the next pass. Hibernated
+    sessions are reaped the same way once their hibernation TTL has passed.
+
+    Returns the number of sessions stopped.
+    """
+    # Import here to avoid circular imports
+    from main.models import Pod
+    from main.utils.activity_logger import ActivityLogger
+
+    now = now or timezone.now()
+    batch_size = batch_size or settings.SESSION_REAPER_BATCH_SIZE
+
+    with transaction.atomic():
+        expired = list(
+            Pod.objects.select_for_update(skip_locked=True)
+            .select_related("pod_user")
+            .filter(is_deployed=True, expires_at__lte=now)
+            .order_by("expires_at")[:batch_size]
+        )
+        if not expired:
+            return 0
+
+        _tear_down(expired, batch_size)
+
+    for pod in expired:
+        ActivityLogger.log_pod_stop(pod.pod_user, pod.app_name, pod.pod_name)
+    logger.info("Reaped %d expired sessions", len(expired))
+    return len(expired)
+
+
+def session_filter(group=None, app=None, guests=False):
+    """Return the Pod rows of the sessions matching every given filter.
+
+    ``group`` is an ``AccessGroup`` and ``app`` an ``App``; ``guests``
+    selects the sessions of guest users. At least one filter is required.
+    """
+    # Import here to avoid circular imports
+    from main.models import DefaultUser, Pod
+
+    if group is None and app is None and not guests:
+        raise ValueError("A group, an app or guests is required")
+
+    pods = Pod.objects.all()
+    if group is not None:
+        pods = pods.filter(pod_user__group=group)
+    if app is not None:
+        pods = pods.filter(app_name=app.name)
+    if guests:
+        pods = pods.filter(pod_user__role=DefaultUser.GUEST)
+    return pods
+
+
+@api_priority(INTERACTIVE)
+def teardown_sessions(pods, request=None):
+    """Stop every session in ``pods`` (a Pod queryset) in a few API calls.
+
+    Like the reaper, the resources of all matching sessions are removed with
+    set-based label selectors, ``TEARDOWN_BATCH_SIZE`` sessions per
+    deletecollection call, and the rows are updated in bulk. Starts still
+    waiting for capacity are cancelled. Rows locked by a start or stop in
+    progress are skipped.
+
+    Returns the number of sessions stopped.
+    """
+    # Import here to avoid circular imports
+    from main.models import AdmissionTicket
+    from main.utils.activity_logger import ActivityLogger
+
+    AdmissionTicket.objects.filter(pod__in=pods.filter(is_deployed=False)).delete()
+
+    with transaction.atomic():
+        targets = list(
+            pods.select_for_update(skip_locked=True, of=("self",))
+            .select_related("pod_user")
+            .filter(is_deployed=True)
+        )
+        if not targets:
+            return 0
+        _tear_down(targets, settings.TEARDOWN_BATCH_SIZE)
+
+    for pod in targets:
+        forget_session_status(pod.pod_name)
+        ActivityLogger.log_pod_stop(pod.pod_user, pod.app_name, pod.pod_name, request)
+    logger.info("Tore down %d sessions", len(targets))
+    return len(targets)
+
+
+def _prestart(pod, app):
+    # Import here to avoid circular imports
+    from main.models import Pod
+
+    try:
+        start_session(pod, app, pod.pod_user)
+        return {"pod_name": pod.pod_name, "status": "started"}
+    except Exception as e:
+        logger.error("Failed to pre-start %s: %s", pod.pod_name, e)
+        Pod.objects.filter(pk=pod.pk).update(prestarted=False)
+        return {"pod_name": pod.pod_name, "status": "failed", "error": str(e)}
+    finally:
+        connections.close_all()
+
+
+def prestart_group(app, group, progress=None):
+    """Start ``app`` for every student of ``group`` ahead of a lab.
+
+    Each start goes through admission like a student's own: sessions that
+    fit are started on a bounded executor (``PRESTART_WORKERS`` at a time),
+    the rest are queued and started by the session worker as capacity frees
+    up. Students whose session already runs are left alone. The sessions
+    are flagged ``prestarted`` so idle detection waits
+    ``PRESTART_IDLE_GRACE_MINUTES`` longer for their first client.
+
+    ``progress`` is an optional ``callable(percent, message)``. Returns the
+    counts per outcome and a per-student result keyed by username.
+    """
+    # Import here to avoid circular imports
+    from main.models import DefaultUser, Pod
+
+    students = list(
+        DefaultUser.objects.filter(group=group, role=DefaultUser.STUDENT).order_by("username")
+    )
+    pods = {
+        pod.pod_user_id: pod for pod in Pod.objects.filter(pod_user__in=students, app_name=app.name)
+    }
+    missing = [new_pod(student, app.name) for student in students if student.pk not in pods]
+    Pod.objects.bulk_create(missing)
+    pods.update({pod.pod_user_id: pod for pod in missing})
+
+    results, futures = {}, {}
+    executor = get_executor("prestart", settings.PRESTART_WORKERS)
+    for student in students:
+        pod = pods[student.pk]
+        pod.pod_user = student
+        if pod.is_deployed and pod.hibernated_at is None:
+            results[student.username] = {"pod_name": pod.pod_name, "status": "running"}
+            continue
+        # Idle detection gives the session extra time until a client connects
+        pod.prestarted = True
+        Pod.objects.filter(pk=pod.pk).update(prestarted=True)
+        if request_start(pod, app) is not None:
+            results[student.username] = {"pod_name": pod.pod_name, "status": "queued"}
+        else:
+            futures[executor.submit(_prestart, pod, app)] = student.username
+
+    total = len(students)
+    done = total - len(futures)
+    for future in as_completed(futures):
+        results[futures[future]] = future.result()
+        done += 1
+        if progress:
+            progress(int(done * 100 / total), f"{done}/{total} sessions handled")
+
+    counts = {"started": 0, "queued": 0, "running": 0, "failed": 0}
+    for result in results.values():
+        counts[result["status"]] += 1
+    logger.info("Pre-started %s for %s: %s", app.name, group.name, counts)
+    return {"group": group.name, "app": app.name, **counts, "students": results}
+
+
+def next_expiry():
+    """Return when the next deployed session expires, or ``None``."""
+    # Import here to avoid circular imports
+    from main.models import Pod
+
+    return (
+        Pod.objects.filter(is_deployed=True, expires_at__isnull=False)
+        .order_by("expires_at")
+        .values_list("expires_at", flat=True)
+        .first()
+    )
+
+
+def _start_admitted(ticket):
+    # Import here to avoid circular imports
+    from main.models import App
+
+    pod = ticket.pod
+    try:
+        app = App.objects.get(name=pod.app_name)
+        start_session(pod, app, pod.pod_user)
+    except Exception as e:
+        release(pod)
+        logger.error("Failed to start queued session %s: %s", pod.pod_name, e)
+    finally:
+        connections.close_all()
+
+
+def start_queued_sessions():
+    """Admit queued starts that now fit and start them concurrently.
+
+    Admitted starts that never finished are expired first, so their
+    capacity is available again. Returns the number of sessions started.
+    """
+    expire_admissions()
+    admitted = dispatch()
+    if admitted:
+        executor = get_executor("admission", settings.K8S_SESSION_WORKERS)
+        wait([executor.submit(_start_admitted, ticket) for ticket in admitted])
+        logger.info("Started %d queued sessions", len(admitted))
+    return len(admitted)
@@ -0,0 +1,158 @@
+"""Session resource usage sampling and right-sized App resources.
+
+The session worker periodically reads the CPU and memory every running
+session uses from the metrics API (``metrics.k8s.io``, served by
+metrics-server) and stores one ``UsageSample`` per session. From the samples
+of the last days :func:`recommend_resources` derives requests that fit what
+sessions of an app actually use, so more of them fit on a node, and a
+memory limit above the highest usage seen, so they are not OOM-killed.
+"""
+
+import logging
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .config import custom_objects
+from .deployments import app_resources, cpu_millicores, memory_mib
+from .informer import NAMESPACE
+from .ratelimit import HOUSEKEEPING, api_priority
+
+logger = logging.getLogger(__name__)
+
+# Floors of recommended requests (millicores, MiB)
+MIN_CPU_MILLICORES = 50
+MIN_MEMORY_MIB = 64
+
+
+@api_priority(HOUSEKEEPING)
+def sample_usage(now=None):
+    """Record the current usage of every deployed session.
+
+    Also deletes samples older than ``USAGE_SAMPLE_RETENTION_DAYS``. Returns
+    the number of samples recorded.
+    """
+    # Import here to avoid circular imports
+    from main.models import App, Pod, UsageSample
+
+    now = now or timezone.now()
+    metrics = custom_objects().list_namespaced_custom_object(
+        "metrics.k8s.io", "v1beta1", NAMESPACE, "pods", label_selector="appDep"
+    )
+
+    usage = {}
+    for item in metrics.get("items", []):
+        pod_name = (item["metadata"].get("labels") or {}).get("appDep")
+        containers = item.get("containers", [])
+        cpu = sum(cpu_millicores(c["usage"].get("cpu")) for c in containers)
+        memory = sum(memory_mib(c["usage"].get("memory")) for c in containers)
+        # A session has one replica, but sum anything still rolling over
+        previous = usage.get(pod_name, (0, 0))
+        usage[pod_name] = (previous[0] + cpu, previous[1] + memory)
+
+    sessions = Pod.objects.filter(is_deployed=True, pod_name__in=usage).values_list(
+        "pod_name", "app_name"
+    )
+    apps = {app.name: app for app in App.objects.all()}
+    samples = [
+        UsageSample(
+            app=apps[app_name],
+            pod_name=pod_name,
+            cpu_millicores=usage[pod_name][0],
+            memory_mib=usage[pod_name][1],
+            sampled_at=now,
+        )
+        for pod_name, app_name in sessions
+        if app_name in apps
+    ]
+    UsageSample.objects.bulk_create(samples)
+
+    cutoff = now - timedelta(days=settings.USAGE_SAMPLE_RETENTION_DAYS)
+    UsageSample.objects.filter(sampled_at__lt=cutoff).delete()
+    return len(samples)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list of numbers."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _round_up(value, step):
+    return int(math.ceil(value / step) * step)
+
+
+def recommend_resources(app, days=None, pct=None):
+    """Suggest resource fields for ``app`` from its recent usage samples.
+
+    Requests are the ``pct`` percentile of usage plus
+    ``RESOURCE_RECOMMENDER_HEADROOM``; the memory limit is the highest usage
+    seen plus the same headroom, and never below the request. The CPU limit
+    is kept (exceeding it only throttles) unless the request outgrows it: the
+    API server rejects a request above its limit, so it is raised to match.
+
+    Returns ``None`` while there are fewer than
+    ``RESOURCE_RECOMMENDER_MIN_SAMPLES`` samples, otherwise a dict with the
+    recommended ``cpu_request``, ``cpu_limit``, ``memory_request`` and
+    ``memory_limit``, the ``current`` values and the ``observed`` usage
+    behind them.
+    """
+    days = days or settings.USAGE_SAMPLE_RETENTION_DAYS
+    pct = pct or settings.RESOURCE_RECOMMENDER_PERCENTILE
+    headroom = settings.RESOURCE_RECOMMENDER_HEADROOM
+
+    since = timezone.now() - timedelta(days=days)
+    samples = list(
+        app.usage_samples.filter(sampled_at__gte=since).values_list("cpu_millicores", "memory_mib")
+    )
+    if len(samples) < settings.RESOURCE_RECOMMENDER_MIN_SAMPLES:
+        return None
+
+    cpu = [s[0] for s in samples]
+    memory = [s[1] for s in samples]
+    cpu_request = max(MIN_CPU_MILLICORES, _round_up(percentile(cpu, pct) * headroom, 10))
+    memory_request = max(MIN_MEMORY_MIB, _round_up(percentile(memory, pct) * headroom, 16))
+    memory_limit = max(memory_request, _round_up(max(memory) * headroom, 16))
+
+    resources = app_resources(app)
+    cpu_limit = resources["limits"]["cpu"]
+    if cpu_request > cpu_millicores(cpu_limit):
+        cpu_limit = f"{cpu_request}m"
+    return {
+        "samples": len(samples),
+        "cpu_request": f"{cpu_request}m",
+        "cpu_limit": cpu_limit,
+        "memory_request": f"{memory_request}Mi",
+        "memory_limit": f"{memory_limit}Mi",
+        "current": {
+            "cpu_request": resources["requests"]["cpu"],
+            "cpu_limit": resources["limits"]["cpu"],
+            "memory_request": resources["requests"]["memory"],
+            "memory_limit": resources["limits"]["memory"],
+        },
+        "observed": {
+            "cpu_p50": percentile(cpu, 50),
+            f"cpu_p{pct}": percentile(cpu, pct),
+            "cpu_max": max(cpu),
+            "memory_p50": percentile(memory, 50),
+            f"memory_p{pct}": percentile(memory, pct),
+            "memory_max": max(memory),
+        },
+    }
+
+
+def apply_recommendation(app, recommendation):
+    """Save a :func:`recommend_resources` result on ``app``.
+
+    New sessions use it.
+    """
+    fields = ["cpu_request", "memory_request", "memory_limit"]
+    if recommendation["cpu_limit"] != recommendation["current"]["cpu_limit"]:
+        fields.append("cpu_limit")
+    for field in fields:
+        setattr(app, field, recommendation[field])
+    app.save(update_fields=fields)
+    logger.info("Applied resource recommendation to %s: %s", app.name, recommendation)
@@ -1,4 +1,4 @@
 # Utility functions
-from .threading import autotask
+from .threading import autotask, get_executor
 
-__all__ = ["autotask"]
+__all__ = ["autotask", "get_executor"]
@@ -0,0 +1,265 @@
+"""Prometheus text exposition helpers."""
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{str(value).replace(chr(34), "")}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Fixed-bucket histogram that can be rendered in the Prometheus text format."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = next((i for i, b in enumerate(self.buckets) if value <= b), len(self.buckets))
+        self.counts[index] += 1
+        self.sum += value
+
+    def copy(self):
+        histogram = Histogram(self.buckets)
+        histogram.counts, histogram.sum = list(self.counts), self.sum
+        return histogram
+
+    def merge(self, other):
+        """Add the observations of ``other`` (same buckets) to this histogram."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts, strict=True)]
+        self.sum += other.sum
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def cumulative(self):
+        """Return ``[(upper bound, cumulative count)]`` ending with ``+Inf``."""
+        result, total = [], 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts, strict=True):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class MetricFamily:
+    """One metric (name, type, help) and its samples, keyed by label tuples."""
+
+    def __init__(self, name, kind, help_text):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.samples = {}
+
+    def add(self, labels, value):
+        self.samples[tuple(labels)] = value
+        return self
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.samples.items()):
+            if isinstance(value, Histogram):
+                for bound, count in value.cumulative():
+                    bucket_labels = (*labels, ("le", bound))
+                    lines.append(f"{self.name}_bucket{_labels(bucket_labels)} {count}")
+                lines.append(f"{self.name}_sum{_labels(labels)} {_number(value.sum)}")
+                lines.append(f"{self.name}_count{_labels(labels)} {value.count}")
+            else:
+                lines.append(f"{self.name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines)
+
+
+def render(families):
+    """Render metric families as one Prometheus text exposition."""
+    return "\n".join(family.render() for family in families) + "\n"
+
+
+class Registry:
+    """Thread-safe store of labelled counters, gauges and histograms."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            key = (name, tuple(labels))
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def add_gauge(self, name, labels, amount):
+        with self.lock:
+            key = (name, tuple(labels))
+            self.gauges[key] = self.gauges.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets):
+        with self.lock:
+            key = (name, tuple(labels))
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def family(self, name, kind, help_text):
+        """Snapshot the samples stored under ``name`` as a :class:`MetricFamily`."""
+        store = {"counter": self.counters, "gauge": self.gauges, "histogram": self.histograms}[kind]
+        family = MetricFamily(name, kind, help_text)
+        with self.lock:
+            for (metric, labels), value in store.items():
+                if metric != name:
+                    continue
+                family.add(labels, value.copy() if isinstance(value, Histogram) else value)
+        return family
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+
+def merge(family_lists):
+    """Sum lists of metric families (one list per process) into one list.
+
+    Samples with the same name and labels are added up: counters and
+    histograms give totals, gauges the sum over processes.
+    """
+    merged = {}
+    for families in family_lists:
+        for family in families:
+            target = merged.get(family.name)
+            if target is None:
+                target = merged[family.name] = MetricFamily(
+                    family.name, family.kind, family.help_text
+                )
+            for labels, value in family.samples.items():
+                current = target.samples.get(labels)
+                if current is None:
+                    target.add(labels, value.copy() if isinstance(value, Histogram) else value)
+                elif isinstance(value, Histogram):
+                    current.merge(value)
+                else:
+                    target.add(labels, current + value)
+    return list(merged.values())
+
+
+def _dump(families):
+    def value(sample):
+        if isinstance(sample, Histogram):
+            return {"buckets": sample.buckets, "counts": sample.counts, "sum": sample.sum}
+        return sample
+
+    return [
+        {
+            "name": family.name,
+            "kind": family.kind,
+            "help": family.help_text,
+            "samples": [[labels, value(sample)] for labels, sample in family.samples.items()],
+        }
+        for family in families
+    ]
+
+
+def _load(data):
+    families = []
+    for entry in data:
+        family = MetricFamily(entry["name"], entry["kind"], entry["help"])
+        for labels, sample in entry["samples"]:
+            if isinstance(sample, dict):
+                histogram = Histogram(sample["buckets"])
+                histogram.counts, histogram.sum = sample["counts"], sample["sum"]
+                sample = histogram
+            family.add(tuple(tuple(label) for label in labels), sample)
+        families.append(family)
+    return families
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MultiProcessMetrics:
+    """Metric families of every process that shares ``directory``.
+
+    Each process writes a snapshot of its ``collect()`` families to
+    ``<directory>/<pid>.json`` every ``interval`` seconds and before it
+    serves a scrape; :meth:`families` merges the snapshots, so a scrape of
+    any process sees the totals of all of them. Snapshots of exited
+    processes keep counting towards counters and histograms, so totals
+    never go backwards, but not towards gauges. The directory must not be
+    shared between hosts and should be emptied when the server starts.
+    """
+
+    def __init__(self, collect, directory, interval=5):
+        self.collect = collect
+        self.directory = directory
+        self.interval = interval
+        self._started_pid = None
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def publish(self):
+        """Write this process's snapshot, replacing the previous one."""
+        path = self._path(os.getpid())
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(_dump(self.collect()), f)
+        os.replace(f"{path}.tmp", path)
+
+    def _publish_forever(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.publish()
+            except (OSError, ValueError) as e:
+                logger.warning("Could not publish metrics: %s", e)
+
+    def start(self):
+        """Publish in a background thread (once per process)."""
+        if self._started_pid == os.getpid():
+            return
+        self._started_pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._publish_forever, name="metrics", daemon=True).start()
+
+    def families(self):
+        """The merged metric families of every process."""
+        os.makedirs(self.directory, exist_ok=True)
+        self.publish()
+        snapshots = []
+        for name in sorted(os.listdir(self.directory)):
+            pid, extension = os.path.splitext(name)
+            if extension != ".json" or not pid.isdigit():
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    families = _load(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping unreadable metrics snapshot %s: %s", name, e)
+                continue
+            if not _alive(int(pid)):
+                families = [family for family in families if family.kind != "gauge"]
+            snapshots.append((int(pid) != os.getpid(), families))
+        # This process's families first, so the output keeps their order
+        return merge(families for _other, families in sorted(snapshots, key=lambda s: s[0]))
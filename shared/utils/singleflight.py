@@ -0,0 +1,95 @@
+"""Single-flight lookups shared through the Django cache backend."""
+
+import logging
+import time
+import uuid
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 0.05
+
+
+def coalesce_many(prefix, keys, fetch, ttl, wait):
+    """Return ``{key: value}`` for ``keys``, fetching each key once across callers.
+
+    Results are cached for ``ttl`` seconds under ``<prefix>:<key>``. For keys
+    not cached, the caller that wins a cache ``add`` of ``<prefix>:<key>:lock``
+    calls ``fetch(keys)`` (which returns ``{key: value}``) and publishes the
+    result; concurrent callers in any thread or process poll the cache for
+    it for up to ``wait`` seconds, or until the lock is released without a
+    result, and then fetch whatever is still missing themselves. Errors from
+    ``fetch`` are raised to the caller that fetched.
+
+    If the cache backend fails, every key is fetched directly.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+
+    def result_key(key):
+        return f"{prefix}:{key}"
+
+    try:
+        found = cache.get_many([result_key(key) for key in keys])
+        results = {key: found[result_key(key)] for key in keys if result_key(key) in found}
+
+        token = uuid.uuid4().hex
+        owned, waiting = [], []
+        for key in keys:
+            if key in results:
+                continue
+            # The lock outlives a slow fetch by a little so waiters give up first
+            if cache.add(f"{result_key(key)}:lock", token, timeout=wait + 1):
+                owned.append(key)
+            else:
+                waiting.append(key)
+    except Exception as e:
+        logger.warning("Cache unavailable for %s lookups: %s", prefix, e)
+        return fetch(keys)
+
+    if owned:
+        try:
+            fetched = fetch(owned)
+            results.update(fetched)
+            try:
+                cache.set_many({result_key(key): value for key, value in fetched.items()}, ttl)
+            except Exception as e:
+                logger.warning("Could not cache %s lookups: %s", prefix, e)
+        finally:
+            try:
+                cache.delete_many([f"{result_key(key)}:lock" for key in owned])
+            except Exception as e:
+                logger.warning("Could not release %s lookup locks: %s", prefix, e)
+
+    abandoned = []
+    deadline = time.monotonic() + wait
+    while waiting and time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        try:
+            found = cache.get_many(
+                [result_key(key) for key in waiting]
+                + [f"{result_key(key)}:lock" for key in waiting]
+            )
+        except Exception as e:
+            logger.warning("Cache unavailable for %s lookups: %s", prefix, e)
+            break
+        results.update({key: found[result_key(key)] for key in waiting if result_key(key) in found})
+        waiting = [key for key in waiting if key not in results]
+        # A lock released without a result means the other lookup failed
+        abandoned += [key for key in waiting if f"{result_key(key)}:lock" not in found]
+        waiting = [key for key in waiting if key not in abandoned]
+
+    if abandoned or waiting:
+        # The other lookup failed or is too slow
+        results.update(fetch(abandoned + waiting))
+    return results
+
+
+def forget(prefix, keys):
+    """Drop the cached results of ``keys`` so the next lookup fetches them."""
+    try:
+        cache.delete_many([f"{prefix}:{key}" for key in keys])
+    except Exception as e:
+        logger.warning("Could not invalidate %s lookups: %s", prefix, e)
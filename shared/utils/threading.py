@@ -1,6 +1,12 @@
 """Threading utilities."""
 
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+
+_executors = {}
+_executors_lock = Lock()
+_slots = {}
+_slots_lock = Lock()
 
 
 def autotask(func):
@@ -12,3 +18,38 @@ def autotask(func):
         t.start()
 
     return decor
+
+
+def get_executor(name, max_workers):
+    """Return the process-wide bounded thread pool called ``name``, creating it on first use."""
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+                _executors[name] = executor
+    return executor
+
+
+def take_slot(name, limit):
+    """Take one of ``limit`` process-wide slots called ``name`` without blocking.
+
+    Returns a callable that gives the slot back (calling it again is a no-op),
+    or None when all slots are taken.
+    """
+    with _slots_lock:
+        if _slots.get(name, 0) >= limit:
+            return None
+        _slots[name] = _slots.get(name, 0) + 1
+
+    released = False
+
+    def release():
+        nonlocal released
+        with _slots_lock:
+            if not released:
+                released = True
+                _slots[name] -= 1
+
+    return release
@@ -1,12 +1,16 @@
 """API tests for apps/pod endpoints."""
 
+from datetime import timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from main.models import AccessGroup, App, DefaultUser, Pod
+from api.operations import run_operation
+from main.models import AccessGroup, App, DefaultUser, Operation, Pod
 
 
 @pytest.fixture
@@ -72,6 +76,15 @@ def student_pod(db, student_with_app_access, test_app):
     return pod
 
 
+@pytest.fixture
+def inline_operations():
+    """Run background operations synchronously instead of on the executor."""
+    executor = MagicMock()
+    executor.submit.side_effect = lambda fn, *args: run_operation(*args)
+    with patch("api.operations._executor", return_value=executor):
+        yield executor
+
+
 class TestAppsView:
     """Tests for GET /apps/ endpoint."""
 
@@ -176,12 +189,10 @@ class TestStartPodView:
         # Student has access AND pod exists (created by generate_pods signal when user created)
         # Mock K8s to prevent actual deployment
         with (
-            patch("api.views.deploy_app") as mock_deploy,
-            patch("api.views.create_service"),
-            patch("api.views.create_ingress") as mock_ingress,
-            patch("api.views.create_cleanup_job") as mock_cleanup,
+            patch("shared.kubernetes.sessions.deploy_app") as mock_deploy,
+            patch("shared.kubernetes.sessions.create_service"),
+            patch("shared.kubernetes.sessions.create_ingress") as mock_ingress,
         ):
-            mock_cleanup.return_value = "cleanup-job-123"
             mock_ingress.return_value = "test.example.com"
             response = api_client.post(f"/start/{test_app.name}/")
 
@@ -189,6 +200,89 @@ class TestStartPodView:
             assert response.data["status"] == "starting"
             mock_deploy.assert_called_once()
 
+    def test_start_with_wait_returns_once_ready(
+        self, api_client, student_with_app_access, test_app, settings
+    ):
+        """Test wait=true holds the request until the session is reachable."""
+        settings.START_WAIT_MAX_SECONDS = 30
+        api_client.force_authenticate(user=student_with_app_access)
+        stages = {"deployment": "ready", "pod": "running", "service": "ready", "ingress": "ready"}
+        updates = [
+            {"status": "starting", "message": "Starting container...", "ready": False},
+            {
+                "status": "running",
+                "message": "Application is running",
+                "ready": True,
+                "stages": stages,
+            },
+        ]
+        with (
+            patch("shared.kubernetes.sessions.deploy_app"),
+            patch("shared.kubernetes.sessions.create_service"),
+            patch("shared.kubernetes.sessions.create_ingress", return_value="test.example.com"),
+            patch("api.views.iter_session_status", return_value=iter(updates)) as mock_iter,
+        ):
+            response = api_client.post(f"/start/{test_app.name}/?wait=true&timeout=600")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["ready"] is True
+        assert response.data["timed_out"] is False
+        assert response.data["novnc_url"] == "https://test.example.com"
+        assert response.data["stages"] == stages
+        assert mock_iter.call_args.kwargs["timeout"] == 30
+
+    def test_start_with_wait_reports_timeout(self, api_client, student_with_app_access, test_app):
+        """Test wait=true returns the last status when the session is not ready in time."""
+        api_client.force_authenticate(user=student_with_app_access)
+        with (
+            patch("shared.kubernetes.sessions.deploy_app"),
+            patch("shared.kubernetes.sessions.create_service"),
+            patch("shared.kubernetes.sessions.create_ingress", return_value="test.example.com"),
+            patch("api.views.iter_session_status", return_value=iter([None])),
+        ):
+            response = api_client.post(f"/start/{test_app.name}/", {"wait": True, "timeout": 1})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["ready"] is False
+        assert response.data["timed_out"] is True
+
+    @override_settings(START_WAIT_MAX_CONCURRENT=1)
+    def test_waiting_starts_over_the_limit_are_refused(
+        self, api_client, student_with_app_access, test_app
+    ):
+        """Test wait=true starts past START_WAIT_MAX_CONCURRENT get a 503 with a fallback."""
+        from shared.utils.threading import take_slot
+
+        api_client.force_authenticate(user=student_with_app_access)
+        release = take_slot("start-wait", 1)
+        try:
+            with patch("shared.kubernetes.sessions.deploy_app") as mock_deploy:
+                response = api_client.post(f"/start/{test_app.name}/?wait=true")
+        finally:
+            release()
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert f"/apps/{test_app.name}/events/" in response.data["error"]
+        assert "Retry-After" in response
+        mock_deploy.assert_not_called()
+
+    def test_start_beyond_capacity_is_queued(
+        self, api_client, student_with_app_access, test_app, settings
+    ):
+        """Test a start that does not fit the cluster is queued, not deployed."""
+        settings.ADMISSION_CONTROL_ENABLED = True
+        api_client.force_authenticate(user=student_with_app_access)
+        with (
+            patch("shared.kubernetes.admission.cluster_capacity", return_value=(0, 0)),
+            patch("shared.kubernetes.sessions.deploy_app") as mock_deploy,
+        ):
+            response = api_client.post(f"/start/{test_app.name}/")
+
+            assert response.status_code == status.HTTP_200_OK
+            assert response.data["status"] == "queued"
+            assert response.data["queue_position"] == 1
+            mock_deploy.assert_not_called()
+
 
 class TestStopPodView:
     """Tests for POST /stop/{app_name}/ endpoint."""
@@ -220,22 +314,107 @@ class TestStopPodView:
         pod.is_deployed = True
         pod.save()
 
-        # Mock K8s client and config to prevent actual operations
+        # Mock the K8s deletes to prevent actual operations
         with (
-            patch("api.views.load_k8s_config"),
-            patch("kubernetes.client") as mock_k8s_client,
-            patch("api.views.delete_ingress"),
+            patch("shared.kubernetes.sessions.delete_deployment") as mock_delete_deployment,
         ):
-            mock_apps_api = MagicMock()
-            mock_core_api = MagicMock()
-            mock_k8s_client.AppsV1Api.return_value = mock_apps_api
-            mock_k8s_client.CoreV1Api.return_value = mock_core_api
-
             response = api_client.post(f"/stop/{test_app.name}/")
 
             assert response.status_code == status.HTTP_200_OK
             assert response.data["status"] == "stopped"
-            mock_apps_api.delete_namespaced_deployment.assert_called_once()
+            mock_delete_deployment.assert_called_once()
+
+    def test_hibernate_keeps_session_resources(self, api_client, student_with_app_access, test_app):
+        """Test hibernate=true scales the session down instead of deleting it."""
+        api_client.force_authenticate(user=student_with_app_access)
+        pod = Pod.objects.get(pod_user=student_with_app_access, app_name=test_app.name)
+        pod.is_deployed = True
+        pod.save()
+
+        with (
+            patch("shared.kubernetes.sessions.scale_deployment", return_value=True) as mock_scale,
+            patch("shared.kubernetes.sessions.delete_deployment") as mock_delete,
+        ):
+            response = api_client.post(f"/stop/{test_app.name}/", {"hibernate": True})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["status"] == "hibernated"
+        mock_scale.assert_called_once_with(pod.pod_name, 0)
+        mock_delete.assert_not_called()
+        pod.refresh_from_db()
+        assert pod.is_deployed
+        assert pod.hibernated_at is not None
+
+
+class TestExtendSessionView:
+    """Tests for POST /apps/{app_name}/extend/ endpoint."""
+
+    @pytest.fixture
+    def running_pod(self, student_with_app_access, test_app):
+        """The student's session, started 10 minutes ago and expiring in 1."""
+        pod = Pod.objects.get(pod_user=student_with_app_access, app_name=test_app.name)
+        pod.is_deployed = True
+        pod.started_at = timezone.now() - timedelta(minutes=10)
+        pod.expires_at = timezone.now() + timedelta(minutes=1)
+        pod.save()
+        return pod
+
+    def test_unauthenticated_access_denied(self, api_client, test_app):
+        """Test unauthenticated access is denied."""
+        response = api_client.post(f"/apps/{test_app.name}/extend/")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_extends_expiry_without_touching_kubernetes(
+        self, api_client, student_with_app_access, test_app, running_pod
+    ):
+        """Test extending only moves expires_at forward in the database."""
+        api_client.force_authenticate(user=student_with_app_access)
+
+        with patch("shared.kubernetes.sessions.delete_deployment") as mock_delete:
+            response = api_client.post(f"/apps/{test_app.name}/extend/")
+
+        running_pod.refresh_from_db()
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["can_extend"] is True
+        remaining = running_pod.expires_at - timezone.now()
+        assert timedelta(minutes=test_app.session_duration_minutes - 1) < remaining
+        assert running_pod.last_active_at is not None
+        mock_delete.assert_not_called()
+
+    def test_expiry_is_capped_at_app_maximum(
+        self, api_client, student_with_app_access, test_app, running_pod
+    ):
+        """Test the expiry never passes max_session_minutes after the start."""
+        test_app.session_duration_minutes = 30
+        test_app.max_session_minutes = 20
+        test_app.save()
+        api_client.force_authenticate(user=student_with_app_access)
+
+        response = api_client.post(f"/apps/{test_app.name}/extend/")
+
+        running_pod.refresh_from_db()
+        assert response.data["can_extend"] is False
+        assert running_pod.expires_at == running_pod.started_at + timedelta(minutes=20)
+
+    def test_stopped_session_cannot_be_extended(
+        self, api_client, student_with_app_access, test_app
+    ):
+        """Test a session that is not running is rejected."""
+        api_client.force_authenticate(user=student_with_app_access)
+
+        response = api_client.post(f"/apps/{test_app.name}/extend/")
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+    def test_disabled_for_app(self, api_client, student_with_app_access, test_app, running_pod):
+        """Test max_session_minutes=0 disables extending."""
+        test_app.max_session_minutes = 0
+        test_app.save()
+        api_client.force_authenticate(user=student_with_app_access)
+
+        response = api_client.post(f"/apps/{test_app.name}/extend/")
+
+        assert response.status_code == status.HTTP_409_CONFLICT
 
 
 class TestDashboardView:
@@ -275,3 +454,181 @@ class TestDashboardView:
             assert response.status_code == status.HTTP_200_OK
             assert response.data["template_type"] == "admin"
             assert response.data["role"] == DefaultUser.ADMIN
+
+
+class TestAppEventsView:
+    """Tests for GET /apps/{app_name}/events/ endpoint."""
+
+    def test_unauthenticated_access_denied(self, api_client, test_app):
+        """Test unauthenticated access is denied."""
+        response = api_client.get(f"/apps/{test_app.name}/events/")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_stopped_session_closes_immediately(
+        self, api_client, student_with_app_access, test_app
+    ):
+        """Test a session that is not deployed gets one stopped event and the stream ends."""
+        api_client.force_authenticate(user=student_with_app_access)
+
+        response = api_client.get(f"/apps/{test_app.name}/events/")
+        body = b"".join(response.streaming_content).decode()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/event-stream"
+        assert '"status": "stopped"' in body
+        assert body.endswith("event: end\ndata: {}\n\n")
+
+    def test_streams_transitions_until_ready(self, api_client, student_with_app_access, test_app):
+        """Test stage transitions are pushed and the stream ends once ready."""
+        api_client.force_authenticate(user=student_with_app_access)
+        pod = Pod.objects.get(pod_user=student_with_app_access, app_name=test_app.name)
+        pod.is_deployed = True
+        pod.save()
+
+        updates = [
+            {"status": "starting", "message": "Starting container...", "ready": False},
+            None,
+            {"status": "running", "message": "Application is running", "ready": True},
+        ]
+        with patch("api.views.iter_session_status", return_value=iter(updates)):
+            response = api_client.get(f"/apps/{test_app.name}/events/")
+            body = b"".join(response.streaming_content).decode()
+
+        assert body.count("event: status") == 2
+        assert ": keepalive" in body
+        assert body.endswith("event: end\ndata: {}\n\n")
+
+    @override_settings(SSE_MAX_STREAMS=1)
+    def test_streams_over_the_limit_are_refused(
+        self, api_client, student_with_app_access, test_app
+    ):
+        """Test streams past SSE_MAX_STREAMS get a 503 until an open one is closed."""
+        api_client.force_authenticate(user=student_with_app_access)
+
+        first = api_client.get(f"/apps/{test_app.name}/events/")
+        refused = api_client.get(f"/apps/{test_app.name}/events/")
+        first.close()
+        after_close = api_client.get(f"/apps/{test_app.name}/events/")
+        after_close.close()
+
+        assert first.status_code == status.HTTP_200_OK
+        assert refused.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert refused["Retry-After"]
+        assert after_close.status_code == status.HTTP_200_OK
+
+
+class TestOperations:
+    """Tests for asynchronous start/stop and GET /operations/{id}/."""
+
+    def test_async_start_returns_202_and_completes(
+        self,
+        api_client,
+        student_with_app_access,
+        test_app,
+        inline_operations,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test an async start is accepted at once and its result is pollable."""
+        api_client.force_authenticate(user=student_with_app_access)
+        with (
+            patch("shared.kubernetes.sessions.deploy_app"),
+            patch("shared.kubernetes.sessions.create_service"),
+            patch("shared.kubernetes.sessions.create_ingress", return_value="test.example.com"),
+            django_capture_on_commit_callbacks(execute=True),
+        ):
+            response = api_client.post(f"/start/{test_app.name}/", {"async": True})
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data["status"] == Operation.PENDING
+
+        response = api_client.get(response.data["status_url"])
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["status"] == Operation.SUCCEEDED
+        assert response.data["finished"] is True
+        assert response.data["progress"] == 100
+        assert response.data["result"]["novnc_url"] == "https://test.example.com"
+
+    def test_async_stop_failure_is_recorded(
+        self,
+        api_client,
+        student_with_app_access,
+        test_app,
+        inline_operations,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test an async stop that raises ends in the failed state with its error."""
+        api_client.force_authenticate(user=student_with_app_access)
+        with (
+            patch("api.views.stop_session", side_effect=RuntimeError("boom")),
+            django_capture_on_commit_callbacks(execute=True),
+        ):
+            response = api_client.post(f"/stop/{test_app.name}/?async=true")
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        operation = Operation.objects.get(pk=response.data["operation_id"])
+        assert operation.kind == Operation.STOP
+        assert operation.status == Operation.FAILED
+        assert operation.error == "boom"
+
+    def test_students_cannot_see_others_operations(
+        self, authenticated_student_client, teacher_user
+    ):
+        """Test an operation is hidden from students who did not request it."""
+        operation = Operation.objects.create(kind=Operation.START, requested_by=teacher_user)
+
+        response = authenticated_student_client.get(f"/operations/{operation.id}/")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestPrestartGroupView:
+    """Tests for POST /apps/{app_name}/prestart/ endpoint."""
+
+    def test_student_denied(self, authenticated_student_client, test_app):
+        """Test students cannot pre-start a group."""
+        response = authenticated_student_client.post(
+            f"/apps/{test_app.name}/prestart/", {"group": "AppAccessGroup"}
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_group_required(self, authenticated_teacher_client, test_app):
+        """Test a group must be given."""
+        response = authenticated_teacher_client.post(f"/apps/{test_app.name}/prestart/")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_returns_operation_with_per_student_results(
+        self,
+        authenticated_teacher_client,
+        student_with_app_access,
+        test_app,
+        inline_operations,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test the pre-start runs as an operation reporting each student."""
+        summary = {
+            "group": "AppAccessGroup",
+            "app": test_app.name,
+            "started": 1,
+            "queued": 0,
+            "running": 0,
+            "failed": 0,
+            "students": {"student_with_app": {"pod_name": "p", "status": "started"}},
+        }
+        with (
+            patch("api.views.prestart_group", return_value=summary) as mock_prestart,
+            django_capture_on_commit_callbacks(execute=True),
+        ):
+            response = authenticated_teacher_client.post(
+                f"/apps/{test_app.name}/prestart/", {"group": "AppAccessGroup"}
+            )
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        app, group = mock_prestart.call_args.args
+        assert (app, group.name) == (test_app, "AppAccessGroup")
+
+        response = authenticated_teacher_client.get(response.data["status_url"])
+
+        assert response.data["kind"] == Operation.PRESTART
+        assert response.data["status"] == Operation.SUCCEEDED
+        assert response.data["result"]["students"]["student_with_app"]["status"] == "started"
@@ -0,0 +1,35 @@
+"""Tests for the Prometheus metrics endpoint."""
+
+import pytest
+from rest_framework import status
+
+
+@pytest.mark.django_db
+class TestMetricsView:
+    """Tests for GET /metrics/."""
+
+    def test_disabled_without_token(self, api_client, settings):
+        settings.METRICS_TOKEN = ""
+
+        response = api_client.get("/metrics/")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_requires_bearer_token(self, api_client, settings):
+        settings.METRICS_TOKEN = "scrape-token"
+
+        response = api_client.get("/metrics/", HTTP_AUTHORIZATION="Bearer wrong")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_exposes_prometheus_text(self, api_client, settings):
+        settings.METRICS_TOKEN = "scrape-token"
+
+        response = api_client.get("/metrics/", HTTP_AUTHORIZATION="Bearer scrape-token")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"].startswith("text/plain")
+        body = response.content.decode()
+        assert "# TYPE easytp_k8s_api_request_duration_seconds histogram" in body
+        assert 'easytp_k8s_api_rate_limit_acquired_total{priority="interactive"}' in body
+        assert "# TYPE easytp_turnstile_verifications_total counter" in body
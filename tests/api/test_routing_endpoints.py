@@ -0,0 +1,50 @@
+"""Tests for the shared session routing endpoint."""
+
+import pytest
+from rest_framework import status
+
+from shared.kubernetes.routing import add_route
+
+
+@pytest.fixture
+def shared_routing(settings):
+    settings.SESSION_ROUTING = "shared"
+    settings.ROUTING_TOKEN = "routing-token"
+
+
+@pytest.mark.django_db
+class TestTraefikRoutingView:
+    """Tests for GET /routing/traefik/."""
+
+    def test_disabled_in_ingress_mode(self, api_client, settings):
+        settings.SESSION_ROUTING = "ingress"
+        settings.ROUTING_TOKEN = "routing-token"
+
+        response = api_client.get("/routing/traefik/", HTTP_AUTHORIZATION="Bearer routing-token")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_requires_bearer_token(self, api_client, shared_routing):
+        response = api_client.get("/routing/traefik/", HTTP_AUTHORIZATION="Bearer wrong")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_serves_deployed_session_routes(self, api_client, shared_routing, student_user):
+        from main.models import Pod
+
+        running = Pod.objects.create(
+            pod_user=student_user, pod_name="running", app_name="A", is_deployed=True
+        )
+        stopped = Pod.objects.create(pod_user=student_user, pod_name="stopped", app_name="B")
+        add_route(running, "alice-a.example.com", "a-service-running")
+        add_route(stopped, "alice-b.example.com", "b-service-stopped")
+
+        response = api_client.get("/routing/traefik/", HTTP_AUTHORIZATION="Bearer routing-token")
+
+        assert response.status_code == status.HTTP_200_OK
+        http = response.json()["http"]
+        assert list(http["routers"]) == ["session-running"]
+        assert http["routers"]["session-running"]["rule"] == "Host(`alice-a.example.com`)"
+        assert http["services"]["session-running"]["loadBalancer"]["servers"] == [
+            {"url": "http://a-service-running.apps.svc:8080"}
+        ]
@@ -0,0 +1,47 @@
+"""Tests for the bulk session teardown endpoint."""
+
+from unittest.mock import patch
+
+import pytest
+from rest_framework import status
+
+from main.models import Pod
+
+
+@pytest.mark.django_db
+class TestTeardownSessionsView:
+    """Tests for POST /sessions/teardown/."""
+
+    def test_student_denied(self, api_client, student_user):
+        api_client.force_authenticate(user=student_user)
+
+        response = api_client.post("/sessions/teardown/", {"guests": True})
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_filter_required(self, api_client, teacher_user):
+        api_client.force_authenticate(user=teacher_user)
+
+        response = api_client.post("/sessions/teardown/", {})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_unknown_group(self, api_client, teacher_user):
+        api_client.force_authenticate(user=teacher_user)
+
+        response = api_client.post("/sessions/teardown/", {"group": "Nope"})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_teacher_tears_down_a_group(self, api_client, teacher_user, student_user):
+        Pod.objects.create(
+            pod_user=student_user, pod_name="student-a", app_name="A", is_deployed=True
+        )
+        api_client.force_authenticate(user=teacher_user)
+
+        with patch("shared.kubernetes.sessions.delete_session_resources") as mock_delete:
+            response = api_client.post("/sessions/teardown/", {"group": student_user.group.name})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["stopped"] == 1
+        mock_delete.assert_called_once_with(["student-a"], batch_size=100, unowned=[])
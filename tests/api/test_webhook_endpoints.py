@@ -4,6 +4,7 @@ import os
 from unittest.mock import patch
 
 import pytest
+from kubernetes.config import ConfigException
 from rest_framework import status
 
 
@@ -117,3 +118,38 @@ class TestUpdateAppImageView:
             # Verify the format is app_name:tag
             logisim_app.refresh_from_db()
             assert logisim_app.image == "logisim:sha256abcdef"
+
+    def test_update_starts_image_prepull(self, api_client, logisim_app):
+        """Test that an image update rolls out a pre-pull and reports its status."""
+        with (
+            patch.dict(os.environ, {"WEBHOOK_SECRET": "test-secret"}),
+            patch("api.views.start_prepull") as mock_prepull,
+        ):
+            data = {"app_name": "logisim", "image_tag": "v2"}
+            response = api_client.post(
+                "/webhook/update-image/",
+                data,
+                format="json",
+                HTTP_X_WEBHOOK_SECRET="test-secret",
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert "prepull_status" in response.data
+            mock_prepull.assert_called_once()
+            assert mock_prepull.call_args.args[0].image == "logisim:v2"
+
+    def test_failed_prepull_still_saves_the_tag(self, api_client, logisim_app):
+        """Any pre-pull error is logged; the new tag is saved regardless."""
+        with (
+            patch.dict(os.environ, {"WEBHOOK_SECRET": "test-secret"}),
+            patch("api.views.start_prepull", side_effect=ConfigException("no config")),
+        ):
+            response = api_client.post(
+                "/webhook/update-image/",
+                {"app_name": "logisim", "image_tag": "v3"},
+                format="json",
+                HTTP_X_WEBHOOK_SECRET="test-secret",
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+        logisim_app.refresh_from_db()
+        assert logisim_app.image == "logisim:v3"
@@ -8,6 +8,9 @@ from django.test import Client
 from factory.django import DjangoModelFactory
 from rest_framework.test import APIClient
 
+from main.utils.turnstile import reset_verifier
+from shared.kubernetes.config import reset_k8s_clients
+
 
 @pytest.fixture(autouse=True)
 def block_k8s_calls():
@@ -29,7 +32,19 @@ def block_k8s_calls():
         mock_apps.return_value.delete_namespaced_deployment.side_effect = RuntimeError(
             "K8s not mocked"
         )
+        # The shared client registry caches API objects per process; rebuild
+        # them from this test's mocks.
+        reset_k8s_clients()
         yield
+        reset_k8s_clients()
+
+
+@pytest.fixture(autouse=True)
+def fresh_turnstile_verifier():
+    """Give every test a closed Turnstile circuit breaker and empty metrics."""
+    reset_verifier()
+    yield
+    reset_verifier()
 
 
 @pytest.fixture
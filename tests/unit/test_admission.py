@@ -0,0 +1,124 @@
+"""Unit tests for shared.kubernetes.admission."""
+
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from django.utils import timezone
+
+from shared.kubernetes.admission import (
+    dispatch,
+    expire_admissions,
+    fair_order,
+    free_capacity,
+    queue_positions,
+    request_start,
+)
+
+
+@pytest.fixture
+def admission_enabled(settings):
+    settings.ADMISSION_CONTROL_ENABLED = True
+
+
+@pytest.fixture
+def webrtc_app(db):
+    from main.models import App
+
+    return App.objects.create(name="Game", image="game:1", app_type=App.WEBRTC)
+
+
+def make_pod(group_name, username):
+    from main.models import AccessGroup, DefaultUser, Pod
+
+    group, _ = AccessGroup.objects.get_or_create(name=group_name)
+    user = DefaultUser.objects.create_user(
+        username=username, email=f"{username}@test.com", password="x", group=group
+    )
+    return Pod.objects.create(pod_user=user, pod_name=f"pod-{username}", app_name="Game")
+
+
+class TestFairOrder:
+    """Tests for FIFO-per-group, round-robin-across-groups ordering."""
+
+    def test_groups_take_turns(self):
+        """A later group is not stuck behind every ticket of an earlier one."""
+        now = timezone.now()
+
+        def ticket(pk, group, minutes):
+            return SimpleNamespace(
+                pk=pk, group_id=group, created_at=now + timedelta(minutes=minutes)
+            )
+
+        tickets = [ticket(1, "a", 0), ticket(2, "a", 1), ticket(3, "a", 2), ticket(4, "b", 3)]
+
+        assert [t.pk for t in fair_order(tickets)] == [1, 4, 2, 3]
+
+
+@pytest.mark.django_db
+class TestAdmission:
+    """Tests for admitting and queueing session starts."""
+
+    def test_disabled_always_admits(self, webrtc_app):
+        """Without admission control every start goes ahead."""
+        pod = make_pod("ClassA", "a1")
+
+        assert request_start(pod, webrtc_app) is None
+
+    def test_start_that_fits_is_admitted(self, admission_enabled, webrtc_app):
+        """A start is admitted when its requests fit the free capacity."""
+        from main.models import AdmissionTicket
+
+        pod = make_pod("ClassA", "a1")
+        with patch("shared.kubernetes.admission.cluster_capacity", return_value=(2000, 4096)):
+            assert request_start(pod, webrtc_app) is None
+
+        ticket = AdmissionTicket.objects.get(pod=pod)
+        assert ticket.state == AdmissionTicket.ADMITTED
+        assert (ticket.cpu_millicores, ticket.memory_mib) == (1500, 1024)
+
+    def test_start_that_does_not_fit_is_queued(self, admission_enabled, webrtc_app):
+        """A start beyond capacity waits and reports its queue position."""
+        pod = make_pod("ClassA", "a1")
+        with patch("shared.kubernetes.admission.cluster_capacity", return_value=(1000, 4096)):
+            ticket = request_start(pod, webrtc_app)
+
+        assert ticket is not None
+        assert queue_positions([pod]) == {pod.pk: 1}
+
+    def test_dispatch_admits_fairly_while_capacity_lasts(self, admission_enabled, webrtc_app):
+        """Queued starts are admitted round-robin across groups until full."""
+        from main.models import AdmissionTicket
+
+        pods = [
+            make_pod("ClassA", "a1"),
+            make_pod("ClassA", "a2"),
+            make_pod("ClassB", "b1"),
+        ]
+        with patch("shared.kubernetes.admission.cluster_capacity", return_value=(0, 0)):
+            for pod in pods:
+                request_start(pod, webrtc_app)
+
+        with patch("shared.kubernetes.admission.cluster_capacity", return_value=(3000, 4096)):
+            admitted = dispatch()
+
+        assert [t.pod.pod_name for t in admitted] == ["pod-a1", "pod-b1"]
+        waiting = AdmissionTicket.objects.get(state=AdmissionTicket.WAITING)
+        assert waiting.pod == pods[1]
+
+    def test_stale_admitted_tickets_free_their_capacity(self, admission_enabled, webrtc_app):
+        """An admitted start that never released its ticket stops counting after the TTL."""
+        from main.models import AdmissionTicket
+
+        fresh, stale = make_pod("ClassA", "a1"), make_pod("ClassA", "a2")
+        with patch("shared.kubernetes.admission.cluster_capacity", return_value=(4000, 4096)):
+            request_start(fresh, webrtc_app)
+            request_start(stale, webrtc_app)
+        AdmissionTicket.objects.filter(pod=stale).update(
+            admitted_at=timezone.now() - timedelta(hours=1)
+        )
+
+        assert free_capacity((4000, 4096)) == (2500, 3072)
+        assert expire_admissions() == 1
+        assert list(AdmissionTicket.objects.values_list("pod", flat=True)) == [fresh.pk]
@@ -0,0 +1,97 @@
+"""Unit tests for the cached Cloudflare TURN credentials."""
+
+import threading
+from unittest.mock import patch
+
+import pytest
+import responses
+
+from main.utils import cloudflare_turn
+
+TURN_URL = "https://rtc.live.cloudflare.com/v1/turn/keys/key-id/credentials/generate-ice-servers"
+
+ICE_SERVERS = {
+    "iceServers": [
+        {"urls": ["stun:stun.cloudflare.com:3478"]},
+        {"urls": ["turn:turn.cloudflare.com:3478"], "username": "user", "credential": "secret"},
+    ]
+}
+
+
+@pytest.fixture(autouse=True)
+def turn_configured(settings):
+    settings.CLOUDFLARE_TURN_KEY_ID = "key-id"
+    settings.CLOUDFLARE_TURN_API_TOKEN = "token"
+    settings.TURN_CREDENTIAL_TTL_SECONDS = 1000
+    settings.TURN_CREDENTIAL_REFRESH_AHEAD_SECONDS = 300
+    settings.TURN_CREDENTIAL_MIN_VALIDITY_SECONDS = 100
+    cloudflare_turn.clear_turn_credentials()
+    yield
+    cloudflare_turn.clear_turn_credentials()
+
+
+class TestTurnCredentialCache:
+    """Tests for generate_turn_credentials."""
+
+    @responses.activate
+    def test_credentials_are_minted_once(self):
+        responses.add(responses.POST, TURN_URL, json=ICE_SERVERS)
+
+        first = cloudflare_turn.generate_turn_credentials()
+        second = cloudflare_turn.generate_turn_credentials()
+
+        assert first == second == ("user", "secret")
+        assert len(responses.calls) == 1
+
+    def test_not_configured_returns_none(self, settings):
+        settings.CLOUDFLARE_TURN_KEY_ID = ""
+
+        assert cloudflare_turn.generate_turn_credentials() is None
+
+    @responses.activate
+    def test_failure_is_not_retried_immediately(self):
+        responses.add(responses.POST, TURN_URL, status=503)
+
+        assert cloudflare_turn.generate_turn_credentials() is None
+        assert cloudflare_turn.generate_turn_credentials() is None
+        assert len(responses.calls) == 1
+
+    def test_concurrent_callers_share_one_request(self):
+        release = threading.Event()
+        calls = []
+
+        def slow_mint(ttl):
+            calls.append(ttl)
+            release.wait(2)
+            return "user", "secret"
+
+        results = []
+        with patch.object(cloudflare_turn, "mint_turn_credentials", side_effect=slow_mint):
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(cloudflare_turn.generate_turn_credentials())
+                )
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            release.set()
+            for thread in threads:
+                thread.join(2)
+
+        assert calls == [1000]
+        assert results == [("user", "secret")] * 5
+
+    def test_refreshes_ahead_of_expiry_in_background(self):
+        with patch.object(cloudflare_turn, "mint_turn_credentials", return_value=("old", "1")):
+            cloudflare_turn.generate_turn_credentials()
+
+        # 750s later: inside the refresh-ahead window but still usable
+        later = cloudflare_turn.time.monotonic() + 750
+        with (
+            patch.object(cloudflare_turn.time, "monotonic", return_value=later),
+            patch.object(cloudflare_turn, "get_executor") as mock_executor,
+        ):
+            assert cloudflare_turn.generate_turn_credentials() == ("old", "1")
+
+        mock_executor.return_value.submit.assert_called_once()
@@ -0,0 +1,65 @@
+"""Unit tests for shared.kubernetes.deployments."""
+
+from unittest.mock import patch
+
+import pytest
+from kubernetes.client.rest import ApiException
+
+from shared.kubernetes.deployments import create_ingress, create_service
+
+OWNER = {
+    "apiVersion": "apps/v1",
+    "kind": "Deployment",
+    "name": "app-deployment-pod-hash",
+    "uid": "new-uid",
+}
+
+
+class TestAdoptExisting:
+    """Tests for taking over a Service or Ingress left by a previous session."""
+
+    def test_existing_service_gets_new_owner_and_selector(self):
+        with patch("shared.kubernetes.deployments.core_v1") as mock_core:
+            api = mock_core.return_value
+            api.create_namespaced_service.side_effect = ApiException(status=409)
+
+            create_service("pod-hash", "app", owner=OWNER)
+
+        api.patch_namespaced_service.assert_called_once_with(
+            name="app-service-pod-hash",
+            namespace="apps",
+            body=[
+                {"op": "add", "path": "/spec/selector", "value": {"appDep": "pod-hash"}},
+                {"op": "add", "path": "/metadata/ownerReferences", "value": [OWNER]},
+            ],
+        )
+
+    def test_existing_ingress_gets_new_owner(self):
+        with patch("shared.kubernetes.deployments.networking_v1") as mock_networking:
+            api = mock_networking.return_value
+            api.create_namespaced_ingress.side_effect = ApiException(status=409)
+
+            host = create_ingress("pod-hash", "app", "student", owner=OWNER)
+
+        assert host == "student-app.melekabderrahmane.com"
+        patch_body = api.patch_namespaced_ingress.call_args.kwargs["body"]
+        assert patch_body == [{"op": "add", "path": "/metadata/ownerReferences", "value": [OWNER]}]
+
+    def test_collected_service_is_created_again(self):
+        with patch("shared.kubernetes.deployments.core_v1") as mock_core:
+            api = mock_core.return_value
+            api.create_namespaced_service.side_effect = [ApiException(status=409), None]
+            api.patch_namespaced_service.side_effect = ApiException(status=404)
+
+            create_service("pod-hash", "app", owner=OWNER)
+
+        assert api.create_namespaced_service.call_count == 2
+
+    def test_other_errors_are_raised(self):
+        with patch("shared.kubernetes.deployments.core_v1") as mock_core:
+            api = mock_core.return_value
+            api.create_namespaced_service.side_effect = ApiException(status=409)
+            api.patch_namespaced_service.side_effect = ApiException(status=403)
+
+            with pytest.raises(ApiException):
+                create_service("pod-hash", "app", owner=OWNER)
@@ -0,0 +1,171 @@
+"""Unit tests for activity-based idle session detection."""
+
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.test import override_settings
+from django.utils import timezone
+from kubernetes.client.api import CoreV1Api
+
+from shared.kubernetes.config import get_api_client
+from shared.kubernetes.idle import count_established, detect_idle_sessions
+
+PROC_NET_TCP = """\
+  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode
+   0: 00000000:1F90 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 1 1
+   1: 0100000A:1F90 0200000A:C350 01 00000000:00000000 00:00000000 00000000  1000        0 2 1
+   2: 0100000A:1770 0100000A:D000 01 00000000:00000000 00:00000000 00000000  1000        0 3 1
+   3: 0100000A:1F90 0300000A:C351 06 00000000:00000000 00:00000000 00000000  1000        0 4 1
+"""
+
+
+@pytest.fixture
+def session_pod(db, student_user):
+    from main.models import App, Pod
+
+    App.objects.create(name="Logisim", image="logisim:1")
+    return Pod.objects.create(
+        pod_user=student_user,
+        pod_name="logisim-abc",
+        app_name="Logisim",
+        is_deployed=True,
+        expires_at=timezone.now() + timedelta(hours=1),
+        last_active_at=timezone.now() - timedelta(hours=1),
+    )
+
+
+def k8s_pod(pod_name, phase="Running"):
+    pod = MagicMock()
+    pod.metadata.name = f"{pod_name}-7d9f"
+    pod.metadata.labels = {"appDep": pod_name}
+    pod.status.phase = phase
+    return pod
+
+
+def detect(pods, connections):
+    with (
+        patch("shared.kubernetes.idle.core_v1") as mock_api,
+        patch("shared.kubernetes.idle.client_connections", side_effect=connections),
+    ):
+        mock_api.return_value.list_namespaced_pod.return_value.items = pods
+        return detect_idle_sessions()
+
+
+class TestCountEstablished:
+    """Tests for parsing /proc/net/tcp."""
+
+    def test_counts_only_established_connections_to_session_port(self):
+        assert count_established(PROC_NET_TCP) == 1
+
+    def test_empty_output(self):
+        assert count_established("") == 0
+
+
+class TestDetectIdleSessions:
+    """Tests for detect_idle_sessions."""
+
+    def test_connected_session_is_marked_active(self, session_pod):
+        result = detect([k8s_pod(session_pod.pod_name)], [1])
+
+        session_pod.refresh_from_db()
+        assert result == {"active": 1, "stopped": 0}
+        assert session_pod.last_active_at > timezone.now() - timedelta(minutes=1)
+        assert session_pod.expires_at > timezone.now()
+
+    def test_idle_session_is_expired_now(self, session_pod):
+        result = detect([k8s_pod(session_pod.pod_name)], [0])
+
+        session_pod.refresh_from_db()
+        assert result == {"active": 0, "stopped": 1}
+        assert session_pod.expires_at <= timezone.now()
+
+    def test_recently_active_session_is_kept(self, session_pod):
+        session_pod.last_active_at = timezone.now() - timedelta(minutes=5)
+        session_pod.save()
+
+        result = detect([k8s_pod(session_pod.pod_name)], [0])
+
+        assert result["stopped"] == 0
+
+    @override_settings(SESSION_IDLE_TIMEOUT_MINUTES=15, PRESTART_IDLE_GRACE_MINUTES=30)
+    def test_prestarted_session_gets_a_grace_period(self, session_pod):
+        session_pod.prestarted = True
+        session_pod.last_active_at = timezone.now() - timedelta(minutes=30)
+        session_pod.save()
+
+        result = detect([k8s_pod(session_pod.pod_name)], [0])
+
+        session_pod.refresh_from_db()
+        assert result == {"active": 0, "stopped": 0}
+        assert session_pod.expires_at > timezone.now()
+
+    @override_settings(SESSION_IDLE_TIMEOUT_MINUTES=15, PRESTART_IDLE_GRACE_MINUTES=30)
+    def test_prestarted_session_is_stopped_after_the_grace_period(self, session_pod):
+        session_pod.prestarted = True
+        session_pod.last_active_at = timezone.now() - timedelta(hours=2)
+        session_pod.save()
+
+        result = detect([k8s_pod(session_pod.pod_name)], [0])
+
+        assert result["stopped"] == 1
+
+    def test_first_client_ends_the_grace_period(self, session_pod):
+        session_pod.prestarted = True
+        session_pod.save()
+
+        detect([k8s_pod(session_pod.pod_name)], [1])
+
+        session_pod.refresh_from_db()
+        assert not session_pod.prestarted
+
+    def test_failed_probe_keeps_session(self, session_pod):
+        result = detect([k8s_pod(session_pod.pod_name)], RuntimeError("exec failed"))
+
+        session_pod.refresh_from_db()
+        assert result == {"active": 1, "stopped": 0}
+        assert session_pod.expires_at > timezone.now()
+
+    @override_settings(SESSION_IDLE_TIMEOUT_MINUTES=0)
+    def test_disabled(self, session_pod):
+        with patch("shared.kubernetes.idle.core_v1") as mock_api:
+            assert detect_idle_sessions() == {"active": 0, "stopped": 0}
+        mock_api.assert_not_called()
+
+    @override_settings(K8S_SESSION_WORKERS=5)
+    def test_concurrent_probes_leave_the_shared_client_alone(self, db, student_user):
+        from main.models import App, Pod
+
+        App.objects.create(name="Logisim", image="logisim:1")
+        pods = [
+            Pod.objects.create(pod_user=student_user, pod_name=f"logisim-{i}", is_deployed=True)
+            for i in range(5)
+        ]
+        shared = get_api_client()
+        original = shared.call_api
+        barrier = threading.Barrier(len(pods), timeout=5)
+
+        def fake_stream(api_method, *args, **kwargs):
+            # Swaps call_api around the exec like kubernetes.stream.stream
+            api_client = api_method.__self__.api_client
+            previous = api_client.call_api
+            api_client.call_api = lambda *a, **kw: None
+            try:
+                barrier.wait()
+                time.sleep(0.01)
+                return PROC_NET_TCP
+            finally:
+                api_client.call_api = previous
+
+        listing = MagicMock(items=[k8s_pod(pod.pod_name) for pod in pods])
+        with (
+            patch("shared.kubernetes.config.client.CoreV1Api", CoreV1Api),
+            patch.object(CoreV1Api, "list_namespaced_pod", return_value=listing),
+            patch("shared.kubernetes.idle.stream", side_effect=fake_stream),
+        ):
+            result = detect_idle_sessions()
+
+        assert result["active"] == len(pods)
+        assert get_api_client().call_api == original
@@ -0,0 +1,206 @@
+"""Unit tests for shared.kubernetes.informer and the cache-backed status path."""
+
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from shared.kubernetes.informer import ResourceInformer
+from shared.kubernetes.pods import get_deployment_stages, stages_from_objects
+
+
+def make_obj(name, labels=None, status=None, spec=None, endpoints=None):
+    """Build a minimal stand-in for a Kubernetes API object."""
+    return SimpleNamespace(
+        metadata=SimpleNamespace(name=name, labels=labels or {}, resource_version="1"),
+        status=status,
+        spec=spec,
+        endpoints=endpoints,
+    )
+
+
+class TestResourceInformer:
+    """Tests for the label-indexed informer store."""
+
+    def test_apply_indexes_by_label(self):
+        """Added objects are returned by their index label value."""
+        informer = ResourceInformer("pods", MagicMock(), "appDep")
+        informer._apply("ADDED", make_obj("p1", {"appDep": "abc"}))
+        informer._apply("ADDED", make_obj("p2", {"appDep": "def"}))
+
+        assert [o.metadata.name for o in informer.get("abc")] == ["p1"]
+        assert informer.get("missing") == []
+
+    def test_modified_relabel_moves_index(self):
+        """A label change moves the object to its new index bucket."""
+        informer = ResourceInformer("deployments", MagicMock(), "deploymentApp")
+        informer._apply("ADDED", make_obj("d1", {"deploymentApp": "old"}))
+        changed = informer._apply("MODIFIED", make_obj("d1", {"deploymentApp": "new"}))
+
+        assert changed == {"old", "new"}
+        assert informer.get("old") == []
+        assert len(informer.get("new")) == 1
+
+    def test_deleted_removes_object(self):
+        """Deleted objects disappear from the store and the index."""
+        informer = ResourceInformer("services", MagicMock(), "serviceApp")
+        obj = make_obj("s1", {"serviceApp": "abc"})
+        informer._apply("ADDED", obj)
+        informer._apply("DELETED", obj)
+
+        assert informer.get("abc") == []
+        assert informer.items() == []
+
+    def test_list_replaces_store_and_marks_synced(self):
+        """The initial list fills the store and marks the informer synced."""
+        list_func = MagicMock()
+        list_func.return_value = SimpleNamespace(
+            items=[make_obj("i1", {"ingressApp": "abc"})],
+            metadata=SimpleNamespace(resource_version="42"),
+        )
+        informer = ResourceInformer("ingresses", list_func, "ingressApp")
+        informer._apply("ADDED", make_obj("stale", {"ingressApp": "gone"}))
+
+        assert not informer.is_synced()
+        informer._list()
+
+        assert informer.is_synced()
+        assert informer.get("gone") == []
+        assert len(informer.get("abc")) == 1
+        assert informer._resource_version == "42"
+
+
+class WatchResponse:
+    """Stand-in for the streamed HTTP response of a watch request."""
+
+    status = 200
+
+    def __init__(self, events):
+        self.lines = [json.dumps(event).encode() + b"\n" for event in events]
+
+    def stream(self, amt=None, decode_content=False):
+        yield from self.lines
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class TestWatch:
+    """Tests for ResourceInformer._watch against the kubernetes Watch."""
+
+    def test_bookmark_advances_resource_version(self):
+        """Bookmarks arrive as raw dicts and only move the resourceVersion."""
+        events = [
+            {
+                "type": "ADDED",
+                "object": {
+                    "kind": "Pod",
+                    "metadata": {"name": "p1", "labels": {"appDep": "abc"}, "resourceVersion": "5"},
+                },
+            },
+            {
+                "type": "BOOKMARK",
+                "object": {"kind": "Pod", "metadata": {"resourceVersion": "9"}},
+            },
+        ]
+
+        def list_namespaced_pod(namespace, **kwargs):
+            """:rtype: V1PodList"""
+            return WatchResponse(events)
+
+        informer = ResourceInformer("pods", list_namespaced_pod, "appDep")
+        informer._watch()
+
+        assert informer._resource_version == "9"
+        assert [o.metadata.name for o in informer.get("abc")] == ["p1"]
+
+
+class TestStagesFromObjects:
+    """Tests for computing stages from cached objects."""
+
+    def test_all_ready(self):
+        """A fully started session reports every stage as ready."""
+        objects = {
+            "deployments": [
+                make_obj("d", status=SimpleNamespace(ready_replicas=1, replicas=1, conditions=None))
+            ],
+            "pods": [
+                make_obj(
+                    "p",
+                    status=SimpleNamespace(
+                        phase="Running", container_statuses=[SimpleNamespace(ready=True)]
+                    ),
+                )
+            ],
+            "services": [make_obj("svc")],
+            "slices": {
+                "svc": [
+                    make_obj(
+                        "slice",
+                        endpoints=[SimpleNamespace(conditions=SimpleNamespace(ready=True))],
+                    )
+                ]
+            },
+            "ingresses": [
+                make_obj(
+                    "ing",
+                    status=SimpleNamespace(
+                        load_balancer=SimpleNamespace(ingress=[SimpleNamespace(ip="1.2.3.4")])
+                    ),
+                )
+            ],
+        }
+
+        assert stages_from_objects(objects) == {
+            "deployment": "ready",
+            "pod": "running",
+            "service": "ready",
+            "ingress": "ready",
+        }
+
+    def test_nothing_created(self):
+        """A session with no objects is pending everywhere."""
+        objects = {"deployments": [], "pods": [], "services": [], "slices": {}, "ingresses": []}
+
+        assert set(stages_from_objects(objects).values()) == {"pending"}
+
+    def test_get_deployment_stages_uses_synced_cache(self):
+        """When the cache is synced no list calls are made."""
+        cache = MagicMock()
+        cache.session_objects.return_value = {
+            "deployments": [],
+            "pods": [],
+            "services": [],
+            "slices": {},
+            "ingresses": [],
+        }
+
+        with (
+            patch("shared.kubernetes.pods.get_synced_cluster_state", return_value=cache),
+            patch("shared.kubernetes.pods.apps_v1") as mock_apps_v1,
+        ):
+            stages = get_deployment_stages("abc")
+
+        cache.session_objects.assert_called_once_with("abc")
+        mock_apps_v1.assert_not_called()
+        assert stages["deployment"] == "pending"
+
+
+class TestChangeNotification:
+    """Tests for ClusterStateCache change notifications."""
+
+    def test_wait_for_change_sees_applied_event(self):
+        """Applying an event bumps the generation waiters block on."""
+        from shared.kubernetes.informer import ClusterStateCache
+
+        cache = ClusterStateCache()
+        generation = cache.generation
+
+        assert cache.wait_for_change(generation, timeout=0) == generation
+
+        informer = cache.pods
+        informer._notify(informer._apply("ADDED", make_obj("p1", {"appDep": "abc"})))
+
+        assert cache.wait_for_change(generation, timeout=0) == generation + 1
@@ -0,0 +1,48 @@
+"""Unit tests for the shared Kubernetes client registry."""
+
+from unittest.mock import patch
+
+from shared.kubernetes import config as k8s_config
+
+
+class TestClientRegistry:
+    """Tests for shared.kubernetes.config."""
+
+    def test_config_loaded_once(self):
+        """Repeated calls reuse the loaded configuration."""
+        with patch.object(k8s_config.config, "load_kube_config") as mock_load:
+            k8s_config.load_k8s_config()
+            k8s_config.core_v1()
+            k8s_config.apps_v1()
+            k8s_config.load_k8s_config()
+
+        assert mock_load.call_count == 1
+
+    def test_api_objects_are_shared(self):
+        """Every caller gets the same API object backed by one ApiClient."""
+        assert k8s_config.core_v1() is k8s_config.core_v1()
+        assert k8s_config.get_api_client() is k8s_config.get_api_client()
+
+    def test_falls_back_to_incluster_config(self):
+        """In-cluster config is used when no kubeconfig is available."""
+        with (
+            patch.object(
+                k8s_config.config,
+                "load_kube_config",
+                side_effect=k8s_config.ConfigException("no kubeconfig"),
+            ),
+            patch.object(k8s_config.config, "load_incluster_config") as mock_incluster,
+        ):
+            k8s_config.get_api_client()
+
+        mock_incluster.assert_called_once()
+
+    def test_pool_settings_applied(self, settings):
+        """The shared client uses the configured keep-alive pool size."""
+        settings.K8S_CONNECTION_POOL_MAXSIZE = 7
+        k8s_config.reset_k8s_clients()
+
+        configuration = k8s_config.get_api_client().configuration
+
+        assert configuration.connection_pool_maxsize == 7
+        assert configuration.socket_options
@@ -0,0 +1,125 @@
+"""Unit tests for the Kubernetes API metrics."""
+
+from contextlib import suppress
+from unittest.mock import MagicMock, patch
+
+import pytest
+from kubernetes import client
+from kubernetes.client import rest
+from kubernetes.client.api import AppsV1Api
+from kubernetes.client.rest import ApiException
+
+from shared.kubernetes import config as k8s_config
+from shared.kubernetes import metrics
+from shared.utils.prometheus import render
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset_metrics()
+    yield
+    metrics.reset_metrics()
+
+
+def rendered():
+    return render(metrics.metric_families())
+
+
+class TestDescribeRequest:
+    """Tests for describe_request."""
+
+    @pytest.mark.parametrize(
+        ("method", "url", "watch", "expected"),
+        [
+            ("POST", "/apis/apps/v1/namespaces/apps/deployments", False, ("create", "deployments")),
+            ("GET", "/api/v1/namespaces/apps/pods?labelSelector=a", False, ("list", "pods")),
+            ("GET", "/api/v1/namespaces/apps/pods/p1/log", False, ("get", "pods/log")),
+            (
+                "GET",
+                "/apis/discovery.k8s.io/v1/namespaces/apps/endpointslices?watch=true",
+                True,
+                ("watch", "endpointslices"),
+            ),
+            (
+                "DELETE",
+                "/apis/apps/v1/namespaces/apps/deployments",
+                False,
+                ("deletecollection", "deployments"),
+            ),
+            (
+                "PATCH",
+                "/apis/apps/v1/namespaces/apps/deployments/d1",
+                False,
+                ("patch", "deployments"),
+            ),
+            ("GET", "/api/v1/nodes", False, ("list", "nodes")),
+        ],
+    )
+    def test_verb_and_resource(self, method, url, watch, expected):
+        assert metrics.describe_request(method, "https://k8s:6443" + url, watch) == expected
+
+
+class TestTrackRequest:
+    """Tests for the instrumented shared ApiClient.
+
+    Requests go through the real generated API classes (conftest mocks
+    ``kubernetes.client.AppsV1Api``) down to a mocked REST layer.
+    """
+
+    def _call(self, request=None, **response):
+        api_client = k8s_config.RateLimitedApiClient(client.Configuration())
+        request = request or (
+            lambda api: AppsV1Api(api).patch_namespaced_deployment(
+                "d1", "apps", body={}, _preload_content=False
+            )
+        )
+        with patch.object(rest.RESTClientObject, "request", **response):
+            return request(api_client)
+
+    def test_success_records_latency_without_errors(self):
+        self._call(return_value=MagicMock(status=200))
+
+        text = rendered()
+        labels = 'verb="patch",resource="deployments"'
+        assert f"easytp_k8s_api_requests_total{{{labels}}} 1" in text
+        assert f'easytp_k8s_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+        assert f"easytp_k8s_api_requests_in_flight{{{labels}}} 0" in text
+        assert "easytp_k8s_api_errors_total{" not in text
+
+    def test_error_status_is_counted(self):
+        # Raised above the REST layer by newer clients only
+        with suppress(ApiException):
+            self._call(return_value=MagicMock(status=409))
+
+        assert 'easytp_k8s_api_errors_total{verb="patch",resource="deployments",code="409"} 1' in (
+            rendered()
+        )
+
+    def test_exception_is_counted_and_raised(self):
+        with pytest.raises(ApiException):
+            self._call(side_effect=ApiException(status=0, reason="TLS"))
+
+        assert 'code="ApiException"' in rendered()
+
+    def test_watch_is_labelled_as_watch(self):
+        self._call(
+            lambda api: AppsV1Api(api).list_namespaced_deployment(
+                "apps", watch=True, _preload_content=False
+            ),
+            return_value=MagicMock(status=200),
+        )
+
+        assert 'easytp_k8s_api_requests_total{verb="watch",resource="deployments"} 1' in rendered()
+
+    def test_list_with_query_params_is_labelled_as_list(self):
+        # Older clients pass the query separately from the URL
+        self._call(
+            lambda api: api.rest_client.request(
+                "GET",
+                "https://k8s/apis/apps/v1/namespaces/apps/deployments",
+                query_params=[("labelSelector", "appDep")],
+            ),
+            return_value=MagicMock(status=200),
+        )
+
+        assert 'easytp_k8s_api_requests_total{verb="list",resource="deployments"} 1' in rendered()
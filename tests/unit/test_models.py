@@ -141,6 +141,20 @@ class TestApp:
         assert app in group1.apps.all()
         assert app in group2.apps.all()
 
+    def test_request_above_limit_is_invalid(self):
+        """Test a resource request above its limit fails validation."""
+        from django.core.exceptions import ValidationError
+
+        from main.models import App
+
+        app = App(name="heavy", image="heavy:1", cpu_request="900m")
+        with pytest.raises(ValidationError) as excinfo:
+            app.full_clean()
+        assert "cpu_request" in excinfo.value.message_dict
+
+        app.cpu_limit = "1"
+        app.full_clean()
+
 
 @pytest.mark.django_db
 class TestPod:
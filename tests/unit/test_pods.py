@@ -0,0 +1,69 @@
+"""Unit tests for shared.kubernetes.pods status resolution."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from shared.kubernetes.pods import display_apps
+
+
+def empty_list():
+    return SimpleNamespace(items=[])
+
+
+@pytest.mark.django_db
+class TestDisplayApps:
+    """Tests for the batched display_apps path."""
+
+    @pytest.fixture
+    def apps(self):
+        from main.models import App
+
+        return [App.objects.create(name=f"batchapp{i}", image=f"batch{i}:latest") for i in range(3)]
+
+    def test_creates_missing_pods_in_one_pass(self, student_user, apps):
+        """Apps without a Pod row get one created, and report stopped."""
+        from main.models import App, Pod
+
+        data = display_apps(App.objects.filter(name__startswith="batchapp"), student_user)
+
+        assert set(data) == {app.name for app in apps}
+        assert (
+            Pod.objects.filter(pod_user=student_user, app_name__startswith="batchapp").count() == 3
+        )
+        assert all(entry["status"] == "stopped" for entry in data.values())
+
+    def test_one_list_call_per_kind_for_all_deployed_apps(self, student_user, apps):
+        """Deployed apps are resolved with set-based selectors, not one round per app."""
+        from main.models import App, Pod
+
+        for app in apps:
+            Pod.objects.create(
+                pod_user=student_user,
+                pod_name=f"hash-{app.name}",
+                app_name=app.name,
+                pod_vnc_password="secret",
+                is_deployed=True,
+            )
+
+        apps_api, core_api, networking_api = MagicMock(), MagicMock(), MagicMock()
+        with (
+            patch("shared.kubernetes.pods.apps_v1", return_value=apps_api),
+            patch("shared.kubernetes.pods.core_v1", return_value=core_api),
+            patch("shared.kubernetes.pods.networking_v1", return_value=networking_api),
+        ):
+            apps_api.list_namespaced_deployment.return_value = empty_list()
+            core_api.list_namespaced_pod.return_value = empty_list()
+            core_api.list_namespaced_service.return_value = empty_list()
+            networking_api.list_namespaced_ingress.return_value = empty_list()
+
+            data = display_apps(App.objects.filter(name__startswith="batchapp"), student_user)
+
+        assert apps_api.list_namespaced_deployment.call_count == 1
+        assert core_api.list_namespaced_pod.call_count == 1
+        assert networking_api.list_namespaced_ingress.call_count == 1
+        selector = apps_api.list_namespaced_deployment.call_args.kwargs["label_selector"]
+        assert selector.startswith("deploymentApp in (")
+        assert all(f"hash-{app.name}" in selector for app in apps)
+        assert all(entry["is_deployed"] for entry in data.values())
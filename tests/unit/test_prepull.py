@@ -0,0 +1,76 @@
+"""Unit tests for shared.kubernetes.prepull."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from shared.kubernetes.prepull import refresh_prepull_status, start_prepull
+
+
+def make_prepull_pod(node, image, image_id="", waiting_reason=None):
+    """Build a minimal stand-in for a pre-pull DaemonSet pod."""
+    waiting = SimpleNamespace(reason=waiting_reason) if waiting_reason else None
+    return SimpleNamespace(
+        spec=SimpleNamespace(node_name=node, init_containers=[SimpleNamespace(image=image)]),
+        status=SimpleNamespace(
+            init_container_statuses=[
+                SimpleNamespace(image_id=image_id, state=SimpleNamespace(waiting=waiting))
+            ]
+        ),
+    )
+
+
+@pytest.fixture
+def prepull_app(db, settings):
+    from main.models import App
+
+    settings.REGISTRY_URL = "registry.test"
+    return App.objects.create(name="Logisim", image="logisim:2")
+
+
+@pytest.mark.django_db
+class TestPrepull:
+    """Tests for the image pre-pull DaemonSet and its per-node status."""
+
+    def test_start_rolls_out_daemonset(self, prepull_app):
+        """Starting a pre-pull creates a DaemonSet for the new image."""
+        api = MagicMock()
+        with patch("shared.kubernetes.prepull.apps_v1", return_value=api):
+            start_prepull(prepull_app)
+
+        body = api.create_namespaced_daemon_set.call_args.kwargs["body"]
+        init = body["spec"]["template"]["spec"]["initContainers"][0]
+        assert init["image"] == "registry.test/logisim:2"
+        assert prepull_app.prepull_status["complete"] is False
+
+    def test_refresh_tracks_nodes_until_complete(self, prepull_app):
+        """Per-node status is stored and the DaemonSet removed once all nodes pulled."""
+        prepull_app.prepull_status = {"image": "registry.test/logisim:2", "complete": False}
+        apps_api, core_api = MagicMock(), MagicMock()
+        apps_api.read_namespaced_daemon_set.return_value.status.desired_number_scheduled = 2
+        core_api.list_namespaced_pod.return_value.items = [
+            make_prepull_pod("node-1", "registry.test/logisim:2", image_id="sha256:1"),
+            make_prepull_pod("node-2", "registry.test/logisim:2"),
+            make_prepull_pod("node-3", "registry.test/logisim:1", image_id="sha256:0"),
+        ]
+
+        with (
+            patch("shared.kubernetes.prepull.apps_v1", return_value=apps_api),
+            patch("shared.kubernetes.prepull.core_v1", return_value=core_api),
+        ):
+            status = refresh_prepull_status(prepull_app)
+            assert status["nodes"] == {"node-1": "pulled", "node-2": "pulling"}
+            assert status["complete"] is False
+            apps_api.delete_namespaced_daemon_set.assert_not_called()
+
+            core_api.list_namespaced_pod.return_value.items[1] = make_prepull_pod(
+                "node-2", "registry.test/logisim:2", waiting_reason="ImagePullBackOff"
+            )
+            status = refresh_prepull_status(prepull_app)
+
+        assert status["nodes"]["node-2"] == "failed"
+        assert status["complete"] is True
+        apps_api.delete_namespaced_daemon_set.assert_called_once()
+        prepull_app.refresh_from_db()
+        assert prepull_app.prepull_status["complete"] is True
@@ -0,0 +1,56 @@
+"""Unit tests for the Prometheus helpers shared by the metrics endpoints."""
+
+import json
+import os
+
+from shared.utils.prometheus import Histogram, MetricFamily, MultiProcessMetrics, _dump, merge
+
+
+def families(requests, in_flight, latency):
+    histogram = Histogram((0.1, 1.0))
+    for value in latency:
+        histogram.observe(value)
+    return [
+        MetricFamily("requests_total", "counter", "Requests.").add((("verb", "get"),), requests),
+        MetricFamily("in_flight", "gauge", "In flight.").add((), in_flight),
+        MetricFamily("latency_seconds", "histogram", "Latency.").add((), histogram),
+    ]
+
+
+class TestMerge:
+    """Tests for merging the families of several processes."""
+
+    def test_sums_samples_with_the_same_labels(self):
+        total = {f.name: f for f in merge([families(2, 1, [0.05]), families(3, 0, [0.5, 5])])}
+
+        assert total["requests_total"].samples == {(("verb", "get"),): 5}
+        assert total["in_flight"].samples == {(): 1}
+        histogram = total["latency_seconds"].samples[()]
+        assert histogram.counts == [1, 1, 1]
+        assert histogram.sum == 5.55
+
+
+class TestMultiProcessMetrics:
+    """Tests for sharing metrics between the worker processes of a pod."""
+
+    def test_scrape_returns_the_totals_of_every_process(self, tmp_path):
+        live, exited = os.getppid(), 2**22 + 1
+        (tmp_path / f"{live}.json").write_text(json.dumps(_dump(families(4, 2, [0.5]))))
+        (tmp_path / f"{exited}.json").write_text(json.dumps(_dump(families(10, 7, [0.05]))))
+        exporter = MultiProcessMetrics(lambda: families(1, 1, [2.0]), str(tmp_path))
+
+        total = {f.name: f for f in exporter.families()}
+
+        assert total["requests_total"].samples == {(("verb", "get"),): 15}
+        # Gauges of exited processes are dropped
+        assert total["in_flight"].samples == {(): 3}
+        assert total["latency_seconds"].samples[()].counts == [1, 1, 1]
+        assert (tmp_path / f"{os.getpid()}.json").exists()
+
+    def test_unreadable_snapshot_is_skipped(self, tmp_path):
+        (tmp_path / "123.json").write_text("{not json")
+        exporter = MultiProcessMetrics(lambda: families(1, 0, []), str(tmp_path))
+
+        total = {f.name: f for f in exporter.families()}
+
+        assert total["requests_total"].samples == {(("verb", "get"),): 1}
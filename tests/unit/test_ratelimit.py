@@ -0,0 +1,139 @@
+"""Unit tests for the prioritised Kubernetes API rate limiter."""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from kubernetes import client
+from kubernetes.client import rest
+from kubernetes.client.api import AppsV1Api
+
+from shared.kubernetes import config as k8s_config
+from shared.kubernetes.ratelimit import (
+    HOUSEKEEPING,
+    INTERACTIVE,
+    STATUS,
+    PriorityTokenBucket,
+    api_priority,
+    current_priority,
+)
+
+
+class TestApiPriority:
+    """Tests for the priority context."""
+
+    def test_default_is_status(self):
+        assert current_priority() == STATUS
+
+    def test_nested_blocks_restore_priority(self):
+        with api_priority(HOUSEKEEPING):
+            with api_priority(INTERACTIVE):
+                assert current_priority() == INTERACTIVE
+            assert current_priority() == HOUSEKEEPING
+        assert current_priority() == STATUS
+
+    def test_decorated_function_runs_with_priority(self):
+        @api_priority(INTERACTIVE)
+        def probe():
+            return current_priority()
+
+        assert probe() == INTERACTIVE
+        assert current_priority() == STATUS
+
+
+class TestPriorityTokenBucket:
+    """Tests for PriorityTokenBucket."""
+
+    def test_burst_is_served_without_waiting(self):
+        bucket = PriorityTokenBucket(rate=1, burst=5)
+
+        waited = [bucket.acquire(INTERACTIVE) for _ in range(5)]
+
+        assert max(waited) < 0.05
+        assert bucket.stats()["interactive"]["acquired"] == 5
+
+    def test_disabled_when_rate_is_zero(self):
+        bucket = PriorityTokenBucket(rate=0, burst=1)
+
+        assert [bucket.acquire() for _ in range(100)] == [0.0] * 100
+
+    def test_housekeeping_leaves_a_reserve(self):
+        """Housekeeping stops at half the bucket; interactive calls still get tokens."""
+        bucket = PriorityTokenBucket(rate=20, burst=10)
+        for _ in range(5):
+            bucket.acquire(HOUSEKEEPING)
+
+        waited = bucket.acquire(HOUSEKEEPING)
+        assert waited > 0.02
+
+        for _ in range(5):
+            assert bucket.acquire(INTERACTIVE) < 0.05
+
+    def test_waiting_interactive_is_served_before_status(self):
+        bucket = PriorityTokenBucket(rate=20, burst=1)
+        bucket.acquire(INTERACTIVE)
+        order = []
+
+        def take(priority, name):
+            bucket.acquire(priority)
+            order.append(name)
+
+        status = threading.Thread(target=take, args=(STATUS, "status"))
+        status.start()
+        time.sleep(0.01)
+        interactive = threading.Thread(target=take, args=(INTERACTIVE, "interactive"))
+        interactive.start()
+        status.join(2)
+        interactive.join(2)
+
+        assert order == ["interactive", "status"]
+        stats = bucket.stats()
+        assert stats["status"]["wait_seconds"] > 0
+        assert stats["status"]["waiting"] == 0
+
+
+class TestRateLimitedApiClient:
+    """Tests for the shared client's rate limiting hook.
+
+    Requests go through the real generated ``AppsV1Api`` (conftest mocks
+    ``kubernetes.client.AppsV1Api``) down to a mocked REST layer.
+    """
+
+    def _limiter(self, request):
+        limiter = MagicMock()
+        api_client = k8s_config.RateLimitedApiClient(client.Configuration())
+        with (
+            patch.object(k8s_config, "get_rate_limiter", return_value=limiter),
+            patch.object(rest.RESTClientObject, "request", return_value=MagicMock(status=200)),
+        ):
+            with api_priority(INTERACTIVE):
+                request(api_client)
+        return limiter
+
+    def test_requests_take_a_token_at_current_priority(self):
+        limiter = self._limiter(
+            lambda api_client: AppsV1Api(api_client).list_namespaced_deployment(
+                "apps", _preload_content=False
+            )
+        )
+
+        limiter.acquire.assert_called_once_with(INTERACTIVE)
+
+    def test_watches_are_not_limited(self):
+        limiter = self._limiter(
+            lambda api_client: AppsV1Api(api_client).list_namespaced_deployment(
+                "apps", watch=True, _preload_content=False
+            )
+        )
+
+        limiter.acquire.assert_not_called()
+
+    def test_watch_flag_in_query_params_is_not_limited(self):
+        # Older clients pass the query separately from the URL
+        limiter = self._limiter(
+            lambda api_client: api_client.rest_client.request(
+                "GET", "https://k8s/api/v1/namespaces/apps/services", query_params=[("watch", True)]
+            )
+        )
+
+        limiter.acquire.assert_not_called()
@@ -0,0 +1,100 @@
+"""Unit tests for shared.kubernetes.reconcile."""
+
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.utils import timezone
+
+from shared.kubernetes.reconcile import reconcile_sessions
+
+
+def make_resource(label, pod_name, age):
+    """Build a minimal stand-in for a session resource created ``age`` ago."""
+    return SimpleNamespace(
+        metadata=SimpleNamespace(
+            labels={label: pod_name},
+            creation_timestamp=timezone.now() - age,
+            managed_fields=None,
+        )
+    )
+
+
+@pytest.fixture
+def cluster():
+    """Patch the list calls with per-kind item lists the test fills in."""
+    apps_api, core_api, networking_api = MagicMock(), MagicMock(), MagicMock()
+    apps_api.list_namespaced_deployment.return_value.items = []
+    core_api.list_namespaced_service.return_value.items = []
+    networking_api.list_namespaced_ingress.return_value.items = []
+    with (
+        patch("shared.kubernetes.reconcile.apps_v1", return_value=apps_api),
+        patch("shared.kubernetes.reconcile.core_v1", return_value=core_api),
+        patch("shared.kubernetes.reconcile.networking_v1", return_value=networking_api),
+        patch("shared.kubernetes.reconcile.delete_session_resources") as mock_delete,
+    ):
+        yield {
+            "deployments": apps_api.list_namespaced_deployment.return_value.items,
+            "services": core_api.list_namespaced_service.return_value.items,
+            "delete": mock_delete,
+        }
+
+
+@pytest.mark.django_db
+class TestReconcileSessions:
+    """Tests for the drift reconciler."""
+
+    def make_pod(self, user, pod_name, deployed):
+        from main.models import Instances, Pod
+
+        pod = Pod.objects.create(
+            pod_user=user, pod_name=pod_name, app_name="App", is_deployed=deployed
+        )
+        Instances.objects.create(pod=pod, instance_name=pod_name)
+        return pod
+
+    def test_marks_vanished_sessions_stopped(self, student_user, cluster):
+        """Deployed rows without a Deployment are stopped and lose their Instances."""
+        from main.models import Instances
+
+        gone = self.make_pod(student_user, "gone", deployed=True)
+        alive = self.make_pod(student_user, "alive", deployed=True)
+        cluster["deployments"].append(make_resource("deploymentApp", "alive", timedelta(hours=1)))
+
+        result = reconcile_sessions(grace_seconds=0)
+
+        gone.refresh_from_db()
+        alive.refresh_from_db()
+        assert not gone.is_deployed
+        assert alive.is_deployed
+        assert not Instances.objects.filter(pod=gone).exists()
+        assert result["marked_stopped"] == 1
+        cluster["delete"].assert_not_called()
+
+    def test_recent_start_is_left_alone(self, student_user, cluster):
+        """A row changed within the grace period is not touched."""
+        pod = self.make_pod(student_user, "starting", deployed=True)
+
+        reconcile_sessions(grace_seconds=300)
+
+        pod.refresh_from_db()
+        assert pod.is_deployed
+
+    def test_deletes_orphaned_resources(self, student_user, cluster):
+        """Old resources of stopped or unknown pods are garbage-collected."""
+        self.make_pod(student_user, "stopped", deployed=False)
+        cluster["deployments"].extend(
+            [
+                make_resource("deploymentApp", "stopped", timedelta(hours=1)),
+                make_resource("deploymentApp", "no-row", timedelta(hours=1)),
+                make_resource("deploymentApp", "just-created", timedelta(seconds=1)),
+            ]
+        )
+        cluster["services"].append(make_resource("serviceApp", "leaked", timedelta(hours=1)))
+
+        result = reconcile_sessions(grace_seconds=60)
+
+        orphans = cluster["delete"].call_args.args[0]
+        assert sorted(orphans) == ["leaked", "no-row", "stopped"]
+        assert result["orphans_deleted"] == 3
@@ -0,0 +1,572 @@
+"""Unit tests for shared.kubernetes.sessions."""
+
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.utils import timezone
+from kubernetes.client.rest import ApiException
+
+from shared.kubernetes.sessions import (
+    create_session_resources,
+    hibernate_session,
+    next_expiry,
+    prestart_group,
+    reap_expired_sessions,
+    session_filter,
+    start_session,
+    teardown_sessions,
+)
+
+
+@pytest.fixture
+def session_app(db):
+    from main.models import App
+
+    return App.objects.create(name="SessionApp", image="session:latest")
+
+
+@pytest.fixture
+def session_pod(db, student_user, session_app):
+    from main.models import Pod
+
+    return Pod.objects.create(
+        pod_user=student_user,
+        pod_name="session-pod-hash",
+        app_name=session_app.name,
+        pod_vnc_password="secret",
+        pod_namespace="apps",
+    )
+
+
+@pytest.fixture
+def k8s_steps():
+    """Patch every Kubernetes create/delete helper used when starting a session."""
+    with (
+        patch("shared.kubernetes.sessions.deploy_app") as deploy,
+        patch("shared.kubernetes.sessions.create_service") as service,
+        patch("shared.kubernetes.sessions.create_ingress") as ingress,
+        patch("shared.kubernetes.sessions.delete_deployment") as undo_deploy,
+    ):
+        deploy.return_value.metadata.name = "sessionapp-deployment-session-pod-hash"
+        deploy.return_value.metadata.uid = "uid-1"
+        ingress.return_value = "host.example.com"
+        yield {
+            "deploy": deploy,
+            "service": service,
+            "ingress": ingress,
+            "undo_deploy": undo_deploy,
+        }
+
+
+@pytest.mark.django_db
+class TestCreateSessionResources:
+    """Tests for owned, concurrent creation with rollback."""
+
+    def test_creates_all_resources(self, session_pod, session_app, student_user, k8s_steps):
+        """All three resources are created and nothing is rolled back."""
+        host = create_session_resources(session_pod, session_app, student_user)
+
+        assert host == "host.example.com"
+        for name in ("deploy", "service", "ingress"):
+            k8s_steps[name].assert_called_once()
+        k8s_steps["undo_deploy"].assert_not_called()
+
+    def test_service_and_ingress_owned_by_deployment(
+        self, session_pod, session_app, student_user, k8s_steps
+    ):
+        """The service and ingress carry an ownerReference to the deployment."""
+        create_session_resources(session_pod, session_app, student_user)
+
+        owner = {
+            "apiVersion": "apps/v1",
+            "kind": "Deployment",
+            "name": "sessionapp-deployment-session-pod-hash",
+            "uid": "uid-1",
+        }
+        assert k8s_steps["service"].call_args.kwargs["owner"] == owner
+        assert k8s_steps["ingress"].call_args.kwargs["owner"] == owner
+
+    def test_failure_rolls_back_created_resources(
+        self, session_pod, session_app, student_user, k8s_steps
+    ):
+        """When a dependent fails, the deployment (and what it owns) is deleted."""
+        k8s_steps["service"].side_effect = ApiException(status=500)
+
+        with pytest.raises(ApiException):
+            create_session_resources(session_pod, session_app, student_user)
+
+        k8s_steps["undo_deploy"].assert_called_once_with("session-pod-hash", "sessionapp")
+
+    def test_failed_deployment_creates_nothing_else(
+        self, session_pod, session_app, student_user, k8s_steps
+    ):
+        """If the deployment fails, no dependents are created."""
+        k8s_steps["deploy"].side_effect = ApiException(status=500)
+
+        with pytest.raises(ApiException):
+            create_session_resources(session_pod, session_app, student_user)
+
+        k8s_steps["service"].assert_not_called()
+        k8s_steps["ingress"].assert_not_called()
+
+    def test_failed_start_leaves_pod_stopped(
+        self, session_pod, session_app, student_user, k8s_steps
+    ):
+        """A failed start does not mark the pod as deployed."""
+        k8s_steps["deploy"].side_effect = ApiException(status=500)
+
+        with pytest.raises(ApiException):
+            start_session(session_pod, session_app, student_user)
+
+        session_pod.refresh_from_db()
+        assert not session_pod.is_deployed
+
+    def test_start_schedules_expiry(self, session_pod, session_app, student_user, k8s_steps):
+        """A started session expires after the app's session duration."""
+        start_session(session_pod, session_app, student_user)
+
+        session_pod.refresh_from_db()
+        assert session_pod.is_deployed
+        remaining = session_pod.expires_at - timezone.now()
+        assert timedelta(minutes=session_app.session_duration_minutes - 1) < remaining
+
+
+@pytest.mark.django_db
+class TestReapExpiredSessions:
+    """Tests for the session expiry reaper."""
+
+    def deploy(self, pod, expires_at):
+        pod.is_deployed = True
+        pod.expires_at = expires_at
+        pod.save()
+
+    def test_reaps_only_expired_sessions(self, session_pod, student_user):
+        """Expired sessions are deleted in one batch and marked stopped."""
+        from main.models import Instances, Pod
+
+        other = Pod.objects.create(
+            pod_user=student_user, pod_name="other-pod-hash", app_name="Other"
+        )
+        now = timezone.now()
+        self.deploy(session_pod, now - timedelta(minutes=1))
+        self.deploy(other, now + timedelta(minutes=5))
+        Instances.objects.create(pod=session_pod, instance_name=session_pod.pod_name)
+
+        with patch("shared.kubernetes.sessions.delete_session_resources") as mock_delete:
+            assert reap_expired_sessions(now) == 1
+
+        mock_delete.assert_called_once_with(["session-pod-hash"], batch_size=50, unowned=[])
+        session_pod.refresh_from_db()
+        other.refresh_from_db()
+        assert not session_pod.is_deployed
+        assert session_pod.expires_at is None
+        assert other.is_deployed
+        assert not Instances.objects.filter(pod=session_pod).exists()
+        assert next_expiry() == other.expires_at
+
+    def test_failed_delete_keeps_session_for_retry(self, session_pod):
+        """If the batched delete fails the session stays deployed and expired."""
+        self.deploy(session_pod, timezone.now() - timedelta(minutes=1))
+
+        with (
+            patch(
+                "shared.kubernetes.sessions.delete_session_resources",
+                side_effect=ApiException(status=500),
+            ),
+            pytest.raises(ApiException),
+        ):
+            reap_expired_sessions()
+
+        session_pod.refresh_from_db()
+        assert session_pod.is_deployed
+        assert session_pod.expires_at is not None
+
+    def test_batch_delete_is_one_call_for_owned_sessions(self):
+        """Owned sessions cost one deletecollection per batch, unowned ones three."""
+        from shared.kubernetes.cleanup import delete_session_resources
+
+        with (
+            patch("shared.kubernetes.cleanup.apps_v1") as mock_apps_v1,
+            patch("shared.kubernetes.cleanup.core_v1") as mock_core_v1,
+            patch("shared.kubernetes.cleanup.networking_v1") as mock_networking_v1,
+        ):
+            delete_session_resources(["a", "b", "c"], batch_size=2, unowned=["c"])
+
+        assert mock_apps_v1.return_value.delete_collection_namespaced_deployment.call_count == 2
+        mock_core_v1.return_value.delete_collection_namespaced_service.assert_called_once_with(
+            namespace="apps", label_selector="serviceApp in (c)"
+        )
+        mock_networking_v1.return_value.delete_collection_namespaced_ingress.assert_called_once()
+
+    def test_cancel_scheduled_stop_is_a_db_update(self, session_pod):
+        """Cancelling a scheduled stop clears the expiry without touching Kubernetes."""
+        session_pod.schedule_stop(timedelta(minutes=10))
+
+        with patch("shared.kubernetes.cleanup.delete_cleanup_job") as mock_delete_job:
+            assert session_pod.cancel_scheduled_stop()
+
+        mock_delete_job.assert_not_called()
+        session_pod.refresh_from_db()
+        assert session_pod.expires_at is None
+
+
+@pytest.mark.django_db
+class TestStopSession:
+    """Tests for stopping a session."""
+
+    def test_stop_is_one_deployment_delete(self, session_pod, student_user):
+        """The garbage collector removes the service and ingress of an owned session."""
+        from shared.kubernetes.sessions import stop_session
+
+        session_pod.is_deployed = True
+        session_pod.save()
+
+        with (
+            patch("shared.kubernetes.deployments.apps_v1") as mock_apps_v1,
+            patch("shared.kubernetes.deployments.core_v1") as mock_core_v1,
+            patch("shared.kubernetes.deployments.networking_v1") as mock_networking_v1,
+        ):
+            stop_session(session_pod, student_user)
+
+        mock_apps_v1.return_value.delete_collection_namespaced_deployment.assert_called_once_with(
+            namespace="apps",
+            label_selector="deploymentApp=session-pod-hash",
+            propagation_policy="Background",
+        )
+        assert mock_core_v1.return_value.method_calls == []
+        assert mock_networking_v1.return_value.method_calls == []
+        session_pod.refresh_from_db()
+        assert not session_pod.is_deployed
+
+    def test_stop_deletes_dependents_of_legacy_session(self, session_pod, student_user):
+        """Legacy sessions get their service and ingress deleted by name.
+
+        Sessions with a cleanup Job predate ownerReferences.
+        """
+        from shared.kubernetes.sessions import stop_session
+
+        session_pod.is_deployed = True
+        session_pod.cleanup_job_name = "cleanup-session-pod-hash"
+        session_pod.save()
+
+        with (
+            patch("shared.kubernetes.deployments.apps_v1"),
+            patch("shared.kubernetes.deployments.core_v1") as mock_core_v1,
+            patch("shared.kubernetes.deployments.networking_v1") as mock_networking_v1,
+            patch("shared.kubernetes.cleanup.delete_cleanup_job"),
+        ):
+            stop_session(session_pod, student_user)
+
+        mock_core_v1.return_value.delete_namespaced_service.assert_called_once_with(
+            name="sessionapp-service-session-pod-hash", namespace="apps"
+        )
+        mock_networking_v1.return_value.delete_namespaced_ingress.assert_called_once_with(
+            name="sessionapp-ingress-session-pod-hash", namespace="apps"
+        )
+
+
+@pytest.mark.django_db
+class TestHibernateSession:
+    """Tests for scale-to-zero hibernation and resume."""
+
+    @pytest.fixture
+    def mock_apps_v1(self):
+        with patch("shared.kubernetes.deployments.apps_v1") as mock_apps_v1:
+            deployment = MagicMock()
+            deployment.metadata.name = "dep-1"
+            mock_apps_v1.return_value.list_namespaced_deployment.return_value.items = [deployment]
+            yield mock_apps_v1.return_value
+
+    def test_hibernate_scales_to_zero_and_keeps_routing(
+        self, session_pod, student_user, mock_apps_v1, settings
+    ):
+        """Hibernating patches replicas to 0 and schedules the hibernation TTL."""
+        from main.models import Instances
+
+        settings.SESSION_HIBERNATE_TTL_MINUTES = 120
+        session_pod.is_deployed = True
+        session_pod.save()
+        Instances.objects.create(
+            pod=session_pod, instance_name=session_pod.pod_name, novnc_url="https://host"
+        )
+
+        assert hibernate_session(session_pod, student_user)
+
+        mock_apps_v1.patch_namespaced_deployment_scale.assert_called_once_with(
+            name="dep-1", namespace="apps", body={"spec": {"replicas": 0}}
+        )
+        mock_apps_v1.delete_collection_namespaced_deployment.assert_not_called()
+        session_pod.refresh_from_db()
+        assert session_pod.is_deployed
+        assert session_pod.hibernated_at is not None
+        remaining = session_pod.expires_at - timezone.now()
+        assert timedelta(minutes=119) < remaining <= timedelta(minutes=120)
+        assert Instances.objects.get(pod=session_pod).novnc_url == "https://host"
+
+    def test_hibernate_without_deployment(self, session_pod, student_user, mock_apps_v1):
+        """A session whose Deployment is gone cannot be hibernated."""
+        mock_apps_v1.list_namespaced_deployment.return_value.items = []
+
+        assert not hibernate_session(session_pod, student_user)
+
+        session_pod.refresh_from_db()
+        assert session_pod.hibernated_at is None
+
+    def test_start_resumes_with_one_scale_patch(
+        self, session_pod, session_app, student_user, mock_apps_v1, k8s_steps
+    ):
+        """Starting a hibernated session scales it back up instead of recreating it."""
+        from main.models import Instances
+
+        session_pod.is_deployed = True
+        session_pod.hibernated_at = timezone.now()
+        session_pod.save()
+        Instances.objects.create(
+            pod=session_pod, instance_name=session_pod.pod_name, novnc_url="https://host"
+        )
+
+        instance = start_session(session_pod, session_app, student_user)
+
+        mock_apps_v1.patch_namespaced_deployment_scale.assert_called_once_with(
+            name="dep-1", namespace="apps", body={"spec": {"replicas": 1}}
+        )
+        k8s_steps["deploy"].assert_not_called()
+        k8s_steps["service"].assert_not_called()
+        k8s_steps["ingress"].assert_not_called()
+        assert instance.novnc_url == "https://host"
+        session_pod.refresh_from_db()
+        assert session_pod.hibernated_at is None
+        assert session_pod.expires_at > timezone.now()
+
+    def test_webrtc_resume_refreshes_turn_credentials(
+        self, session_pod, session_app, student_user, mock_apps_v1, k8s_steps
+    ):
+        """Resuming a webrtc session replaces its TURN env in the scale-up patch."""
+        from main.models import App
+
+        session_app.app_type = App.WEBRTC
+        session_pod.is_deployed = True
+        session_pod.hibernated_at = timezone.now()
+        session_pod.save()
+        deployment = mock_apps_v1.list_namespaced_deployment.return_value.items[0]
+        deployment.spec.template.spec.containers[0].name = "sessionapp"
+
+        with patch(
+            "shared.kubernetes.deployments.generate_turn_credentials", return_value=("u2", "p2")
+        ):
+            start_session(session_pod, session_app, student_user)
+
+        mock_apps_v1.patch_namespaced_deployment_scale.assert_not_called()
+        body = mock_apps_v1.patch_namespaced_deployment.call_args.kwargs["body"]
+        assert body["spec"]["replicas"] == 1
+        (container,) = body["spec"]["template"]["spec"]["containers"]
+        assert container["name"] == "sessionapp"
+        env = {entry["name"]: entry["value"] for entry in container["env"]}
+        assert env["SELKIES_TURN_USERNAME"] == "u2"
+        assert env["SELKIES_TURN_PASSWORD"] == "p2"
+        k8s_steps["deploy"].assert_not_called()
+
+
+@pytest.mark.django_db
+class TestSharedRouting:
+    """Tests for sessions routed through the shared routing table."""
+
+    def test_start_adds_a_route_instead_of_an_ingress(
+        self, session_pod, session_app, student_user, k8s_steps, settings
+    ):
+        """No Ingress is created; the host is added to the routing table."""
+        from main.models import SessionRoute
+
+        settings.SESSION_ROUTING = "shared"
+
+        instance = start_session(session_pod, session_app, student_user)
+
+        k8s_steps["service"].assert_called_once()
+        k8s_steps["ingress"].assert_not_called()
+        route = SessionRoute.objects.get(pod=session_pod)
+        assert route.service_name == "sessionapp-service-session-pod-hash"
+        assert instance.novnc_url == f"https://{route.host}"
+
+    def test_colliding_host_gets_a_pod_name_suffix(
+        self, session_pod, session_app, student_user, k8s_steps, settings
+    ):
+        """Usernames that clean to the same host still get distinct routes."""
+        from main.models import Pod, SessionRoute
+
+        settings.SESSION_ROUTING = "shared"
+        other = Pod.objects.create(pod_user=student_user, pod_name="other-pod-hash")
+        host = create_session_resources(session_pod, session_app, student_user)
+        SessionRoute.objects.filter(pod=session_pod).update(pod=other)
+
+        second = create_session_resources(session_pod, session_app, student_user)
+
+        label, _, domain = host.partition(".")
+        assert second == f"{label}-{session_pod.pod_name[:8]}.{domain}"
+        assert SessionRoute.objects.get(pod=session_pod).host == second
+
+    def test_failed_route_rolls_back_the_deployment(
+        self, session_pod, session_app, student_user, k8s_steps, settings
+    ):
+        """A routing table error deletes the Deployment like a Service error."""
+        settings.SESSION_ROUTING = "shared"
+
+        with (
+            patch("shared.kubernetes.sessions.add_route", side_effect=RuntimeError("db down")),
+            pytest.raises(RuntimeError),
+        ):
+            create_session_resources(session_pod, session_app, student_user)
+
+        k8s_steps["undo_deploy"].assert_called_once()
+
+    def test_stop_removes_the_route(
+        self, session_pod, session_app, student_user, k8s_steps, settings
+    ):
+        """Stopping a session drops its route."""
+        from main.models import SessionRoute
+        from shared.kubernetes.sessions import stop_session
+
+        settings.SESSION_ROUTING = "shared"
+        start_session(session_pod, session_app, student_user)
+
+        with patch("shared.kubernetes.deployments.apps_v1"):
+            stop_session(session_pod, student_user)
+
+        assert not SessionRoute.objects.filter(pod=session_pod).exists()
+
+
+@pytest.mark.django_db
+class TestTeardownSessions:
+    """Tests for bulk teardown by group, app or guests."""
+
+    def deployed(self, user, pod_name, app_name="SessionApp"):
+        from main.models import Pod
+
+        return Pod.objects.create(
+            pod_user=user, pod_name=pod_name, app_name=app_name, is_deployed=True
+        )
+
+    def test_tears_down_group_sessions_in_one_batch(self, student_user, guest_user):
+        """Every session of the group goes in one deletecollection batch."""
+        from main.models import AdmissionTicket, Instances, Pod
+
+        first = self.deployed(student_user, "student-a")
+        second = self.deployed(student_user, "student-b", app_name="Other")
+        guest = self.deployed(guest_user, "guest-a")
+        queued = Pod.objects.create(pod_user=student_user, pod_name="queued", app_name="Third")
+        AdmissionTicket.objects.create(
+            pod=queued,
+            group_id=student_user.group_id,
+            app_name="Third",
+            cpu_millicores=1,
+            memory_mib=1,
+        )
+        Instances.objects.create(pod=first, instance_name=first.pod_name)
+
+        with patch("shared.kubernetes.sessions.delete_session_resources") as mock_delete:
+            stopped = teardown_sessions(session_filter(group=student_user.group))
+
+        assert stopped == 2
+        mock_delete.assert_called_once_with(["student-a", "student-b"], batch_size=100, unowned=[])
+        assert not Pod.objects.filter(pk__in=[first.pk, second.pk], is_deployed=True).exists()
+        assert not Instances.objects.filter(pod=first).exists()
+        assert not AdmissionTicket.objects.filter(pod=queued).exists()
+        guest.refresh_from_db()
+        assert guest.is_deployed
+
+    def test_guests_and_app_filters_combine(self, student_user, guest_user, session_app):
+        """Filters narrow the selection together."""
+        self.deployed(student_user, "student-a")
+        self.deployed(guest_user, "guest-a")
+        self.deployed(guest_user, "guest-b", app_name="Other")
+
+        with patch("shared.kubernetes.sessions.delete_session_resources") as mock_delete:
+            stopped = teardown_sessions(session_filter(app=session_app, guests=True))
+
+        assert stopped == 1
+        mock_delete.assert_called_once_with(["guest-a"], batch_size=100, unowned=[])
+
+    def test_filter_is_required(self):
+        """An empty filter never selects every session."""
+        with pytest.raises(ValueError):
+            session_filter()
+
+
+class InlineExecutor:
+    """Executor running submitted calls immediately in the calling thread."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+@pytest.mark.django_db
+class TestPrestartGroup:
+    """Tests for pre-starting an app for a whole access group."""
+
+    @pytest.fixture(autouse=True)
+    def inline(self):
+        with (
+            patch("shared.kubernetes.sessions.get_executor", return_value=InlineExecutor()),
+            patch("shared.kubernetes.sessions.connections"),
+        ):
+            yield
+
+    def student(self, group, username):
+        from main.models import DefaultUser
+
+        return DefaultUser.objects.create_user(
+            username=username,
+            email=f"{username}@example.com",
+            password="testpass123",
+            group=group,
+            role=DefaultUser.STUDENT,
+        )
+
+    def test_starts_admits_and_reports_each_student(self, session_app, student_user):
+        """Sessions are started, queued or left running, with per-student results."""
+        from main.models import Pod
+
+        group = student_user.group
+        running = Pod.objects.create(
+            pod_user=student_user,
+            pod_name="already-running",
+            app_name=session_app.name,
+            is_deployed=True,
+        )
+        self.student(group, "new_student")
+        self.student(group, "queued_student")
+        self.student(group, "failing_student")
+        progress = []
+
+        def admit(pod, app):
+            return object() if pod.pod_user.username == "queued_student" else None
+
+        def start(pod, app, user):
+            if user.username == "failing_student":
+                raise ApiException(status=500)
+
+        with (
+            patch("shared.kubernetes.sessions.request_start", side_effect=admit),
+            patch("shared.kubernetes.sessions.start_session", side_effect=start) as mock_start,
+        ):
+            result = prestart_group(
+                session_app, group, progress=lambda *args: progress.append(args)
+            )
+
+        counts = {key: result[key] for key in ["started", "queued", "running", "failed"]}
+        assert counts == {"started": 1, "queued": 1, "running": 1, "failed": 1}
+        students = result["students"]
+        assert students["test_student"] == {"pod_name": running.pod_name, "status": "running"}
+        assert students["queued_student"]["status"] == "queued"
+        assert students["failing_student"]["status"] == "failed"
+        assert students["new_student"]["status"] == "started"
+        assert mock_start.call_count == 2
+        assert progress[-1][0] == 100
+        assert Pod.objects.filter(app_name=session_app.name).count() == 4
+        prestarted = Pod.objects.filter(prestarted=True).values_list(
+            "pod_user__username", flat=True
+        )
+        assert sorted(prestarted) == ["new_student", "queued_student"]
@@ -0,0 +1,114 @@
+"""Unit tests for single-flight lookups shared through the cache backend."""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+
+from shared.utils.singleflight import coalesce_many, forget
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def echo(calls, delay=0):
+    def fetch(keys):
+        calls.append(list(keys))
+        time.sleep(delay)
+        return {key: f"value-{key}" for key in keys}
+
+    return fetch
+
+
+class TestCoalesceMany:
+    """Tests for coalesce_many."""
+
+    def test_concurrent_callers_share_one_fetch(self):
+        calls, results = [], []
+        fetch = echo(calls, delay=0.2)
+
+        def lookup():
+            results.append(coalesce_many("status", ["a"], fetch, ttl=5, wait=2))
+
+        threads = [threading.Thread(target=lookup) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert calls == [["a"]]
+        assert results == [{"a": "value-a"}] * 5
+
+    def test_result_is_reused_within_ttl(self):
+        calls = []
+
+        coalesce_many("status", ["a", "b"], echo(calls), ttl=5, wait=1)
+        result = coalesce_many("status", ["b", "c"], echo(calls), ttl=5, wait=1)
+
+        assert calls == [["a", "b"], ["c"]]
+        assert result == {"b": "value-b", "c": "value-c"}
+
+    def test_forget_drops_cached_result(self):
+        calls = []
+
+        coalesce_many("status", ["a"], echo(calls), ttl=5, wait=1)
+        forget("status", ["a"])
+        coalesce_many("status", ["a"], echo(calls), ttl=5, wait=1)
+
+        assert calls == [["a"], ["a"]]
+
+    def test_waiter_fetches_itself_when_owner_never_publishes(self):
+        calls = []
+        cache.add("status:a:lock", "someone-else", timeout=30)
+
+        result = coalesce_many("status", ["a"], echo(calls), ttl=5, wait=0.1)
+
+        assert calls == [["a"]]
+        assert result == {"a": "value-a"}
+
+    def test_failed_fetch_releases_the_lock(self):
+        def failing(keys):
+            raise RuntimeError("API down")
+
+        with pytest.raises(RuntimeError):
+            coalesce_many("status", ["a"], failing, ttl=5, wait=1)
+
+        assert cache.get("status:a:lock") is None
+
+    def test_cache_errors_fall_back_to_direct_fetch(self):
+        calls = []
+
+        with patch("shared.utils.singleflight.cache.get_many", side_effect=ConnectionError):
+            result = coalesce_many("status", ["a"], echo(calls), ttl=5, wait=1)
+
+        assert calls == [["a"]]
+        assert result == {"a": "value-a"}
+
+    def test_waiter_stops_when_lock_is_released_without_result(self):
+        calls = []
+        cache.add("status:a:lock", "someone-else", timeout=30)
+        threading.Timer(0.1, cache.delete, ["status:a:lock"]).start()
+
+        started = time.monotonic()
+        result = coalesce_many("status", ["a"], echo(calls), ttl=5, wait=5)
+
+        assert time.monotonic() - started < 1
+        assert calls == [["a"]]
+        assert result == {"a": "value-a"}
+
+    def test_cache_write_errors_keep_the_fetched_result(self):
+        calls = []
+
+        with patch("shared.utils.singleflight.cache.set_many", side_effect=ConnectionError):
+            result = coalesce_many("status", ["a"], echo(calls), ttl=5, wait=1)
+
+        assert calls == [["a"]]
+        assert result == {"a": "value-a"}
+        assert cache.get("status:a:lock") is None
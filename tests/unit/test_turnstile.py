@@ -0,0 +1,82 @@
+"""Unit tests for the Turnstile verifier."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+import requests
+import responses
+
+from main.utils.turnstile import VERIFY_URL, TurnstileVerifier
+
+
+def make_verifier(fail_open=False):
+    return TurnstileVerifier(
+        secret_key="secret",
+        timeout=1,
+        failure_threshold=2,
+        reset_seconds=30,
+        fail_open=fail_open,
+    )
+
+
+class TestTurnstileVerifier:
+    """Tests for TurnstileVerifier."""
+
+    @responses.activate
+    def test_valid_and_invalid_tokens(self):
+        responses.add(responses.POST, VERIFY_URL, json={"success": True})
+        responses.add(responses.POST, VERIFY_URL, json={"success": False})
+        verifier = make_verifier()
+
+        assert verifier.verify("good", remote_ip="1.2.3.4") is True
+        assert verifier.verify("bad") is False
+
+        stats = verifier.stats()
+        assert stats["outcomes"]["passed"] == 1
+        assert stats["outcomes"]["rejected"] == 1
+        assert stats["latency_count"] == 2
+        assert "remoteip=1.2.3.4" in responses.calls[0].request.body
+
+    @pytest.mark.parametrize("fail_open", [True, False])
+    @responses.activate
+    def test_errors_follow_the_fail_policy(self, fail_open):
+        responses.add(responses.POST, VERIFY_URL, body=requests.ConnectTimeout())
+        verifier = make_verifier(fail_open=fail_open)
+
+        assert verifier.verify("token") is fail_open
+        assert verifier.stats()["outcomes"]["error"] == 1
+
+    @responses.activate
+    def test_circuit_opens_after_repeated_errors(self):
+        responses.add(responses.POST, VERIFY_URL, status=502)
+        verifier = make_verifier()
+
+        verifier.verify("token")
+        verifier.verify("token")
+        assert verifier.circuit_open
+
+        assert verifier.verify("token") is False
+        assert len(responses.calls) == 2
+        assert verifier.stats()["outcomes"]["short_circuited"] == 1
+
+    @responses.activate
+    def test_trial_request_closes_the_circuit(self):
+        responses.add(responses.POST, VERIFY_URL, status=502)
+        responses.add(responses.POST, VERIFY_URL, status=502)
+        responses.add(responses.POST, VERIFY_URL, json={"success": True})
+        verifier = make_verifier()
+        verifier.verify("token")
+        verifier.verify("token")
+
+        later = verifier._opened_at + 31
+        with patch("main.utils.turnstile.time.monotonic", return_value=later):
+            assert verifier.verify("token") is True
+
+        assert not verifier.circuit_open
+
+    @responses.activate
+    def test_async_variant(self):
+        responses.add(responses.POST, VERIFY_URL, json={"success": True})
+
+        assert asyncio.run(make_verifier().averify("token")) is True
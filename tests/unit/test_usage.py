@@ -0,0 +1,147 @@
+"""Unit tests for session usage sampling and resource recommendations."""
+
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.utils import timezone
+
+from shared.kubernetes.deployments import app_resources
+from shared.kubernetes.usage import (
+    apply_recommendation,
+    percentile,
+    recommend_resources,
+    sample_usage,
+)
+
+
+@pytest.fixture
+def test_app(db):
+    from main.models import App
+
+    return App.objects.create(name="Logisim", image="logisim:1")
+
+
+@pytest.fixture
+def test_pod(test_app, student_user):
+    from main.models import Pod
+
+    return Pod.objects.create(pod_user=student_user, pod_name="logisim-abc", app_name="Logisim")
+
+
+def pod_metrics(pod_name, cpu, memory):
+    return {
+        "metadata": {"name": f"{pod_name}-abc", "labels": {"appDep": pod_name}},
+        "containers": [{"name": "app", "usage": {"cpu": cpu, "memory": memory}}],
+    }
+
+
+class TestAppResources:
+    """Tests for per-App resource overrides."""
+
+    def test_blank_fields_keep_type_defaults(self, test_app):
+        resources = app_resources(test_app)
+
+        assert resources["requests"]["cpu"] == "600m"
+        assert resources["limits"]["memory"] == "512Mi"
+
+    def test_fields_override_defaults(self, test_app):
+        test_app.cpu_request = "250m"
+        test_app.memory_limit = "384Mi"
+
+        resources = app_resources(test_app)
+
+        assert resources["requests"]["cpu"] == "250m"
+        assert resources["limits"]["memory"] == "384Mi"
+        assert resources["requests"]["memory"] == "400Mi"
+
+
+class TestSampleUsage:
+    """Tests for sample_usage."""
+
+    def test_records_deployed_sessions_and_prunes_old_samples(self, test_pod, test_app):
+        from main.models import UsageSample
+
+        test_pod.is_deployed = True
+        test_pod.save()
+        old = UsageSample.objects.create(
+            app=test_app,
+            pod_name="gone",
+            cpu_millicores=1,
+            memory_mib=1,
+            sampled_at=timezone.now() - timedelta(days=30),
+        )
+        metrics = {
+            "items": [
+                pod_metrics(test_pod.pod_name, "120m", "200Mi"),
+                pod_metrics("unknown-pod", "1", "1Gi"),
+            ]
+        }
+        with patch("shared.kubernetes.usage.custom_objects") as mock_api:
+            mock_api.return_value.list_namespaced_custom_object.return_value = metrics
+            recorded = sample_usage()
+
+        assert recorded == 1
+        sample = UsageSample.objects.get()
+        assert (sample.app, sample.cpu_millicores, sample.memory_mib) == (test_app, 120, 200)
+        assert not UsageSample.objects.filter(pk=old.pk).exists()
+
+
+class TestRecommendResources:
+    """Tests for recommend_resources."""
+
+    def test_percentile(self):
+        assert percentile([5, 1, 3, 2, 4], 50) == 3
+        assert percentile(list(range(1, 101)), 95) == 95
+
+    def test_not_enough_samples(self, test_app, settings):
+        settings.RESOURCE_RECOMMENDER_MIN_SAMPLES = 10
+
+        assert recommend_resources(test_app) is None
+
+    @pytest.fixture
+    def samples(self, test_app, settings):
+        from main.models import UsageSample
+
+        settings.RESOURCE_RECOMMENDER_MIN_SAMPLES = 10
+        settings.RESOURCE_RECOMMENDER_HEADROOM = 1.2
+        UsageSample.objects.bulk_create(
+            UsageSample(app=test_app, pod_name="p", cpu_millicores=100 + i, memory_mib=150 + i)
+            for i in range(20)
+        )
+
+    def test_requests_follow_usage_with_headroom(self, test_app, samples):
+        recommendation = recommend_resources(test_app, pct=95)
+
+        # p95 cpu 118m x 1.2 -> 150m; p95 memory 168Mi x 1.2 -> 208Mi; max 169Mi x 1.2 -> 208Mi
+        assert recommendation["cpu_request"] == "150m"
+        assert recommendation["memory_request"] == "208Mi"
+        assert recommendation["memory_limit"] == "208Mi"
+        assert recommendation["current"]["cpu_request"] == "600m"
+
+    def test_cpu_limit_is_raised_to_a_larger_request(self, test_app, samples):
+        """A request above the app's CPU limit would make every deploy fail."""
+        test_app.cpu_limit = "100m"
+
+        recommendation = recommend_resources(test_app, pct=95)
+        apply_recommendation(test_app, recommendation)
+
+        assert recommendation["cpu_limit"] == "150m"
+        test_app.refresh_from_db()
+        assert test_app.cpu_limit == "150m"
+        test_app.full_clean()
+
+    def test_cpu_limit_is_kept_above_the_request(self, test_app, samples):
+        recommendation = recommend_resources(test_app, pct=95)
+        apply_recommendation(test_app, recommendation)
+
+        test_app.refresh_from_db()
+        assert recommendation["cpu_limit"] == "700m"
+        assert test_app.cpu_limit == ""
+
+    def test_apply_saves_fields(self, test_app, samples):
+        apply_recommendation(test_app, recommend_resources(test_app))
+
+        test_app.refresh_from_db()
+        assert test_app.cpu_request == "150m"
+        assert app_resources(test_app)["requests"]["memory"] == "208Mi"